@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Single-Pass Streaming Metrics Aggregator
+Reads system-metrics CSVs once and keeps count/mean/min/max plus p50/p95/p99
+for every numeric column, overall and per job phase when a timeline is given.
+Quantiles are exact (values kept) or estimated with a merging t-digest
+(bounded memory for long captures).
+Usage:
+  python3 aggregate_metrics.py summary <system_metrics.csv>
+  python3 aggregate_metrics.py stats <system_metrics.csv> [...] [--timeline <timeline.csv>]
+      [--mode exact|tdigest] [--output metrics/<id>_metric_stats.csv]
+"""
+
+import argparse
+import bisect
+import csv
+import math
+import sys
+
+from merge_metrics import side_channel
+from timeline_io import format_time, load_timeline, split_tasks
+
+QUANTILES = (0.5, 0.95, 0.99)
+STATS_HEADER = ['window', 'window_start', 'window_end', 'column', 'count', 'mean', 'min', 'max',
+                'p50', 'p95', 'p99']
+# Columns behind the batch summary row (avg/max cpu, memory, load)
+SUMMARY_COLUMNS = [('cpu_percent', 'avg_cpu_percent', 'max_cpu_percent'),
+                   ('memory_used_mb', 'avg_memory_mb', 'max_memory_mb'),
+                   ('load_avg', 'avg_load', 'max_load')]
+# Never aggregated: identifiers and the time axis itself
+SKIP_COLUMNS = {'node_name', 'timestamp'}
+
+
+class TDigest:
+    """
+    Merging t-digest (Dunning & Ertl) with the k1 scale function
+
+    Values are buffered and periodically merged into at most ~compression
+    centroids, so memory stays constant however long the capture is.
+    """
+
+    def __init__(self, compression=200):
+        self.compression = compression
+        self.centroids = []  # [mean, weight], sorted by mean
+        self.buffer = []
+        self.total = 0
+
+    def add(self, value):
+        self.buffer.append(value)
+        if len(self.buffer) >= self.compression * 5:
+            self._merge()
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _merge(self):
+        if not self.buffer:
+            return
+        points = self.centroids + [[v, 1] for v in self.buffer]
+        points.sort(key=lambda c: c[0])
+        self.buffer = []
+        self.total = sum(w for _, w in points)
+
+        merged = [list(points[0])]
+        seen = 0
+        k_low = self._k(0)
+        for mean, weight in points[1:]:
+            current = merged[-1]
+            q = (seen + current[1] + weight) / self.total
+            if self._k(q) - k_low <= 1:
+                current[0] += (mean - current[0]) * weight / (current[1] + weight)
+                current[1] += weight
+            else:
+                seen += current[1]
+                k_low = self._k(seen / self.total)
+                merged.append([mean, weight])
+        self.centroids = merged
+
+    def quantile(self, q):
+        self._merge()
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+        target = q * self.total
+        cumulative = 0
+        for i, (mean, weight) in enumerate(self.centroids):
+            if cumulative + weight / 2 >= target:
+                if i == 0:
+                    return mean
+                prev_mean, prev_weight = self.centroids[i - 1]
+                left = cumulative - prev_weight / 2
+                span = (cumulative + weight / 2) - left
+                return prev_mean + (mean - prev_mean) * (target - left) / span if span else mean
+            cumulative += weight
+        return self.centroids[-1][0]
+
+
+class ExactQuantiles:
+    """Keeps every value; quantiles by linear interpolation (numpy's default)"""
+
+    def __init__(self):
+        self.values = []
+        self._sorted = True
+
+    def add(self, value):
+        if self.values and value < self.values[-1]:
+            self._sorted = False
+        self.values.append(value)
+
+    def quantile(self, q):
+        if not self.values:
+            return None
+        if not self._sorted:
+            self.values.sort()
+            self._sorted = True
+        pos = q * (len(self.values) - 1)
+        low = int(pos)
+        high = min(low + 1, len(self.values) - 1)
+        return self.values[low] + (self.values[high] - self.values[low]) * (pos - low)
+
+
+class ColumnStats:
+    """Running count/sum/min/max plus a quantile estimator for one column"""
+
+    def __init__(self, mode='exact'):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.quantiles = TDigest() if mode == 'tdigest' else ExactQuantiles()
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.quantiles.add(value)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def row(self):
+        values = {'count': self.count, 'mean': self.mean, 'min': self.min, 'max': self.max}
+        for q in QUANTILES:
+            values[f'p{int(q * 100)}'] = self.quantiles.quantile(q)
+        return values
+
+
+def phase_windows(timeline_csv):
+    """
+    Split the job into phases from its timeline
+
+    Returns [(name, start, end)] in epoch seconds:
+      pre_reduce    job start -> first reducer launch
+      overlap       first reducer launch -> last map finish
+      shuffle_tail  last map finish -> last shuffle finish
+      reduce        last shuffle finish -> job end
+    Empty windows (e.g. overlap at slowstart 1.0) are dropped.
+    """
+    tasks = load_timeline(timeline_csv)
+    if not tasks:
+        return []
+    map_tasks, reduce_tasks = split_tasks(tasks)
+    job_start = min(t['start'] for t in tasks)
+    job_end = max(t['finish'] for t in tasks)
+    map_end = max((t['finish'] for t in map_tasks), default=job_start)
+    reduce_start = min((t['start'] for t in reduce_tasks), default=map_end)
+    shuffle_end = max((t['shuffle_finish'] for t in reduce_tasks if t['shuffle_finish']), default=map_end)
+
+    reduce_start = min(max(reduce_start, job_start), map_end)
+    shuffle_end = min(max(shuffle_end, map_end), job_end)
+    windows = [('pre_reduce', job_start, reduce_start), ('overlap', reduce_start, map_end),
+               ('shuffle_tail', map_end, shuffle_end), ('reduce', shuffle_end, job_end)]
+    return [w for w in windows if w[2] > w[1]]
+
+
+def aggregate(csv_files, windows=(), mode='exact'):
+    """
+    Stream the metrics files once, updating overall and per-window stats
+
+    Returns {window_name: {column: ColumnStats}} with 'all' for the whole capture.
+    Columns are found by header name, so older files without node_name work.
+    """
+    results = {'all': {}}
+    starts = [w[1] for w in windows]
+    for name, _, _ in windows:
+        results[name] = {}
+
+    for csv_file in csv_files:
+        with open(csv_file, 'r', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                continue
+            if side_channel(header):
+                print(f"Skipping {csv_file}: {side_channel(header)} side-channel CSV, not system metrics",
+                      file=sys.stderr)
+                continue
+            columns = [(i, name) for i, name in enumerate(header) if name not in SKIP_COLUMNS]
+            ts_index = header.index('timestamp') if 'timestamp' in header else None
+
+            for row in reader:
+                targets = [results['all']]
+                if windows and ts_index is not None and ts_index < len(row):
+                    try:
+                        ts = float(row[ts_index])
+                    except ValueError:
+                        ts = None
+                    if ts is not None:
+                        i = bisect.bisect_right(starts, ts) - 1
+                        if i >= 0 and ts < windows[i][2]:
+                            targets.append(results[windows[i][0]])
+
+                for i, name in columns:
+                    if i >= len(row):
+                        continue
+                    try:
+                        value = float(row[i])
+                    except ValueError:
+                        continue
+                    for target in targets:
+                        stats = target.get(name)
+                        if stats is None:
+                            stats = target[name] = ColumnStats(mode)
+                        stats.add(value)
+    return results
+
+
+def summary_values(results):
+    """avg/max cpu, memory and load for the batch summary CSV row"""
+    values = []
+    for column, _, _ in SUMMARY_COLUMNS:
+        stats = results['all'].get(column)
+        values.append(f"{stats.mean:.2f}" if stats and stats.count else "0")
+        values.append(f"{stats.max:.2f}" if stats and stats.count else "0")
+    return values
+
+
+def write_stats(results, windows, output):
+    bounds = {name: (start, end) for name, start, end in windows}
+    with open(output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=STATS_HEADER)
+        writer.writeheader()
+        for window, columns in results.items():
+            start, end = bounds.get(window, (None, None))
+            for column, stats in columns.items():
+                row = {k: (round(v, 4) if isinstance(v, float) else v) for k, v in stats.row().items()}
+                row.update(window=window, window_start=format_time(start), window_end=format_time(end),
+                           column=column)
+                writer.writerow(row)
+
+
+def cmd_summary(args):
+    results = aggregate(args.metrics, mode=args.mode)
+    print(' '.join(summary_values(results)))
+    return 0
+
+
+def cmd_stats(args):
+    windows = phase_windows(args.timeline) if args.timeline else []
+    if args.timeline and not windows:
+        print(f"Warning: no tasks in {args.timeline}, phase windows skipped", file=sys.stderr)
+    results = aggregate(args.metrics, windows, args.mode)
+
+    if args.output:
+        write_stats(results, windows, args.output)
+        print(f"Stats: {args.output}")
+    for window, columns in results.items():
+        print(f"\n[{window}]")
+        print(f"  {'column':<22} {'count':>6} {'mean':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}")
+        for column, stats in columns.items():
+            row = stats.row()
+            print(f"  {column:<22} {row['count']:>6} {row['mean']:>10.2f} {row['p50']:>10.2f} "
+                  f"{row['p95']:>10.2f} {row['p99']:>10.2f} {row['max']:>10.2f}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Single-pass system metrics aggregation')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    summary = subparsers.add_parser('summary', help='Print "avg_cpu max_cpu avg_mem max_mem avg_load max_load"')
+    summary.set_defaults(func=cmd_summary)
+    stats = subparsers.add_parser('stats', help='Per-column distribution stats, optionally per phase')
+    stats.add_argument('--timeline', default=None, help='Timeline CSV whose phases define the windows')
+    stats.add_argument('--output', default=None, help='Stats CSV path')
+    stats.set_defaults(func=cmd_stats)
+
+    for sub in (summary, stats):
+        sub.add_argument('metrics', nargs='+', help='System metrics CSV file(s)')
+        sub.add_argument('--mode', choices=['exact', 'tdigest'], default='exact',
+                         help='Quantile computation (default: exact)')
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
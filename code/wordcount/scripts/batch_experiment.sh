@@ -33,6 +33,19 @@ echo -e "${YELLOW}Slowstart Values: ${SLOWSTART_VALUES[*]}${NC}"
 mkdir -p metrics
 mkdir -p "${LOCAL_METRICS_DIR}"
 
+# Disk-pressure watchdog: predicts time-to-full for the HDFS/YARN/metrics disks,
+# pauses before the next experiment when space is short and aborts the batch
+# (killing the running job) before the disk fills. NO_DISK_WATCHDOG=1 disables it.
+DISK_WATCHDOG="$(dirname "$0")/disk_watchdog.py"
+DISK_STATE="metrics/.disk_watchdog_${EXPERIMENT_BASE_ID}.json"
+if [ -z "$NO_DISK_WATCHDOG" ] && command -v python3 &> /dev/null; then
+    python3 "$DISK_WATCHDOG" watch --state "$DISK_STATE" --kill-jobs --retention \
+        --output "metrics/disk_watchdog_${EXPERIMENT_BASE_ID}.csv" > "metrics/disk_watchdog_${EXPERIMENT_BASE_ID}.log" 2>&1 &
+    DISK_WATCHDOG_PID=$!
+    trap 'kill $DISK_WATCHDOG_PID 2>/dev/null || true' EXIT
+    echo -e "${YELLOW}Disk watchdog: PID ${DISK_WATCHDOG_PID}, state ${DISK_STATE}${NC}"
+fi
+
 
 # ============================================================================
 # PHASE 1: Run Batch Experiments
@@ -58,6 +71,16 @@ for i in "${!SLOWSTART_VALUES[@]}"; do
     output_path="${OUTPUT_BASE_PATH}_slowstart_${slowstart_value//./}"
     
     echo -e "\n${BLUE}--- Experiment $((i+1))/${total_experiments}: slowstart=${slowstart_value} ---${NC}"
+
+    # Wait out a disk-pressure pause; stop the batch on abort
+    if [ -n "$DISK_WATCHDOG_PID" ]; then
+        gate_status=0
+        python3 "$DISK_WATCHDOG" gate --state "$DISK_STATE" --max-wait "${DISK_MAX_WAIT:-1800}" || gate_status=$?
+        if [ $gate_status -ne 0 ]; then
+            echo -e "${RED}✗ Disk pressure: batch stopped before experiment $((i+1)) (see metrics/disk_watchdog_${EXPERIMENT_BASE_ID}.log)${NC}"
+            break
+        fi
+    fi
     
     # Clean output directory
     echo -e "${YELLOW}Cleaning output directory: ${output_path}${NC}"
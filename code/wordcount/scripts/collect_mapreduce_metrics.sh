@@ -2,7 +2,10 @@
 
 # MapReduce Process Metrics Collection Script
 # Usage: ./collect_mapreduce_metrics.sh <node_name> [scan_interval]
-# This script runs in background and monitors MRAppMaster and YarnChild processes
+# This script runs in background and monitors MRAppMaster and YarnChild processes.
+# It hands over to jvm_sampler.py, which rediscovers the JVMs from /proc every
+# tick (so reducers started after slowstart are covered); the pidstat loop below
+# is the fallback when python3 or /proc is unavailable, or with LEGACY_COLLECTOR=1.
 
 NODE_NAME=${1}
 SCAN_INTERVAL=${2:-5}  # Scan interval when no processes found (seconds)
@@ -17,6 +20,17 @@ if [ -z "$NODE_NAME" ]; then
     exit 1
 fi
 
+# Prefer the /proc sampler: per-tick discovery, appear/exit events, no jps/pidstat forks.
+# It samples adaptively: ~150ms around JVM spawn/exit and CPU/network steps, backing
+# off to SCAN_INTERVAL in steady phases (FIXED_INTERVAL=1 keeps MONITOR_INTERVAL ticks)
+if [ -z "$LEGACY_COLLECTOR" ] && [ -r /proc/stat ] && command -v python3 &> /dev/null; then
+    if [ -n "$FIXED_INTERVAL" ]; then
+        exec python3 "$(dirname "$0")/jvm_sampler.py" "$NODE_NAME" "$MONITOR_INTERVAL" --output-dir mapreduce_metrics
+    fi
+    exec python3 "$(dirname "$0")/jvm_sampler.py" "$NODE_NAME" --adaptive --slow "$SCAN_INTERVAL" \
+        --output-dir mapreduce_metrics
+fi
+
 # Check if pidstat is available
 if ! command -v pidstat &> /dev/null; then
     echo "Error: pidstat not found. Please install sysstat package:"
@@ -167,6 +181,12 @@ trap cleanup SIGINT SIGTERM
 log_message "MapReduce process monitoring started on $NODE_NAME"
 log_message "Scan interval: ${SCAN_INTERVAL}s, Monitor interval: ${MONITOR_INTERVAL}s"
 
+# Record this loop's own CPU/RSS/forks, pidstat/jps children included
+if [ -r /proc/stat ] && command -v python3 &> /dev/null; then
+    python3 "$(dirname "$0")/sampler_overhead.py" watch $$ "$NODE_NAME" --name collect_mapreduce_metrics \
+        --output-dir mapreduce_metrics > /dev/null &
+fi
+
 while true; do
     # Discover current MapReduce processes
     process_info=$(discover_processes)
@@ -3,6 +3,9 @@
 # System Metrics Collection Script for Multi-Node Hadoop Cluster
 # Usage: ./collect_metrics.sh <node_name> [interval]
 # This script runs in background and collects system metrics every second
+# (interval may be fractional). It hands over to proc_sampler.py, which reads
+# /proc directly on a drift-free schedule; the tool-based loop below is the
+# fallback when python3 or /proc is unavailable, or with LEGACY_COLLECTOR=1.
 
 NODE_NAME=${1}
 INTERVAL=${2:-1}  # Collection interval in seconds
@@ -23,6 +26,13 @@ OUTPUT_FILE="system_metrics/${NODE_NAME}_${TIMESTAMP}.csv"
 # Create system_metrics directory if it doesn't exist
 mkdir -p system_metrics
 
+# Prefer the resident /proc sampler (same CSV schema, no per-tick forks)
+if [ -z "$LEGACY_COLLECTOR" ] && [ -r /proc/stat ] && command -v python3 &> /dev/null; then
+    exec python3 "$(dirname "$0")/proc_sampler.py" "$NODE_NAME" "$INTERVAL" --output "$OUTPUT_FILE" \
+        --rates "system_metrics/${NODE_NAME}_rates_${TIMESTAMP}.csv" \
+        --dir-io "system_metrics/${NODE_NAME}_dirio_${TIMESTAMP}.csv"
+fi
+
 # Function to get CPU usage percentage
 get_cpu_usage() {
     # Use top to get current CPU usage, excluding idle
@@ -97,6 +107,12 @@ echo "System metrics collection started. Output: $OUTPUT_FILE"
 echo "Collection interval: ${INTERVAL} second(s)"
 echo "Press Ctrl+C to stop collection"
 
+# Record this loop's own CPU/RSS/forks (system_metrics/<node>_overhead_collect_metrics_*.csv)
+if [ -r /proc/stat ] && command -v python3 &> /dev/null; then
+    python3 "$(dirname "$0")/sampler_overhead.py" watch $$ "$NODE_NAME" --name collect_metrics \
+        --output-dir system_metrics > /dev/null &
+fi
+
 # Main collection loop
 while true; do
     timestamp=$(date +%s)
@@ -131,6 +131,19 @@ collect_mr_metrics() {
 # ============
 echo -e "\n${BLUE}=== Starting Data Collection ===${NC}"
 
+# Record each node's clock offset so merge_node_metrics.sh can align timestamps
+echo -e "\n${CYAN}Measuring clock offsets...${NC}"
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+python3 "${SCRIPT_DIR}/merge_metrics.py" offsets "${REMOTE_NODES[@]}" \
+    --output "${LOCAL_BASE_DIR}/clock_offsets.csv" || \
+    echo -e "${YELLOW}  ⚠ Clock offsets not measured, merged timestamps will be uncorrected${NC}"
+
+# Prefer the parallel puller: all nodes at once, one multiplexed SSH connection per
+# node, one tar stream of only the new/changed files (LEGACY_COLLECTOR=1 keeps scp)
+if [ -z "$LEGACY_COLLECTOR" ] && command -v python3 &> /dev/null; then
+    exec python3 "${SCRIPT_DIR}/remote_pull.py" "${REMOTE_NODES[@]}" --output "${LOCAL_BASE_DIR}"
+fi
+
 for node in "${REMOTE_NODES[@]}"; do
     ok=0
 
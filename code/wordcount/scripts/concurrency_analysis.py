@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Sweep-line Concurrency Analysis for MapReduce Timelines
+Computes running map/reduce and shuffle-waiting counts over time, container
+slot-seconds by phase and idle-reducer slot-seconds for each experiment.
+Usage: python3 concurrency_analysis.py <timeline_csv_or_dir> [...]
+"""
+
+import argparse
+import csv
+import sys
+
+from timeline_io import find_timeline_csvs, format_time, load_timeline, output_prefix, split_tasks
+
+# Series tracked by the sweep, in output column order
+SERIES = ['running_maps', 'running_reduces', 'shuffle_waiting', 'shuffling', 'merging', 'reducing']
+
+SUMMARY_HEADER = [
+    'experiment_id', 'slowstart_value', 'num_map_tasks', 'num_reduce_tasks',
+    'job_start_time', 'job_end_time', 'makespan_sec',
+    'map_slot_sec', 'reduce_slot_sec',
+    'shuffle_slot_sec', 'merge_slot_sec', 'reduce_phase_slot_sec',
+    'idle_reducer_slot_sec', 'idle_reducer_pct',
+    'map_reduce_overlap_sec', 'peak_running_maps', 'peak_running_reduces',
+    'peak_containers', 'avg_containers',
+]
+
+
+def build_intervals(tasks):
+    """
+    Turn tasks into (start, end, series) intervals
+
+    A reducer that is in shuffle while maps are still running is holding a
+    container mostly waiting for map output; that time is 'shuffle_waiting'.
+    Shuffle time after the last map finished is 'shuffling'.
+    """
+    map_tasks, reduce_tasks = split_tasks(tasks)
+    map_end = max((t['finish'] for t in map_tasks), default=0)
+
+    intervals = []
+    for t in map_tasks:
+        intervals.append((t['start'], t['finish'], 'running_maps'))
+
+    for t in reduce_tasks:
+        start, finish = t['start'], t['finish']
+        intervals.append((start, finish, 'running_reduces'))
+
+        shuffle_end = min(t['shuffle_finish'] or finish, finish)
+        merge_end = min(max(t['merge_finish'] or shuffle_end, shuffle_end), finish)
+
+        wait_end = min(shuffle_end, map_end)
+        if wait_end > start:
+            intervals.append((start, wait_end, 'shuffle_waiting'))
+        active_start = max(start, map_end)
+        if shuffle_end > active_start:
+            intervals.append((active_start, shuffle_end, 'shuffling'))
+        if merge_end > shuffle_end:
+            intervals.append((shuffle_end, merge_end, 'merging'))
+        if finish > merge_end:
+            intervals.append((merge_end, finish, 'reducing'))
+
+    return intervals
+
+
+def sweep(intervals):
+    """
+    Sweep-line over intervals
+
+    Returns:
+        (series_rows, slot_seconds, overlap_sec) where series_rows is a list of
+        (time, counts_dict) after each event time, slot_seconds maps each series
+        to its integrated count over time, and overlap_sec is the time during
+        which maps and reduces were both running.
+    """
+    events = []
+    for start, end, series in intervals:
+        if end <= start:
+            continue
+        events.append((start, 1, series))
+        events.append((end, -1, series))
+    # Ends sort before starts at the same instant: intervals are half-open
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    counts = dict.fromkeys(SERIES, 0)
+    slot_seconds = dict.fromkeys(SERIES, 0.0)
+    overlap_sec = 0.0
+    rows = []
+    prev_time = None
+    i = 0
+    while i < len(events):
+        now = events[i][0]
+        if prev_time is not None:
+            dt = now - prev_time
+            for series in SERIES:
+                slot_seconds[series] += counts[series] * dt
+            if counts['running_maps'] > 0 and counts['running_reduces'] > 0:
+                overlap_sec += dt
+        while i < len(events) and events[i][0] == now:
+            counts[events[i][2]] += events[i][1]
+            i += 1
+        rows.append((now, dict(counts)))
+        prev_time = now
+    return rows, slot_seconds, overlap_sec
+
+
+def analyze_timeline(tasks):
+    """Run the sweep for one experiment and build the summary row"""
+    map_tasks, reduce_tasks = split_tasks(tasks)
+    rows, slot_seconds, overlap_sec = sweep(build_intervals(tasks))
+
+    job_start = min(t['start'] for t in tasks)
+    job_end = max(t['finish'] for t in tasks)
+    makespan = job_end - job_start
+    reduce_slot = slot_seconds['running_reduces']
+    container_slot = slot_seconds['running_maps'] + reduce_slot
+
+    summary = {
+        'experiment_id': tasks[0]['experiment_id'],
+        'slowstart_value': tasks[0]['slowstart_value'],
+        'num_map_tasks': len(map_tasks),
+        'num_reduce_tasks': len(reduce_tasks),
+        'job_start_time': format_time(job_start),
+        'job_end_time': format_time(job_end),
+        'makespan_sec': format_time(makespan),
+        'map_slot_sec': round(slot_seconds['running_maps'], 3),
+        'reduce_slot_sec': round(reduce_slot, 3),
+        'shuffle_slot_sec': round(slot_seconds['shuffling'], 3),
+        'merge_slot_sec': round(slot_seconds['merging'], 3),
+        'reduce_phase_slot_sec': round(slot_seconds['reducing'], 3),
+        'idle_reducer_slot_sec': round(slot_seconds['shuffle_waiting'], 3),
+        'idle_reducer_pct': round(slot_seconds['shuffle_waiting'] / reduce_slot * 100, 2) if reduce_slot > 0 else 0,
+        'map_reduce_overlap_sec': format_time(overlap_sec),
+        'peak_running_maps': max((c['running_maps'] for _, c in rows), default=0),
+        'peak_running_reduces': max((c['running_reduces'] for _, c in rows), default=0),
+        'peak_containers': max((c['running_maps'] + c['running_reduces'] for _, c in rows), default=0),
+        'avg_containers': round(container_slot / makespan, 2) if makespan > 0 else 0,
+    }
+    return rows, summary
+
+
+def write_series_csv(path, rows, job_start):
+    """Write the step-function concurrency series"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['time_sec', 'timestamp'] + SERIES + ['total_containers'])
+        for now, counts in rows:
+            writer.writerow([format_time(now - job_start), format_time(now)] + [counts[s] for s in SERIES]
+                            + [counts['running_maps'] + counts['running_reduces']])
+
+
+def write_summary_csv(path, summary):
+    """Write the one-row slot-seconds summary"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_HEADER)
+        writer.writeheader()
+        writer.writerow(summary)
+
+
+def process_file(csv_file):
+    """Analyze one timeline CSV and write its derived CSVs"""
+    tasks = load_timeline(csv_file)
+    if not tasks:
+        print(f"Warning: no tasks in {csv_file}, skipping")
+        return None
+
+    rows, summary = analyze_timeline(tasks)
+    prefix = output_prefix(csv_file)
+    series_csv = f"{prefix}_concurrency.csv"
+    summary_csv = f"{prefix}_slot_seconds.csv"
+    write_series_csv(series_csv, rows, min(t['start'] for t in tasks))
+    write_summary_csv(summary_csv, summary)
+
+    print(f"\n=== {summary['experiment_id']} (slowstart {summary['slowstart_value']}) ===")
+    print(f"Makespan: {summary['makespan_sec']}s | peak containers: {summary['peak_containers']} "
+          f"| avg containers: {summary['avg_containers']}")
+    print(f"Map slot-seconds: {summary['map_slot_sec']} | Reduce slot-seconds: {summary['reduce_slot_sec']}")
+    print(f"Idle reducer slot-seconds: {summary['idle_reducer_slot_sec']} "
+          f"({summary['idle_reducer_pct']}% of reduce slot time)")
+    print(f"Series: {series_csv}")
+    print(f"Summary: {summary_csv}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep-line concurrency and slot-seconds analysis')
+    parser.add_argument('paths', nargs='+', help='Timeline CSV files or directories containing them')
+    args = parser.parse_args()
+
+    csv_files = []
+    for path in args.paths:
+        csv_files.extend(find_timeline_csvs(path))
+    if not csv_files:
+        print("Error: no timeline CSVs found")
+        sys.exit(1)
+
+    for csv_file in csv_files:
+        process_file(csv_file)
+
+
+if __name__ == '__main__':
+    main()
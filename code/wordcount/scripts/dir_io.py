@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Per-Directory I/O Attribution for Hadoop Local Dirs
+setup_hadoop_disk.sh gives Hadoop its own disk, but the system metrics
+only carry node-wide disk reads/writes, so map spills, shuffle fetch
+writes (YARN local dirs) and HDFS block I/O cannot be told apart. This
+maps every configured data/local/log directory (disk_watchdog.hadoop_dirs,
+plus the metrics dirs) to its block device through /proc/self/mountinfo and
+reports each device's throughput, IOPS, await, utilisation and queue depth
+from /proc/diskstats, labelled with the Hadoop roles stored on it.
+Usage:
+  python3 dir_io.py map [--conf-dir DIR] [--dir ROLE=PATH ...]
+  python3 dir_io.py record <node_name> [interval] [--output system_metrics/<node>_dirio_<ts>.csv] [--duration SEC]
+  python3 dir_io.py summary <dirio.csv ...>
+  python3 proc_sampler.py <node_name> [interval] --dir-io system_metrics/<node>_dirio_<ts>.csv
+
+Roles: hdfs_data, hdfs_name, yarn_local (map spills, shuffle fetch
+writes), yarn_logs, mr_local, hadoop_tmp, hadoop_logs, metrics. Roles that
+share a device are reported together; disk_util_percent is the whole
+disk's utilisation when the device is a partition of it.
+"""
+
+import argparse
+import csv
+import glob
+import os
+import signal
+import sys
+import time
+
+from disk_watchdog import watched_dirs
+from proc_sampler import SECTOR_BYTES, MonotonicSchedule, read_file
+from rate_engine import RateEngine
+from sampler_overhead import SelfMonitor, overhead_path
+
+DIRIO_HEADER = ['timestamp', 'node_name', 'interval_sec', 'device', 'disk', 'mount', 'roles', 'dirs',
+                'reads_s', 'writes_s', 'read_mb_s', 'write_mb_s', 'r_await_ms', 'w_await_ms', 'await_ms',
+                'util_percent', 'queue_depth', 'disk_util_percent']
+# /proc/diskstats columns (0-based): reads, sectors read, ms reading, writes, sectors written, ms writing,
+# ms doing I/O, weighted ms
+DISKSTAT_FIELDS = {'reads': 3, 'sectors_read': 5, 'read_ms': 6, 'writes': 7, 'sectors_written': 9,
+                   'write_ms': 10, 'io_ticks': 12, 'weighted_ms': 13}
+
+
+def mountinfo():
+    """[(mount point, 'major:minor', source)] from /proc/self/mountinfo, in mount order"""
+    mounts = []
+    for line in read_file('/proc/self/mountinfo').splitlines():
+        parts = line.split()
+        if ' - ' not in line or len(parts) < 5:
+            continue
+        tail = line.split(' - ', 1)[1].split()
+        mounts.append((parts[4].replace('\\040', ' '), parts[2], tail[1] if len(tail) > 1 else ''))
+    return mounts
+
+
+def block_name(majmin):
+    """Kernel name of a block device ('vdb1') from 'major:minor', or None"""
+    path = f'/sys/dev/block/{majmin}'
+    return os.path.basename(os.path.realpath(path)) if os.path.exists(path) else None
+
+
+def parent_disk(name):
+    """Whole disk a partition belongs to ('vdb' for 'vdb1'); the name itself for a whole disk"""
+    path = os.path.realpath(f'/sys/class/block/{name}')
+    return os.path.basename(os.path.dirname(path)) if os.path.exists(os.path.join(path, 'partition')) else name
+
+
+def device_for(path, mounts):
+    """(device, mount point) holding path: the longest mount point prefix (the last one mounted wins)"""
+    real = os.path.realpath(path)
+    best = None
+    for mount, majmin, source in mounts:
+        if real == mount or real.startswith(mount.rstrip('/') + '/'):
+            if best is None or len(mount) >= len(best[0]):
+                best = (mount, majmin, source)
+    if best is None:
+        return None, None
+    mount, majmin, source = best
+    name = block_name(majmin) if not majmin.startswith('0:') else None
+    if name is None and source.startswith('/dev/'):
+        # btrfs and friends report an anonymous 0:N device; the mount source is the real one
+        try:
+            rdev = os.stat(source).st_rdev
+            name = block_name(f'{os.major(rdev)}:{os.minor(rdev)}')
+        except OSError:
+            pass
+    return name, mount
+
+
+def map_dirs(dirs):
+    """Group (role, path) by block device: [{'device', 'disk', 'mount', 'roles', 'dirs'}]; unmapped dirs skipped"""
+    mounts = mountinfo()
+    devices = {}
+    for role, path in dirs:
+        name, mount = device_for(path, mounts)
+        if name is None:
+            continue
+        entry = devices.setdefault(name, {'device': name, 'disk': parent_disk(name), 'mount': mount,
+                                          'roles': [], 'dirs': []})
+        if role not in entry['roles']:
+            entry['roles'].append(role)
+        if path not in entry['dirs']:
+            entry['dirs'].append(path)
+    return sorted(devices.values(), key=lambda d: d['device'])
+
+
+def diskstats():
+    """{device: {field: value}} for every line of /proc/diskstats"""
+    stats = {}
+    for line in read_file('/proc/diskstats').splitlines():
+        parts = line.split()
+        if len(parts) >= 14:
+            stats[parts[2]] = {field: int(parts[i]) for field, i in DISKSTAT_FIELDS.items()}
+    return stats
+
+
+class DirIO:
+    """Per-device iostat-style rates for the devices under the Hadoop directories"""
+
+    def __init__(self, node_name, dirs=None, engine=None):
+        self.node_name = node_name
+        self.devices = map_dirs(watched_dirs() if dirs is None else dirs)
+        self.engine = engine or RateEngine()
+        self.sample()  # baseline
+
+    def _deltas(self, now, name, stats):
+        results = {field: self.engine.delta((name, field), now, value) for field, value in stats.items()}
+        if any(result is None for result in results.values()):
+            return None, None
+        return {field: result[0] for field, result in results.items()}, next(iter(results.values()))[1]
+
+    def sample(self, now=None):
+        """One row per device (empty on the first call and after a gap)"""
+        now = time.time() if now is None else now
+        stats = diskstats()
+        disk_util = {}
+        for disk in {d['disk'] for d in self.devices if d['disk'] != d['device']}:
+            if disk in stats:
+                delta, elapsed = self._deltas(now, f'{disk}/disk', {'io_ticks': stats[disk]['io_ticks']})
+                if delta:
+                    disk_util[disk] = min(delta['io_ticks'] / (elapsed * 10), 100.0)
+        rows = []
+        for d in self.devices:
+            if d['device'] not in stats:
+                continue
+            delta, elapsed = self._deltas(now, d['device'], stats[d['device']])
+            if delta is None:
+                continue
+            ios = delta['reads'] + delta['writes']
+            util = min(delta['io_ticks'] / (elapsed * 10), 100.0)
+            rows.append([
+                f"{now:.3f}", self.node_name, f"{elapsed:.3f}", d['device'], d['disk'], d['mount'],
+                ';'.join(d['roles']), ';'.join(d['dirs']),
+                f"{delta['reads'] / elapsed:.2f}", f"{delta['writes'] / elapsed:.2f}",
+                f"{delta['sectors_read'] * SECTOR_BYTES / 1048576 / elapsed:.3f}",
+                f"{delta['sectors_written'] * SECTOR_BYTES / 1048576 / elapsed:.3f}",
+                f"{delta['read_ms'] / delta['reads']:.2f}" if delta['reads'] else '0.00',
+                f"{delta['write_ms'] / delta['writes']:.2f}" if delta['writes'] else '0.00',
+                f"{(delta['read_ms'] + delta['write_ms']) / ios:.2f}" if ios else '0.00',
+                f"{util:.1f}", f"{delta['weighted_ms'] / (elapsed * 1000):.2f}",
+                f"{disk_util.get(d['disk'], util):.1f}"])
+        return rows
+
+
+def parse_dirs(specs):
+    extra = []
+    for spec in specs or []:
+        role, _, path = spec.partition('=')
+        extra.append((role, path) if path else ('extra', role))
+    return extra
+
+
+def cmd_map(args):
+    dirs = watched_dirs(args.conf_dir, parse_dirs(args.dir))
+    mounts = mountinfo()
+    print(f"{'role':<12} {'directory':<40} {'mount':<16} {'device':<10} disk")
+    for role, path in dirs:
+        name, mount = device_for(path, mounts)
+        print(f"{role:<12} {path:<40} {mount or '-':<16} {name or '(none)':<10} {parent_disk(name) if name else '-'}")
+    return 0
+
+
+def cmd_record(args):
+    if args.interval <= 0:
+        print("Error: interval must be positive")
+        return 1
+    if not os.path.exists('/proc/diskstats'):
+        print("Error: /proc/diskstats is not available on this system")
+        return 1
+    sampler = DirIO(args.node_name, watched_dirs(args.conf_dir, parse_dirs(args.dir)),
+                    RateEngine(max_gap=max(60.0, args.interval * 3)))
+    if not sampler.devices:
+        print("Error: none of the Hadoop or metrics directories is on a block device")
+        return 1
+    output = args.output or f"system_metrics/{args.node_name}_dirio_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stop.append(True))
+
+    print(f"Directory I/O collection started. Output: {output}")
+    for d in sampler.devices:
+        print(f"  {d['device']:<10} {d['mount']:<16} {', '.join(d['roles'])}")
+    overhead = None
+    if not args.no_overhead:
+        overhead = SelfMonitor(args.node_name, 'dir_io', args.interval,
+                               overhead_path(os.path.dirname(output) or '.', args.node_name, 'dir_io'))
+    schedule = MonotonicSchedule(args.interval)
+    with open(output, 'w', newline='', buffering=1) as f:
+        writer = csv.writer(f)
+        writer.writerow(DIRIO_HEADER)
+        while not stop:
+            due = schedule.wait()
+            if stop:
+                break
+            if overhead:
+                overhead.tick(due, schedule.missed)
+            writer.writerows(sampler.sample())
+            if args.duration and schedule.tick * args.interval >= args.duration:
+                break
+    if overhead:
+        overhead.close(schedule.missed)
+    return 0
+
+
+def cmd_summary(args):
+    paths = sorted({p for pattern in args.inputs for p in glob.glob(pattern)})
+    if not paths:
+        print(f"Error: No files match: {' '.join(args.inputs)}")
+        return 1
+    groups = {}
+    for path in paths:
+        with open(path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                groups.setdefault((row['node_name'], row['device'], row['roles']), []).append(row)
+
+    def mean(rows, key):
+        return sum(float(r[key]) for r in rows) / len(rows)
+
+    print(f"{'node':<10} {'device':<8} {'util%':>6} {'max%':>6} {'r MB/s':>7} {'w MB/s':>7} {'IOPS':>7} "
+          f"{'await':>7} {'queue':>6}  roles")
+    busiest = None
+    for (node, device, roles), rows in sorted(groups.items()):
+        util = mean(rows, 'util_percent')
+        peak = max(float(r['util_percent']) for r in rows)
+        iops = mean(rows, 'reads_s') + mean(rows, 'writes_s')
+        print(f"{node:<10} {device:<8} {util:>6.1f} {peak:>6.1f} {mean(rows, 'read_mb_s'):>7.2f} "
+              f"{mean(rows, 'write_mb_s'):>7.2f} {iops:>7.1f} {mean(rows, 'await_ms'):>6.1f}ms "
+              f"{mean(rows, 'queue_depth'):>6.2f}  {roles.replace(';', ', ')}")
+        if busiest is None or util > busiest[0]:
+            busiest = (util, node, device, roles)
+    if busiest:
+        print(f"\nBusiest: {busiest[3].replace(';', ', ')} on {busiest[1]}:{busiest[2]} "
+              f"({busiest[0]:.1f}% mean utilisation)")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-directory I/O attribution for Hadoop local dirs')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def directories(sub):
+        sub.add_argument('--conf-dir', default=None, help='Hadoop configuration directory (default: $HADOOP_CONF_DIR)')
+        sub.add_argument('--dir', action='append', metavar='ROLE=PATH', help='Also attribute this directory')
+
+    map_cmd = subparsers.add_parser('map', help='Show which device each Hadoop directory is on')
+    directories(map_cmd)
+    map_cmd.set_defaults(func=cmd_map)
+
+    record = subparsers.add_parser('record', help='Sample per-device I/O for the Hadoop directories')
+    record.add_argument('node_name')
+    record.add_argument('interval', nargs='?', type=float, default=1.0, help='Seconds between samples (default: 1)')
+    record.add_argument('--output', default=None,
+                        help='CSV path (default: system_metrics/<node_name>_dirio_<YYYYMMDD_HHMMSS>.csv)')
+    record.add_argument('--duration', type=float, default=None, help='Stop after this many seconds')
+    record.add_argument('--no-overhead', action='store_true', help="Don't record the sampler's own CPU/RSS/jitter")
+    directories(record)
+    record.set_defaults(func=cmd_record)
+
+    summary = subparsers.add_parser('summary', help='Mean utilisation, throughput and await per device and role')
+    summary.add_argument('inputs', nargs='+', help='dirio CSV files or glob patterns')
+    summary.set_defaults(func=cmd_summary)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
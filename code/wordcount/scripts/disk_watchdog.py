@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+"""
+Disk-Pressure Watchdog for Experiment Batches
+Runs that died from a full /dev/vda3 (inputs, map spills, logs) were only
+ever fixed afterwards with cleanup_disk.sh. The watchdog samples statvfs
+for every filesystem holding an HDFS data, YARN local/log, Hadoop tmp or
+metrics directory, fits the fill rate over a sliding window and predicts
+time-to-full. It publishes ok / pause / abort in a state file:
+batch_experiment.sh waits before the next experiment while it says pause,
+and stops the batch if it still says abort; --kill-jobs kills the running
+YARN application on every transition into abort (a time-to-full abort can
+clear back to pause and the batch carry on, so one batch may see several). Under pressure (or via `retain`) it deletes
+old metrics files that package_store.py has already stored.
+Usage:
+  python3 disk_watchdog.py watch [--state metrics/.disk_watchdog.json] [--output CSV] [--kill-jobs] [--retention]
+  python3 disk_watchdog.py gate [--state FILE] [--max-wait 1800]     # exit 0 ok, 2 abort, 3 still paused
+  python3 disk_watchdog.py status
+  python3 disk_watchdog.py retain [--apply] [--store results_store]
+
+Directories come from $HADOOP_CONF_DIR (core/hdfs/yarn/mapred-site.xml,
+Hadoop defaults otherwise) plus metrics/, system_metrics/,
+mapreduce_metrics/ and other_node_monitoring/ under the working directory;
+--dir ROLE=PATH adds more.
+"""
+
+import argparse
+import csv
+import fnmatch
+import getpass
+import glob
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+
+from history_cache import atomic_write
+from package_store import DEFAULT_STORE, PackageStore
+
+DEFAULT_STATE = 'metrics/.disk_watchdog.json'
+METRICS_DIRS = ['metrics', 'system_metrics', 'mapreduce_metrics', 'other_node_monitoring']
+SAMPLE_HEADER = ['timestamp', 'node_name', 'mount', 'device', 'roles', 'total_gb', 'avail_gb', 'used_percent',
+                 'fill_mb_s', 'time_to_full_sec', 'status']
+# (property, file, role, default); defaults as in Hadoop 3 *-default.xml
+HADOOP_DIR_PROPERTIES = [
+    ('hadoop.tmp.dir', 'core-site.xml', 'hadoop_tmp', '/tmp/hadoop-${user.name}'),
+    ('dfs.datanode.data.dir', 'hdfs-site.xml', 'hdfs_data', 'file://${hadoop.tmp.dir}/dfs/data'),
+    ('dfs.namenode.name.dir', 'hdfs-site.xml', 'hdfs_name', 'file://${hadoop.tmp.dir}/dfs/name'),
+    ('yarn.nodemanager.local-dirs', 'yarn-site.xml', 'yarn_local', '${hadoop.tmp.dir}/nm-local-dir'),
+    ('yarn.nodemanager.log-dirs', 'yarn-site.xml', 'yarn_logs', '${yarn.log.dir}/userlogs'),
+    ('mapreduce.cluster.local.dir', 'mapred-site.xml', 'mr_local', '${hadoop.tmp.dir}/mapred/local'),
+]
+# (pattern relative to the working directory, minimum age in days, only if package_store.py holds a copy)
+RETENTION_RULES = [
+    ('system_metrics/*.csv', 7, True),
+    ('mapreduce_metrics/*', 7, True),
+    ('other_node_monitoring/*/*.csv', 7, True),
+    ('other_node_monitoring/*/*/*', 7, True),
+    ('metrics/*.csv', 14, True),
+    ('metrics/*.log', 14, True),
+    ('metrics/*.txt', 14, True),
+    ('metrics/.run_cache/*', 3, False),
+]
+GB = 1 << 30
+VAR_RE = re.compile(r'\$\{([^}]+)\}')
+
+
+def hadoop_home():
+    return os.environ.get('HADOOP_HOME', '/opt/hadoop')
+
+
+def hadoop_conf_dir():
+    return os.environ.get('HADOOP_CONF_DIR', os.path.join(hadoop_home(), 'etc', 'hadoop'))
+
+
+def read_site(path):
+    """{name: value} from a Hadoop *-site.xml ({} if missing or unreadable)"""
+    try:
+        root = ET.parse(path).getroot()
+    except (OSError, ET.ParseError):
+        return {}
+    props = {}
+    for prop in root.iter('property'):
+        name, value = prop.findtext('name'), prop.findtext('value')
+        if name and value is not None:
+            props[name.strip()] = value.strip()
+    return props
+
+
+def hadoop_dirs(conf_dir=None):
+    """
+    [(role, path)] of the configured Hadoop storage directories
+
+    ${var} references are expanded from the configuration itself (like
+    Hadoop's Configuration); file:// and [DISK]-style prefixes are removed.
+    """
+    conf_dir = conf_dir or hadoop_conf_dir()
+    props = {'user.name': getpass.getuser(), 'yarn.log.dir': os.path.join(hadoop_home(), 'logs')}
+    for site in sorted({f for _, f, _, _ in HADOOP_DIR_PROPERTIES}):
+        props.update(read_site(os.path.join(conf_dir, site)))
+
+    def expand(value, depth=0):
+        if depth > 10:
+            return value
+        expanded = VAR_RE.sub(lambda m: props.get(m.group(1), os.environ.get(m.group(1), m.group(0))), value)
+        return expanded if expanded == value else expand(expanded, depth + 1)
+
+    dirs = []
+    for name, _, role, default in HADOOP_DIR_PROPERTIES:
+        for entry in expand(props.get(name, default)).split(','):
+            entry = re.sub(r'^\[\w+\]', '', entry.strip())
+            entry = re.sub(r'^file://', '', entry)
+            if entry and (role, entry) not in dirs:
+                dirs.append((role, entry))
+    return dirs
+
+
+def watched_dirs(conf_dir=None, extra=()):
+    """[(role, path)] that exist on this node: Hadoop dirs, daemon logs, metrics dirs, then --dir additions"""
+    dirs = (hadoop_dirs(conf_dir) + [('hadoop_logs', os.path.join(hadoop_home(), 'logs'))]
+            + [('metrics', os.path.abspath(d)) for d in METRICS_DIRS] + list(extra))
+    return [(role, path) for role, path in dirs if os.path.isdir(path)]
+
+
+def mount_point(path):
+    path = os.path.realpath(path)
+    while not os.path.ismount(path):
+        path = os.path.dirname(path)
+    return path
+
+
+def mount_devices():
+    """{mount point: device} from /proc/self/mounts"""
+    devices = {}
+    try:
+        with open('/proc/self/mounts', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2:
+                    devices[parts[1].replace('\\040', ' ')] = parts[0]
+    except OSError:
+        pass
+    return devices
+
+
+def filesystems(dirs):
+    """Group dirs by filesystem: [{'mount', 'device', 'roles', 'paths', 'dev'}], one statvfs each"""
+    devices = mount_devices()
+    groups = {}
+    for role, path in dirs:
+        dev = os.stat(path).st_dev
+        if dev not in groups:
+            mount = mount_point(path)
+            groups[dev] = {'dev': dev, 'mount': mount, 'device': devices.get(mount, ''), 'roles': [], 'paths': []}
+        if role not in groups[dev]['roles']:
+            groups[dev]['roles'].append(role)
+        groups[dev]['paths'].append(path)
+    return sorted(groups.values(), key=lambda g: g['mount'])
+
+
+def fill_rate(points):
+    """Least-squares slope of used bytes over time (bytes/s) for [(t, used)]"""
+    if len(points) < 2:
+        return 0.0
+    n = len(points)
+    mean_t = sum(t for t, _ in points) / n
+    mean_u = sum(u for _, u in points) / n
+    var = sum((t - mean_t) ** 2 for t, _ in points)
+    if var <= 0:
+        return 0.0
+    return sum((t - mean_t) * (u - mean_u) for t, u in points) / var
+
+
+class DiskWatchdog:
+    """
+    Fill-rate tracking and ok/pause/abort decisions for a set of filesystems
+
+    A filesystem pauses the batch when its free space drops below pause_free
+    percent or it is predicted full within pause_ttf seconds, and aborts it
+    below abort_free percent / abort_gb GB. A prediction within abort_ttf
+    seconds only aborts once free space is also below pause_free percent or
+    the prediction has stayed that low for a whole window (a burst of spill
+    writes on a roomy disk is a pause, not a reason to kill the job). A
+    pause is only lifted once free space is back above resume_free percent
+    and the prediction exceeds twice pause_ttf. The worst filesystem wins;
+    a threshold abort is sticky, a time-to-full abort is not.
+    """
+
+    def __init__(self, fs, window=60.0, pause_free=10.0, pause_ttf=900.0, abort_free=2.0, abort_gb=1.0,
+                 abort_ttf=120.0, resume_free=15.0):
+        self.fs = fs
+        self.window = window
+        self.pause_free, self.pause_ttf = pause_free, pause_ttf
+        self.abort_free, self.abort_gb, self.abort_ttf = abort_free, abort_gb, abort_ttf
+        self.resume_free = resume_free
+        self.history = {f['mount']: deque() for f in fs}
+        self.ttf_low_since = {}
+        self.latched = False
+        self.status = 'ok'
+        self.reason = ''
+
+    def sample(self, now=None):
+        """statvfs every filesystem; returns one reading dict per filesystem"""
+        now = time.time() if now is None else now
+        readings = []
+        for f in self.fs:
+            st = os.statvfs(f['mount'])
+            total = st.f_blocks * st.f_frsize
+            avail = st.f_bavail * st.f_frsize
+            # Fill towards the non-root limit: used is everything not available to us
+            readings.append(self.observe(f, now, total, total - avail, avail))
+        return readings
+
+    def observe(self, f, now, total, used, avail):
+        history = self.history[f['mount']]
+        history.append((now, used))
+        while history and now - history[0][0] > self.window:
+            history.popleft()
+        rate = fill_rate(history)
+        free_pct = avail / total * 100 if total else 100.0
+        ttf = avail / rate if rate > 0 else None
+        if ttf is not None and ttf < self.abort_ttf:
+            self.ttf_low_since.setdefault(f['mount'], now)
+        else:
+            self.ttf_low_since.pop(f['mount'], None)
+        cause = ''
+        if free_pct < self.abort_free or avail < self.abort_gb * GB:
+            level, cause = 'abort', 'threshold'
+        elif f['mount'] in self.ttf_low_since and (free_pct < self.pause_free
+                                                   or now - self.ttf_low_since[f['mount']] >= self.window):
+            level, cause = 'abort', 'time_to_full'
+        elif free_pct < self.pause_free or (ttf is not None and ttf < self.pause_ttf):
+            level = 'pause'
+        elif free_pct < self.resume_free or (ttf is not None and ttf < 2 * self.pause_ttf):
+            level = 'hold'  # between the pause and resume thresholds: keeps a pause, starts nothing new
+        else:
+            level = 'ok'
+        return {'mount': f['mount'], 'device': f['device'], 'roles': f['roles'], 'total': total, 'avail': avail,
+                'free_percent': free_pct, 'fill_rate': rate, 'time_to_full': ttf, 'level': level, 'cause': cause}
+
+    def decide(self, readings):
+        """Fold per-filesystem levels into the batch status; returns (status, reason)"""
+        rank = {'ok': 0, 'hold': 1, 'pause': 2, 'abort': 3}
+        worst = max(readings, key=lambda r: rank[r['level']], default=None)
+        if worst is None:
+            return self.status, self.reason
+        if any(r['cause'] == 'threshold' for r in readings):
+            self.latched = True  # sticky: a batch stopped for a full disk needs a person
+        if worst['level'] == 'abort' or self.latched:
+            self.status = 'abort'
+        elif worst['level'] == 'pause' or (worst['level'] == 'hold' and self.status in ('pause', 'abort')):
+            self.status = 'pause'
+        else:
+            self.status = 'ok'
+        if worst['level'] != 'ok':
+            self.reason = describe(worst)
+        elif self.status == 'ok':
+            self.reason = ''
+        return self.status, self.reason
+
+
+def describe(reading):
+    ttf = reading['time_to_full']
+    prediction = f", full in {ttf / 60:.1f} min at {reading['fill_rate'] / 1048576:.1f} MB/s" if ttf else ''
+    return (f"{reading['mount']} ({reading['device'] or '?'}; {','.join(reading['roles'])}): "
+            f"{reading['avail'] / GB:.1f} GB free ({reading['free_percent']:.1f}%){prediction}")
+
+
+def kill_yarn_jobs():
+    """Kill this user's RUNNING/ACCEPTED YARN applications; returns their IDs"""
+    try:
+        result = subprocess.run(['yarn', 'application', '-list', '-appStates', 'RUNNING,ACCEPTED'],
+                                capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return []
+    user = getpass.getuser()
+    killed = []
+    for line in result.stdout.splitlines():
+        fields = line.split('\t')
+        if fields and fields[0].strip().startswith('application_') and (len(fields) < 4 or fields[3].strip() == user):
+            app = fields[0].strip()
+            subprocess.run(['yarn', 'application', '-kill', app], capture_output=True, timeout=120)
+            killed.append(app)
+    return killed
+
+
+def packaged_files(store_root):
+    """{(path, size, mtime_ns)} of every file held by a package_store.py manifest"""
+    store = PackageStore(store_root)
+    held = set()
+    for manifest in store.manifests():
+        for entry in manifest['files']:
+            if store.has(entry['sha256']):
+                held.add((entry['path'], entry['size'], entry['mtime_ns']))
+    return held
+
+
+def retention_candidates(rules=RETENTION_RULES, store_root=DEFAULT_STORE, now=None):
+    """[(path, size, rule pattern)] that the retention rules allow deleting"""
+    now = time.time() if now is None else now
+    held = None
+    candidates = []
+    seen = set()
+    for pattern, days, needs_package in rules:
+        for path in sorted(glob.glob(pattern)):
+            path = path.replace(os.sep, '/')
+            if path in seen or not os.path.isfile(path) or fnmatch.fnmatch(os.path.basename(path), '.tmp-*'):
+                continue
+            stat = os.stat(path)
+            if now - stat.st_mtime < days * 86400:
+                continue
+            if needs_package:
+                if held is None:
+                    held = packaged_files(store_root)
+                if (path, stat.st_size, stat.st_mtime_ns) not in held:
+                    continue
+            seen.add(path)
+            candidates.append((path, stat.st_size, pattern))
+    return candidates
+
+
+def apply_retention(candidates):
+    """Delete candidates; returns bytes freed"""
+    freed = 0
+    for path, size, _ in candidates:
+        try:
+            os.unlink(path)
+            freed += size
+        except OSError:
+            pass
+    return freed
+
+
+def build_watchdog(args):
+    extra = []
+    for spec in args.dir or []:
+        role, _, path = spec.partition('=')
+        extra.append((role, path) if path else ('extra', role))
+    fs = filesystems(watched_dirs(args.conf_dir, extra))
+    return DiskWatchdog(fs, args.window, args.pause_free, args.pause_ttf, args.abort_free, args.abort_gb,
+                        args.abort_ttf, args.resume_free)
+
+
+def write_state(path, status, reason, readings, killed=()):
+    state = {'status': status, 'reason': reason, 'updated': time.time(), 'pid': os.getpid(),
+             'killed': list(killed), 'filesystems': readings}
+    atomic_write(os.path.abspath(path), json.dumps(state, indent=1).encode('utf-8'))
+
+
+def cmd_watch(args):
+    watchdog = build_watchdog(args)
+    if not watchdog.fs:
+        print("Error: none of the watched directories exist")
+        return 1
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stop.append(True))
+    print(f"Disk watchdog started; state: {args.state}")
+    for f in watchdog.fs:
+        print(f"  {f['mount']:<20} {f['device'] or '?':<14} {', '.join(f['roles'])}")
+
+    out = writer = None
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        out = open(args.output, 'w', newline='', buffering=1)
+        writer = csv.writer(out)
+        writer.writerow(SAMPLE_HEADER)
+    killed = []
+    last_retention = 0.0
+    previous = None
+    started = time.time()
+    while not stop:
+        now = time.time()
+        readings = watchdog.sample(now)
+        status, reason = watchdog.decide(readings)
+        if status != 'ok' and args.retention and now - last_retention >= args.retention_every:
+            last_retention = now
+            candidates = retention_candidates(store_root=args.store)
+            if candidates:
+                freed = apply_retention(candidates)
+                print(f"Retention: deleted {len(candidates)} packaged metrics file(s), {freed / 1048576:.1f} MB")
+        if status == 'abort' and previous != 'abort' and args.kill_jobs:
+            apps = kill_yarn_jobs()
+            killed.extend(apps)
+            print(f"Abort: killed YARN application(s): {', '.join(apps) or 'none running'}")
+        if status != previous:
+            print(f"{time.strftime('%H:%M:%S')} {status}{': ' + reason if reason else ''}")
+            previous = status
+        write_state(args.state, status, reason, readings, killed)
+        if writer:
+            for r in readings:
+                writer.writerow([f"{now:.3f}", args.node_name, r['mount'], r['device'], ';'.join(r['roles']),
+                                 f"{r['total'] / GB:.2f}", f"{r['avail'] / GB:.2f}", f"{100 - r['free_percent']:.2f}",
+                                 f"{r['fill_rate'] / 1048576:.3f}",
+                                 f"{r['time_to_full']:.0f}" if r['time_to_full'] else '', r['level']])
+        if args.duration and now - started >= args.duration:
+            break
+        time.sleep(args.interval)
+    if out:
+        out.close()
+    print(f"Disk watchdog stopped ({previous})")
+    return 0
+
+
+def read_state(path, max_age):
+    """The watchdog's state dict, or None if missing, stale or its process is gone"""
+    try:
+        with open(path, 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - state.get('updated', 0) > max_age or not os.path.exists(f"/proc/{state.get('pid')}"):
+        return None
+    return state
+
+
+def cmd_gate(args):
+    """Block while the watchdog says pause; exit 0 to go ahead, 2 on abort, 3 if still paused at --max-wait"""
+    deadline = time.monotonic() + args.max_wait
+    announced = False
+    while True:
+        state = read_state(args.state, args.stale)
+        if state is None:
+            # No live watchdog: judge free space once, without a fill rate
+            watchdog = build_watchdog(args)
+            status, reason = watchdog.decide(watchdog.sample())
+        else:
+            status, reason = state['status'], state['reason']
+        if status == 'abort':
+            print(f"Disk watchdog: abort: {reason}")
+            return 2
+        if status != 'pause':
+            if announced:
+                print("Disk watchdog: resumed")
+            return 0
+        if time.monotonic() >= deadline:
+            print(f"Disk watchdog: still paused after {args.max_wait:g}s: {reason}")
+            return 3
+        if not announced:
+            print(f"Disk watchdog: paused: {reason}")
+            announced = True
+        time.sleep(args.poll)
+
+
+def cmd_status(args):
+    state = read_state(args.state, args.stale)
+    if state is None:
+        watchdog = build_watchdog(args)
+        readings = watchdog.sample()
+        status, reason = watchdog.decide(readings)
+        print("No live watchdog; free space now (no fill rate):")
+    else:
+        readings, status, reason = state['filesystems'], state['status'], state['reason']
+        print(f"Watchdog pid {state['pid']}, updated {time.strftime('%H:%M:%S', time.localtime(state['updated']))}")
+    print(f"{'mount':<20} {'device':<14} {'free':>9} {'free%':>6} {'fill':>10} {'full in':>9}  roles")
+    for r in readings:
+        ttf = f"{r['time_to_full'] / 60:.1f}min" if r['time_to_full'] else '-'
+        print(f"{r['mount']:<20} {r['device'] or '?':<14} {r['avail'] / GB:>7.1f}GB {r['free_percent']:>5.1f}% "
+              f"{r['fill_rate'] / 1048576:>6.2f}MB/s {ttf:>9}  {','.join(r['roles'])}")
+    print(f"Status: {status}{' (' + reason + ')' if reason else ''}")
+    return 0
+
+
+def cmd_retain(args):
+    candidates = retention_candidates(store_root=args.store)
+    total = sum(size for _, size, _ in candidates)
+    for path, size, pattern in candidates:
+        print(f"{'delete' if args.apply else 'would delete'} {path} ({size / 1048576:.1f} MB, {pattern})")
+    if args.apply:
+        freed = apply_retention(candidates)
+        print(f"Deleted {len(candidates)} file(s), {freed / 1048576:.1f} MB freed")
+    else:
+        print(f"{len(candidates)} file(s), {total / 1048576:.1f} MB; rerun with --apply to delete")
+    return 0
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--state', default=DEFAULT_STATE, help=f'State file (default: {DEFAULT_STATE})')
+    common.add_argument('--conf-dir', default=None, help='Hadoop configuration directory (default: $HADOOP_CONF_DIR)')
+    common.add_argument('--dir', action='append', metavar='ROLE=PATH', help='Also watch this directory')
+    common.add_argument('--window', type=float, default=60.0, help='Seconds of history for the fill rate')
+    common.add_argument('--pause-free', type=float, default=10.0, help='Pause below this %% free (default: 10)')
+    common.add_argument('--pause-ttf', type=float, default=900.0, help='Pause when full within N seconds (default: 900)')
+    common.add_argument('--abort-free', type=float, default=2.0, help='Abort below this %% free (default: 2)')
+    common.add_argument('--abort-gb', type=float, default=1.0, help='Abort below this many GB free (default: 1)')
+    common.add_argument('--abort-ttf', type=float, default=120.0,
+                        help='Abort when full within N seconds and below --pause-free, or for a whole --window '
+                             '(default: 120)')
+    common.add_argument('--resume-free', type=float, default=15.0, help='Lift a pause above this %% free (default: 15)')
+    common.add_argument('--stale', type=float, default=30.0, help='Ignore a state file older than N seconds')
+    common.add_argument('--store', default=DEFAULT_STORE, help=f'package_store.py store (default: {DEFAULT_STORE})')
+    parser = argparse.ArgumentParser(description='Disk-pressure watchdog for experiment batches')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    watch = subparsers.add_parser('watch', parents=[common], help='Sample the filesystems and publish ok/pause/abort')
+    watch.add_argument('node_name', nargs='?', default=os.uname().nodename)
+    watch.add_argument('--interval', type=float, default=5.0, help='Seconds between samples (default: 5)')
+    watch.add_argument('--output', default=None, help='Also write every reading to this CSV')
+    watch.add_argument('--duration', type=float, default=None, help='Stop after this many seconds')
+    watch.add_argument('--kill-jobs', action='store_true', help="On abort, kill this user's running YARN applications")
+    watch.add_argument('--retention', action='store_true',
+                       help='Under pressure, delete packaged metrics files past their retention age')
+    watch.add_argument('--retention-every', type=float, default=300.0, help='Seconds between retention passes')
+    watch.set_defaults(func=cmd_watch)
+
+    gate = subparsers.add_parser('gate', parents=[common], help='Wait while paused; exit 0 ok, 2 abort, 3 still paused')
+    gate.add_argument('--max-wait', type=float, default=1800.0, help='Give up after N seconds paused (default: 1800)')
+    gate.add_argument('--poll', type=float, default=10.0, help='Seconds between checks (default: 10)')
+    gate.set_defaults(func=cmd_gate)
+
+    status = subparsers.add_parser('status', parents=[common], help='Show free space, fill rate and time-to-full')
+    status.set_defaults(func=cmd_status)
+
+    retain = subparsers.add_parser('retain', parents=[common], help='List (or --apply) metrics files past their retention age')
+    retain.add_argument('--apply', action='store_true', help='Delete them')
+    retain.set_defaults(func=cmd_retain)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Lazy Experiment-Run Loader
+Indexes a results directory, experiment_results_*.zip or package_store.py
+manifest without extracting it and loads each artifact (summary, timeline, system metrics, pidstat) on
+first access, straight from the archive member. Parsed artifacts are
+memoized per member and cached on disk across sessions, keyed by the
+member's content fingerprint, so reopening an archive costs one zip
+directory read.
+Usage:
+  python3 experiment_run.py <results_dir_or_zip_or_manifest> [experiment_id] [--cache-dir metrics/.run_cache] [--no-cache]
+
+In Python:
+    results = ExperimentResults('experiment_results_20251128_140236_5gb_wordcount.zip')
+    for run in results.runs():
+        print(run.experiment_id, run.slowstart, len(run.timeline), len(run.system_metrics))
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+import zipfile
+from datetime import datetime, timedelta, timezone
+from functools import cached_property
+
+from convert_pidstat_to_csv import parse_pidstat_line
+from history_cache import atomic_write
+from merge_metrics import TimeParser, node_for
+from package_store import PackageStore
+from rate_engine import RateEngine, network_in_bytes, shuffle_rates
+from sampler_overhead import DEFAULT_CPU_THRESHOLD, DEFAULT_JITTER_RATIO, overhead_warnings
+from timeline_io import read_timeline, to_seconds
+
+DEFAULT_CACHE_DIR = os.environ.get('MR_RUN_CACHE', 'metrics/.run_cache')
+# Bump when a parser's output changes so stale cache entries are ignored
+PARSER_VERSION = '1'
+DATASET_RE = re.compile(r'experiment_results_\d{8}_\d{6}_(.+?)(?:\.zip)?$')
+SUMMARY_RE = re.compile(r'(^|/)(batch_summary_.*|experiment_.*_slowstart_[\d.]+)\.csv$')
+ARTIFACT_RE = re.compile(r'(^|/)(?P<prefix>[^/]+)_slowstart_(?P<slowstart>[\d.]+)_(?P<kind>timeline|timeline_summary|counters)\.csv$')
+PIDSTAT_RE = re.compile(r'_process_metrics\.txt$')
+RATES_RE = re.compile(r'_rates_\d{8}_\d{6}\.csv$')
+OVERHEAD_RE = re.compile(r'_overhead_[^/]+_\d{8}_\d{6}\.csv$')
+DIRIO_RE = re.compile(r'_dirio_\d{8}_\d{6}\.csv$')
+LOCAL_STAMP_RE = re.compile(r'_(\d{8}_\d{6})\.csv$')
+
+
+def _csv_rows(f):
+    return list(csv.DictReader(f))
+
+
+def _system_rows(f):
+    """System metrics CSV -> row dicts with float values (timestamps in epoch seconds)"""
+    rows = []
+    for row in csv.DictReader(f):
+        parsed = {}
+        for key, value in row.items():
+            if key == 'node_name':
+                parsed[key] = value
+                continue
+            try:
+                parsed[key] = float(value)
+            except (TypeError, ValueError):
+                parsed[key] = None
+        if parsed.get('timestamp'):
+            parsed['timestamp'] = to_seconds(parsed['timestamp'])
+            rows.append(parsed)
+    return rows
+
+
+def _pidstat_rows(f):
+    """Raw pidstat output -> parse_pidstat_line() dicts (time of day only)"""
+    rows = []
+    for line in f:
+        if not line.strip() or line.startswith(('Linux', '#')):
+            continue
+        parsed = parse_pidstat_line(line)
+        if parsed:
+            rows.append(parsed)
+    return rows
+
+
+def _rate_rows(f):
+    """rate_engine.py long-format rows with float timestamp and value"""
+    rows = []
+    for row in csv.DictReader(f):
+        try:
+            row['timestamp'], row['value'] = float(row['timestamp']), float(row['value'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        rows.append(row)
+    return rows
+
+
+def _dir_io_rows(f):
+    """dir_io.py per-device rows: numeric columns as floats, device/mount/roles/dirs as written"""
+    rows = []
+    for row in csv.DictReader(f):
+        try:
+            for key, value in row.items():
+                if key not in ('node_name', 'device', 'disk', 'mount', 'roles', 'dirs'):
+                    row[key] = float(value)
+        except (TypeError, ValueError):
+            continue
+        rows.append(row)
+    return rows
+
+
+def _overhead_rows(f):
+    """sampler_overhead.py rows with a float timestamp (other columns as written)"""
+    rows = []
+    for row in csv.DictReader(f):
+        try:
+            row['timestamp'] = float(row['timestamp'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        rows.append(row)
+    return rows
+
+
+PARSERS = {
+    'csv': _csv_rows,
+    'timeline': read_timeline,
+    'system': _system_rows,
+    'pidstat': _pidstat_rows,
+    'rates': _rate_rows,
+    'overhead': _overhead_rows,
+    'dir_io': _dir_io_rows,
+}
+
+
+class ExperimentResults:
+    """A results directory, zip or package manifest, indexed by member name; artifacts parsed on demand"""
+
+    def __init__(self, path, cache_dir=DEFAULT_CACHE_DIR, use_cache=True):
+        self.path = path
+        self.cache_dir = cache_dir if use_cache else None
+        self._memo = {}
+        self.loads = {'memo': 0, 'cache': 0, 'parsed': 0}
+        self._zip = None
+        self._objects = None
+        if path.endswith('.json'):
+            # manifests/<name>.json inside a package store: members are content-addressed objects
+            self._store = PackageStore(os.path.dirname(os.path.dirname(os.path.abspath(path))))
+            manifest = self._store.load_manifest(path)
+            self._objects = {e['path']: e['sha256'] for e in manifest['files']}
+            self.members = dict(self._objects)
+            name = manifest['name'] + '.zip'
+        elif zipfile.is_zipfile(path):
+            self._zip = zipfile.ZipFile(path)
+            name = os.path.basename(path)
+            self.members = {info.filename: f'{info.file_size}:{info.CRC:08x}'
+                            for info in self._zip.infolist() if not info.is_dir()}
+        else:
+            name = os.path.basename(os.path.normpath(path))
+            self.members = {}
+            for root, _, files in os.walk(path):
+                for file_name in files:
+                    full = os.path.join(root, file_name)
+                    stat = os.stat(full)
+                    member = os.path.relpath(full, path).replace(os.sep, '/')
+                    # mtime is not content, so tie directory entries to their location too
+                    self.members[member] = f'{stat.st_size}:{stat.st_mtime_ns}:{os.path.abspath(full)}'
+        match = DATASET_RE.search(name)
+        self.dataset = match.group(1) if match else ''
+
+    def close(self):
+        if self._zip:
+            self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self, member):
+        """Text stream for a member, read in place from the zip, object store or directory"""
+        if self._objects is not None:
+            return io.TextIOWrapper(self._store.open(self._objects[member]), encoding='utf-8', errors='replace',
+                                    newline='')
+        if self._zip:
+            return io.TextIOWrapper(self._zip.open(member), encoding='utf-8', errors='replace', newline='')
+        return open(os.path.join(self.path, member), 'r', encoding='utf-8', errors='replace', newline='')
+
+    def _cache_path(self, kind, member):
+        # Zip (size + CRC) and manifest (SHA-256) fingerprints are content-based, so identical
+        # members in different archives share an entry
+        key = f'{PARSER_VERSION}|{kind}|{os.path.basename(member)}|{self.members[member]}'
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f'{digest}.json.gz')
+
+    def load(self, member, kind):
+        """Parse a member with PARSERS[kind]: memo first, then the disk cache, then the archive"""
+        key = (member, kind)
+        if key in self._memo:
+            self.loads['memo'] += 1
+            return self._memo[key]
+
+        cache_path = self._cache_path(kind, member) if self.cache_dir else None
+        value = None
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with gzip.open(cache_path, 'rt', encoding='utf-8') as f:
+                    value = json.load(f)
+                self.loads['cache'] += 1
+            except (OSError, ValueError):
+                value = None
+        if value is None:
+            with self.open(member) as f:
+                value = PARSERS[kind](f)
+            self.loads['parsed'] += 1
+            if cache_path:
+                atomic_write(cache_path, gzip.compress(json.dumps(value).encode('utf-8'), compresslevel=1))
+        self._memo[key] = value
+        return value
+
+    def find(self, pattern):
+        return sorted(m for m in self.members if pattern.search(m))
+
+    @cached_property
+    def summaries(self):
+        """experiment_id -> summary row; per-experiment CSVs override the batch summary"""
+        rows = {}
+        for member in sorted(self.find(SUMMARY_RE), key=lambda m: 'batch_summary_' not in m):
+            for row in self.load(member, 'csv'):
+                if row.get('experiment_id'):
+                    rows[row['experiment_id']] = row
+        return rows
+
+    @cached_property
+    def artifacts(self):
+        """experiment_id -> {kind: member} for timeline / timeline_summary / counters CSVs"""
+        index = {}
+        for member in self.members:
+            match = ARTIFACT_RE.search(member)
+            if match:
+                index.setdefault(match.group('prefix'), {})[match.group('kind')] = member
+        return index
+
+    def runs(self):
+        ids = set(self.summaries) | set(self.artifacts)
+        runs = [ExperimentRun(self, experiment_id) for experiment_id in ids]
+        return sorted(runs, key=lambda r: (r.start_time or 0, r.experiment_id))
+
+    def run(self, experiment_id):
+        if experiment_id not in self.summaries and experiment_id not in self.artifacts:
+            raise KeyError(f"no experiment {experiment_id} in {self.path}")
+        return ExperimentRun(self, experiment_id)
+
+    @cached_property
+    def system_members(self):
+        return [m for m in self.members if m.endswith('.csv')
+                and ('system_metrics/' in m or m.startswith('other_node_monitoring/'))
+                and 'mapreduce_metrics/' not in m and not RATES_RE.search(m) and not OVERHEAD_RE.search(m)
+                and not DIRIO_RE.search(m)]
+
+    @cached_property
+    def rate_members(self):
+        return [m for m in self.members if RATES_RE.search(m)]
+
+    @cached_property
+    def dir_io_members(self):
+        return [m for m in self.members if DIRIO_RE.search(m)]
+
+    @cached_property
+    def overhead_members(self):
+        return [m for m in self.members if OVERHEAD_RE.search(m)]
+
+    def system_samples(self):
+        """Every system-metrics row in the archive, oldest first (memoized)"""
+        if 'system' not in self._memo:
+            rows = []
+            for member in self.system_members:
+                node = node_for(member)
+                for row in self.load(member, 'system'):
+                    rows.append(row if row.get('node_name') else dict(row, node_name=node))
+            rows.sort(key=lambda r: r['timestamp'])
+            self._memo['system'] = rows
+        return self._memo['system']
+
+    def shuffle_samples(self):
+        """
+        Per-node shuffle throughput rows {node_name, timestamp, rx_mb_s, tx_mb_s} (memoized)
+
+        Taken from rate_engine.py output when the archive has it, otherwise
+        derived from the cumulative network columns of proc_sampler.py files
+        (the legacy collector's columns are packet counts; those files give none).
+        """
+        if 'shuffle' not in self._memo:
+            pivot = {}
+            for member in self.rate_members:
+                for row in self.load(member, 'rates'):
+                    if row['kind'] == 'shuffle':
+                        key = (row['node_name'], row['timestamp'])
+                        pivot.setdefault(key, {'node_name': key[0], 'timestamp': key[1]})[row['metric']] = row['value']
+            rows = list(pivot.values())
+            if not rows:
+                samples = []
+                for member in self.system_members:
+                    member_rows = self.load(member, 'system')
+                    if network_in_bytes(member_rows):
+                        node = node_for(member)
+                        samples.extend(r if r.get('node_name') else dict(r, node_name=node) for r in member_rows)
+                samples.sort(key=lambda r: r['timestamp'])
+                rows = list(shuffle_rates(samples, RateEngine()))
+            rows.sort(key=lambda r: r['timestamp'])
+            self._memo['shuffle'] = rows
+        return self._memo['shuffle']
+
+    def dir_io_samples(self):
+        """Per-device I/O rows labelled by Hadoop role (dir_io.py), oldest first (memoized)"""
+        if 'dir_io' not in self._memo:
+            rows = [row for member in self.dir_io_members for row in self.load(member, 'dir_io')]
+            rows.sort(key=lambda r: r['timestamp'])
+            self._memo['dir_io'] = rows
+        return self._memo['dir_io']
+
+    def overhead_samples(self):
+        """Every sampler self-overhead row (sampler_overhead.py), oldest first (memoized)"""
+        if 'overhead' not in self._memo:
+            rows = [row for member in self.overhead_members for row in self.load(member, 'overhead')]
+            rows.sort(key=lambda r: r['timestamp'])
+            self._memo['overhead'] = rows
+        return self._memo['overhead']
+
+    @cached_property
+    def node_timezone(self):
+        """
+        Timezone of the nodes' wall clocks
+
+        System-metrics files are named <node>_<YYYYMMDD_HHMMSS>.csv in node
+        local time while their rows hold epoch seconds, so the difference
+        gives the UTC offset. Falls back to this host's timezone.
+        """
+        for member in self.system_members:
+            match = LOCAL_STAMP_RE.search(member)
+            rows = self.load(member, 'system') if match else []
+            if rows:
+                local = datetime.strptime(match.group(1), '%Y%m%d_%H%M%S').replace(tzinfo=timezone.utc)
+                offset = round((local.timestamp() - rows[0]['timestamp']) / 900) * 900
+                return timezone(timedelta(seconds=offset))
+        return datetime.now().astimezone().tzinfo
+
+    def pidstat_samples(self):
+        """Every pidstat row with an epoch 'time' and 'node' (memoized)"""
+        if 'pidstat' not in self._memo:
+            # pidstat prints node-local time of day; date it from the first run
+            starts = [r.start_time for r in self.runs() if r.start_time]
+            day = datetime.fromtimestamp(min(starts) if starts else time.time(), self.node_timezone)
+            day = day.replace(hour=0, minute=0, second=0, microsecond=0)
+            rows = []
+            for member in self.find(PIDSTAT_RE):
+                node = node_for(member)
+                parse_time = TimeParser(day)
+                for row in self.load(member, 'pidstat'):
+                    ts = parse_time(row['timestamp'])
+                    if ts is not None:
+                        rows.append(dict(row, node=node, time=ts))
+            rows.sort(key=lambda r: r['time'])
+            self._memo['pidstat'] = rows
+        return self._memo['pidstat']
+
+
+class ExperimentRun:
+    """One experiment inside an ExperimentResults; each artifact loads on first access"""
+
+    def __init__(self, results, experiment_id):
+        self.results = results
+        self.experiment_id = experiment_id
+
+    def __repr__(self):
+        return f"ExperimentRun({self.experiment_id!r}, slowstart={self.slowstart})"
+
+    @property
+    def summary(self):
+        return self.results.summaries.get(self.experiment_id, {})
+
+    def _artifact(self, kind):
+        return self.results.artifacts.get(self.experiment_id, {}).get(kind)
+
+    @property
+    def slowstart(self):
+        value = self.summary.get('slowstart_value')
+        if value is None:
+            member = self._artifact('timeline') or self._artifact('timeline_summary')
+            value = ARTIFACT_RE.search(member).group('slowstart') if member else None
+        return float(value) if value else None
+
+    @property
+    def timeline(self):
+        member = self._artifact('timeline')
+        return self.results.load(member, 'timeline') if member else []
+
+    @property
+    def timeline_summary(self):
+        member = self._artifact('timeline_summary')
+        return self.results.load(member, 'csv') if member else []
+
+    @property
+    def counters(self):
+        member = self._artifact('counters')
+        return self.results.load(member, 'csv') if member else []
+
+    @property
+    def start_time(self):
+        value = self.summary.get('start_time')
+        if value:
+            return to_seconds(float(value))
+        tasks = self.timeline
+        return min(t['start'] for t in tasks) if tasks else None
+
+    @property
+    def end_time(self):
+        value = self.summary.get('end_time')
+        if value:
+            return to_seconds(float(value))
+        tasks = self.timeline
+        return max(t['finish'] for t in tasks) if tasks else None
+
+    def _window(self, rows, key):
+        start, end = self.start_time, self.end_time
+        if start is None or end is None:
+            return []
+        return [r for r in rows if start <= r[key] <= end]
+
+    @property
+    def system_metrics(self):
+        """System-metrics rows from all nodes taken while this run was active"""
+        return self._window(self.results.system_samples(), 'timestamp')
+
+    @property
+    def shuffle(self):
+        """Per-node network throughput (MB/s) while this run was active"""
+        return self._window(self.results.shuffle_samples(), 'timestamp')
+
+    @property
+    def pidstat(self):
+        """pidstat java-process rows (cpu/memory/io) taken while this run was active"""
+        return self._window(self.results.pidstat_samples(), 'time')
+
+    @property
+    def dir_io(self):
+        """Per-device throughput/IOPS/await/utilisation of the Hadoop dirs while this run was active"""
+        return self._window(self.results.dir_io_samples(), 'timestamp')
+
+    @property
+    def overhead(self):
+        """Monitoring samplers' own CPU/RSS/jitter rows while this run was active"""
+        return self._window(self.results.overhead_samples(), 'timestamp')
+
+    def overhead_warnings(self, cpu_threshold=DEFAULT_CPU_THRESHOLD, jitter_ratio=DEFAULT_JITTER_RATIO):
+        """Messages for nodes whose monitoring cost more than cpu_threshold % of a core during this run"""
+        return overhead_warnings(self.overhead, cpu_threshold, jitter_ratio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lazy loader for experiment results')
+    parser.add_argument('path', help='Results directory or experiment_results_*.zip')
+    parser.add_argument('experiment_id', nargs='?', default=None, help='Load one run (default: list runs)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'Parsed-artifact cache (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the disk cache')
+    parser.add_argument('--overhead-threshold', type=float, default=DEFAULT_CPU_THRESHOLD,
+                        help=f'Warn when monitoring on a node uses more than this %% of a core '
+                             f'(default: {DEFAULT_CPU_THRESHOLD:g}, env MONITOR_OVERHEAD_CPU)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"Error: {args.path} not found")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    with ExperimentResults(args.path, args.cache_dir, not args.no_cache) as results:
+        if args.experiment_id:
+            try:
+                runs = [results.run(args.experiment_id)]
+            except KeyError as e:
+                print(f"Error: {e.args[0]}")
+                sys.exit(1)
+        else:
+            runs = results.runs()
+
+        print(f"{'experiment_id':<32} {'slowstart':>9} {'tasks':>6} {'samples':>8} {'pidstat':>8}")
+        for run in runs:
+            slowstart = f"{run.slowstart:g}" if run.slowstart is not None else '-'
+            pidstat = len(run.pidstat) if args.experiment_id else '-'
+            print(f"{run.experiment_id:<32} {slowstart:>9} {len(run.timeline):>6} "
+                  f"{len(run.system_metrics):>8} {pidstat:>8}")
+        for run in runs:
+            for message in run.overhead_warnings(args.overhead_threshold):
+                print(f"Warning: {run.experiment_id}: {message}", file=sys.stderr)
+
+        loads = results.loads
+        print(f"\n{len(runs)} run(s) from {results.dataset or args.path} in "
+              f"{(time.perf_counter() - started) * 1000:.0f} ms "
+              f"(parsed {loads['parsed']}, disk cache {loads['cache']}, memo {loads['memo']})")
+
+
+if __name__ == '__main__':
+    main()
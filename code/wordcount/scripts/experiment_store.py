@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Indexed SQLite Experiment Store
+Loads experiment summaries, task timelines, job counters and system-metrics
+samples from metrics/, system_metrics/, other_node_monitoring/,
+experiment_results_*.zip and package_store.py manifests
+(results_store/manifests/*.json) into one SQLite database. Files already
+ingested (same size and mtime, same zip member CRC or same object hash) are
+skipped on later runs.
+Usage:
+  python3 experiment_store.py ingest [paths ...] [--db metrics/experiments.db]
+  python3 experiment_store.py list [--dataset 5gb_wordcount] [--slowstart 0.3]
+  python3 experiment_store.py show <experiment_id> [--node hadoop002]
+
+In Python:
+    with ExperimentStore('metrics/experiments.db') as store:
+        tasks = store.tasks('batch_20251128_132315_exp02')
+        samples = store.samples('batch_20251128_132315_exp02', node='hadoop002')
+"""
+
+import argparse
+import csv
+import glob
+import io
+import os
+import re
+import sqlite3
+import sys
+import time
+import zipfile
+
+from package_store import DEFAULT_STORE, PackageStore
+from timeline_io import parse_time, to_millis
+
+DEFAULT_DB = 'metrics/experiments.db'
+DEFAULT_PATHS = ['metrics', 'system_metrics', 'other_node_monitoring', 'experiment_results_*.zip',
+                 os.path.join(DEFAULT_STORE, 'manifests', '*.json')]
+DATASET_RE = re.compile(r'experiment_results_\d{8}_\d{6}_(.+)\.zip$')
+COUNTERS_RE = re.compile(r'^(?P<exp>.+)_slowstart_[\d.]+_counters\.csv$')
+
+SAMPLE_COLUMNS = ['cpu_percent', 'memory_used_mb', 'memory_total_mb', 'memory_percent', 'load_avg',
+                  'disk_reads', 'disk_writes', 'network_rx_mb', 'network_tx_mb',
+                  'java_cpu_percent', 'java_memory_percent', 'java_processes']
+SUMMARY_NUMERIC = ['total_time_sec', 'avg_cpu_percent', 'max_cpu_percent', 'avg_memory_mb', 'max_memory_mb',
+                   'avg_load', 'max_load', 'bytes_read', 'bytes_written', 'map_tasks', 'reduce_tasks']
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    source TEXT UNIQUE NOT NULL,
+    kind TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    ingested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS experiments (
+    experiment_id TEXT PRIMARY KEY,
+    dataset TEXT,
+    slowstart REAL,
+    start_ms INTEGER,
+    end_ms INTEGER,
+    {', '.join(f'{c} REAL' for c in SUMMARY_NUMERIC)},
+    job_status TEXT,
+    file_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    experiment_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    task_type TEXT,
+    start_ms INTEGER,
+    finish_ms INTEGER,
+    shuffle_finish_ms INTEGER,
+    merge_finish_ms INTEGER,
+    successful_attempt TEXT,
+    node TEXT,
+    file_id INTEGER,
+    PRIMARY KEY (experiment_id, task_id)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    experiment_id TEXT,
+    job_id TEXT,
+    scope TEXT,
+    task_id TEXT,
+    counter_group TEXT,
+    counter_name TEXT,
+    value INTEGER,
+    map_value INTEGER,
+    reduce_value INTEGER,
+    file_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS samples (
+    node TEXT NOT NULL,
+    ts_ms INTEGER NOT NULL,
+    {', '.join(f'{c} REAL' for c in SAMPLE_COLUMNS)},
+    file_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_experiments_dataset ON experiments (dataset, slowstart);
+CREATE INDEX IF NOT EXISTS idx_experiments_time ON experiments (start_ms, end_ms);
+CREATE INDEX IF NOT EXISTS idx_tasks_file ON tasks (file_id);
+CREATE INDEX IF NOT EXISTS idx_counters_experiment ON counters (experiment_id, scope);
+CREATE INDEX IF NOT EXISTS idx_counters_file ON counters (file_id);
+CREATE INDEX IF NOT EXISTS idx_samples_node_time ON samples (node, ts_ms);
+CREATE INDEX IF NOT EXISTS idx_samples_time ON samples (ts_ms);
+CREATE INDEX IF NOT EXISTS idx_samples_file ON samples (file_id);
+"""
+
+
+def classify(name, header):
+    """Decide what a CSV holds from its name and header; None for files we don't ingest"""
+    base = os.path.basename(name)
+    if base.endswith('_timeline.csv'):
+        return 'timeline'
+    if base.endswith('_timeline_summary.csv'):
+        return None  # derived from the timeline; its header also matches the job summary's
+    if COUNTERS_RE.match(base) and 'counter_name' in header:
+        return 'counters'
+    if header[:2] == ['node_name', 'timestamp']:
+        return 'samples'
+    if header[:2] == ['experiment_id', 'slowstart_value'] and 'total_time_sec' in header:
+        return 'summary'
+    return None
+
+
+def number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def millis(value):
+    ts = parse_time(value)
+    return to_millis(ts) if ts is not None else None
+
+
+class ExperimentStore:
+    """SQLite-backed store of experiment artifacts with incremental ingest"""
+
+    def __init__(self, path=DEFAULT_DB):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- ingest -------------------------------------------------------------
+
+    def _known(self, source, fingerprint):
+        row = self.conn.execute('SELECT fingerprint FROM files WHERE source = ?', (source,)).fetchone()
+        return row is not None and row['fingerprint'] == fingerprint
+
+    def _ingest_text(self, source, fingerprint, text, dataset):
+        """Ingest one CSV's content; returns (kind, rows) or None if not recognized"""
+        reader = csv.reader(io.StringIO(text))
+        header = next(reader, None)
+        kind = classify(source, header or [])
+        if kind is None:
+            return None
+
+        with self.conn:
+            old = self.conn.execute('SELECT id FROM files WHERE source = ?', (source,)).fetchone()
+            if old:
+                for table in ('tasks', 'counters', 'samples'):
+                    self.conn.execute(f'DELETE FROM {table} WHERE file_id = ?', (old['id'],))
+            cur = self.conn.execute(
+                'INSERT INTO files (source, kind, fingerprint, rows, ingested_at) VALUES (?, ?, ?, 0, ?) '
+                'ON CONFLICT(source) DO UPDATE SET kind = excluded.kind, fingerprint = excluded.fingerprint, '
+                'ingested_at = excluded.ingested_at RETURNING id',
+                (source, kind, fingerprint, time.time()))
+            file_id = cur.fetchone()[0]
+            rows = [dict(zip(header, row)) for row in reader if row]
+            count = getattr(self, f'_load_{kind}')(rows, file_id, source, dataset)
+            self.conn.execute('UPDATE files SET rows = ? WHERE id = ?', (count, file_id))
+        return kind, count
+
+    def _load_summary(self, rows, file_id, source, dataset):
+        records = []
+        for row in rows:
+            start, end = number(row.get('start_time')), number(row.get('end_time'))
+            records.append([row['experiment_id'], dataset, number(row.get('slowstart_value')),
+                            to_millis(start) if start else None, to_millis(end) if end else None]
+                           + [number(row.get(c)) for c in SUMMARY_NUMERIC]
+                           + [row.get('job_status'), file_id])
+        placeholders = ', '.join('?' * (7 + len(SUMMARY_NUMERIC)))
+        # Batch summaries repeat the per-experiment CSV rows; the latest ingest wins,
+        # but never overwrite a known value (or dataset) with an empty one
+        self.conn.executemany(
+            f"INSERT INTO experiments VALUES ({placeholders}) ON CONFLICT(experiment_id) DO UPDATE SET "
+            + ', '.join(f'{c} = COALESCE(excluded.{c}, experiments.{c})'
+                        for c in ['slowstart', 'start_ms', 'end_ms', 'job_status'] + SUMMARY_NUMERIC)
+            + ', file_id = excluded.file_id'
+            + ", dataset = COALESCE(NULLIF(excluded.dataset, ''), experiments.dataset)",
+            records)
+        return len(records)
+
+    def _load_timeline(self, rows, file_id, source, dataset):
+        records = [(row.get('experiment_id', ''), row.get('task_id', ''), row.get('task_type', ''),
+                    millis(row.get('start_time')), millis(row.get('finish_time')),
+                    millis(row.get('shuffle_finish_time')), millis(row.get('merge_finish_time')),
+                    row.get('successful_attempt') or None,
+                    (row.get('node_http_address') or '').split(':')[0] or None, file_id)
+                   for row in rows]
+        self.conn.executemany('INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', records)
+        return len(records)
+
+    def _load_counters(self, rows, file_id, source, dataset):
+        experiment_id = COUNTERS_RE.match(os.path.basename(source)).group('exp')
+        records = [(experiment_id, row.get('job_id'), row.get('scope'), row.get('task_id') or None,
+                    row.get('counter_group'), row.get('counter_name'), number(row.get('value')),
+                    number(row.get('map_value')), number(row.get('reduce_value')), file_id)
+                   for row in rows]
+        self.conn.executemany('INSERT INTO counters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', records)
+        return len(records)
+
+    def _load_samples(self, rows, file_id, source, dataset):
+        records = []
+        for row in rows:
+            ts = millis(row.get('timestamp'))
+            if ts is None:
+                continue
+            records.append([row.get('node_name', '')] + [ts] + [number(row.get(c)) for c in SAMPLE_COLUMNS]
+                           + [file_id])
+        placeholders = ', '.join('?' * (3 + len(SAMPLE_COLUMNS)))
+        self.conn.executemany(f'INSERT INTO samples VALUES ({placeholders})', records)
+        return len(records)
+
+    def ingest_file(self, path):
+        stat = os.stat(path)
+        fingerprint = f'{stat.st_size}:{int(stat.st_mtime)}'
+        source = os.path.abspath(path)
+        if self._known(source, fingerprint):
+            return []
+        with open(path, 'r', newline='', errors='replace') as f:
+            result = self._ingest_text(source, fingerprint, f.read(), '')
+        return [(path, *result)] if result else []
+
+    def ingest_zip(self, path):
+        match = DATASET_RE.search(os.path.basename(path))
+        dataset = match.group(1) if match else ''
+        zip_source = os.path.abspath(path)
+        results = []
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not info.filename.endswith('.csv'):
+                    continue
+                source = f'{zip_source}!{info.filename}'
+                fingerprint = f'{info.file_size}:{info.CRC:08x}'
+                if self._known(source, fingerprint):
+                    continue
+                text = zf.read(info).decode('utf-8', 'replace')
+                result = self._ingest_text(source, fingerprint, text, dataset)
+                if result:
+                    results.append((source, *result))
+        return results
+
+    def ingest_manifest(self, path):
+        """A package_store.py manifest; members are read from its store's objects"""
+        package = PackageStore(os.path.dirname(os.path.dirname(os.path.abspath(path))))
+        manifest = package.load_manifest(path)
+        match = DATASET_RE.search(manifest['name'] + '.zip')
+        dataset = match.group(1) if match else ''
+        manifest_source = os.path.abspath(path)
+        results = []
+        for entry in manifest['files']:
+            if not entry['path'].endswith('.csv'):
+                continue
+            source = f"{manifest_source}!{entry['path']}"
+            if self._known(source, entry['sha256']):
+                continue
+            text = package.read(entry['sha256']).decode('utf-8', 'replace')
+            result = self._ingest_text(source, entry['sha256'], text, dataset)
+            if result:
+                results.append((source, *result))
+        return results
+
+    def ingest(self, paths):
+        """Ingest files, directories (recursively), zips and manifests; returns [(source, kind, rows)] of new data"""
+        results = []
+        for path in paths:
+            if os.path.isdir(path):
+                for root, dirs, files in os.walk(path):
+                    dirs[:] = [d for d in dirs if not d.startswith('.')]
+                    for name in sorted(files):
+                        full = os.path.join(root, name)
+                        if name.endswith('.csv'):
+                            results.extend(self.ingest_file(full))
+                        elif name.startswith('experiment_results_') and name.endswith('.zip'):
+                            results.extend(self.ingest_zip(full))
+                        elif name.endswith('.json') and os.path.basename(root) == 'manifests':
+                            results.extend(self.ingest_manifest(full))
+            elif path.endswith('.zip'):
+                results.extend(self.ingest_zip(path))
+            elif path.endswith('.json'):
+                results.extend(self.ingest_manifest(path))
+            elif path.endswith('.csv'):
+                results.extend(self.ingest_file(path))
+        return results
+
+    # ---- queries ------------------------------------------------------------
+
+    def experiments(self, dataset=None, slowstart=None):
+        sql = 'SELECT * FROM experiments WHERE 1 = 1'
+        params = []
+        if dataset is not None:
+            sql += ' AND dataset = ?'
+            params.append(dataset)
+        if slowstart is not None:
+            sql += ' AND slowstart = ?'
+            params.append(slowstart)
+        return [dict(r) for r in self.conn.execute(sql + ' ORDER BY start_ms', params)]
+
+    def experiment(self, experiment_id):
+        row = self.conn.execute('SELECT * FROM experiments WHERE experiment_id = ?', (experiment_id,)).fetchone()
+        return dict(row) if row else None
+
+    def tasks(self, experiment_id, task_type=None):
+        sql = 'SELECT * FROM tasks WHERE experiment_id = ?'
+        params = [experiment_id]
+        if task_type:
+            sql += ' AND task_type = ?'
+            params.append(task_type)
+        return [dict(r) for r in self.conn.execute(sql + ' ORDER BY start_ms', params)]
+
+    def counters(self, experiment_id, scope='job'):
+        return [dict(r) for r in self.conn.execute(
+            'SELECT * FROM counters WHERE experiment_id = ? AND scope = ?', (experiment_id, scope))]
+
+    def nodes(self):
+        return [r[0] for r in self.conn.execute('SELECT DISTINCT node FROM samples ORDER BY node')]
+
+    def samples(self, experiment_id, node=None, columns=None):
+        """System-metrics samples taken while the experiment ran (all nodes unless one is given)"""
+        exp = self.experiment(experiment_id)
+        if not exp or exp['start_ms'] is None or exp['end_ms'] is None:
+            return []
+        columns = columns or SAMPLE_COLUMNS
+        unknown = set(columns) - set(SAMPLE_COLUMNS)
+        if unknown:
+            raise ValueError(f"unknown sample columns: {', '.join(sorted(unknown))}")
+        select = ', '.join(['node', 'ts_ms'] + list(columns))
+        if node:
+            sql = f'SELECT {select} FROM samples WHERE node = ? AND ts_ms BETWEEN ? AND ? ORDER BY ts_ms'
+            params = (node, exp['start_ms'], exp['end_ms'])
+        else:
+            sql = f'SELECT {select} FROM samples WHERE ts_ms BETWEEN ? AND ? ORDER BY node, ts_ms'
+            params = (exp['start_ms'], exp['end_ms'])
+        return [dict(r) for r in self.conn.execute(sql, params)]
+
+
+def cmd_ingest(args, store):
+    started = time.time()
+    paths = []
+    for pattern in args.paths or DEFAULT_PATHS:
+        paths.extend(sorted(glob.glob(pattern)) or ([pattern] if args.paths else []))
+    results = store.ingest(paths)
+    by_kind = {}
+    for _, kind, rows in results:
+        files, total = by_kind.get(kind, (0, 0))
+        by_kind[kind] = (files + 1, total + rows)
+    for kind, (files, rows) in sorted(by_kind.items()):
+        print(f"  {kind:<10} {files:>5} files {rows:>9} rows")
+    print(f"Ingested {len(results)} new or changed files into {store.path} in {time.time() - started:.2f}s")
+    return 0
+
+
+def cmd_list(args, store):
+    rows = store.experiments(args.dataset, args.slowstart)
+    print(f"{'experiment_id':<32} {'dataset':<16} {'slowstart':>9} {'total_s':>8} {'status':<8} {'tasks':>6}")
+    for exp in rows:
+        count = store.conn.execute('SELECT COUNT(*) FROM tasks WHERE experiment_id = ?',
+                                   (exp['experiment_id'],)).fetchone()[0]
+        total = f"{exp['total_time_sec']:.0f}" if exp['total_time_sec'] is not None else '-'
+        slowstart = f"{exp['slowstart']:g}" if exp['slowstart'] is not None else '-'
+        print(f"{exp['experiment_id']:<32} {exp['dataset'] or '-':<16} {slowstart:>9} "
+              f"{total:>8} {exp['job_status'] or '-':<8} {count:>6}")
+    print(f"{len(rows)} experiments")
+    return 0
+
+
+def cmd_show(args, store):
+    started = time.perf_counter()
+    exp = store.experiment(args.experiment_id)
+    if not exp:
+        print(f"Error: unknown experiment {args.experiment_id}")
+        return 1
+    tasks = store.tasks(args.experiment_id)
+    samples = store.samples(args.experiment_id, node=args.node)
+    counters = store.counters(args.experiment_id)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{exp['experiment_id']} ({exp['dataset'] or '-'}, slowstart {exp['slowstart']:g}, "
+          f"{exp['total_time_sec']:.0f}s, {exp['job_status']})")
+    maps = sum(1 for t in tasks if t['task_type'] == 'MAP')
+    print(f"  Tasks: {len(tasks)} ({maps} map, {len(tasks) - maps} reduce)")
+    nodes = sorted({s['node'] for s in samples})
+    print(f"  Samples: {len(samples)} from {len(nodes)} node(s): {', '.join(nodes)}")
+    print(f"  Job counters: {len(counters)}")
+    print(f"  Query time: {elapsed_ms:.1f} ms")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite experiment store')
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'Database path (default: {DEFAULT_DB})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest = subparsers.add_parser('ingest', help='Load new or changed files')
+    ingest.add_argument('paths', nargs='*', help=f"Files, directories or zips (default: {' '.join(DEFAULT_PATHS)})")
+    ingest.set_defaults(func=cmd_ingest)
+
+    list_parser = subparsers.add_parser('list', help='List experiments')
+    list_parser.add_argument('--dataset', default=None)
+    list_parser.add_argument('--slowstart', type=float, default=None)
+    list_parser.set_defaults(func=cmd_list)
+
+    show = subparsers.add_parser('show', help="Show one run's tasks, samples and counters")
+    show.add_argument('experiment_id')
+    show.add_argument('--node', default=None)
+    show.set_defaults(func=cmd_show)
+
+    args = parser.parse_args()
+    with ExperimentStore(args.db) as store:
+        sys.exit(args.func(args, store))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@
 
 # Extract Map/Reduce Timeline from Hadoop Job
 # Usage: ./extract_timeline.sh <application_id> <slowstart_value> [experiment_id]
+#        JHIST_FILE=<job.jhist> ./extract_timeline.sh ...   (offline, no JobHistory Server)
 # Example: ./extract_timeline.sh application_1764041163594_0018 0.3 20251125_141801
 
 set -e
@@ -44,6 +45,10 @@ HISTORY_SERVER_1="http://hadoop001:19888"
 HISTORY_SERVER_2="http://localhost:19888"
 HISTORY_SERVER=""
 
+# Job history files of finished jobs (mapreduce.jobhistory.done-dir / intermediate-done-dir defaults)
+HISTORY_DONE_DIRS="/tmp/hadoop-yarn/staging/history/done /tmp/hadoop-yarn/staging/history/done_intermediate"
+JHIST_LOCAL="${JHIST_FILE:-${METRICS_DIR}/${JOB_ID}.jhist}"
+
 # Detect which history server is available
 if curl -s -f "${HISTORY_SERVER_1}/ws/v1/history/mapreduce/jobs" > /dev/null 2>&1; then
     HISTORY_SERVER="${HISTORY_SERVER_1}"
@@ -53,115 +58,69 @@ elif curl -s -f "${HISTORY_SERVER_2}/ws/v1/history/mapreduce/jobs" > /dev/null 2
     echo -e "${GREEN}Using JobHistory Server: ${HISTORY_SERVER}${NC}"
 else
     echo -e "${YELLOW}Warning: JobHistory Server not accessible via REST API${NC}"
-    echo -e "${YELLOW}Attempting to use yarn logs instead...${NC}"
-    
-    # Fallback: Use yarn logs
-    echo "experiment_id,slowstart_value,task_id,task_type,start_time,finish_time,elapsed_sec,shuffle_finish,merge_finish,reduce_finish" > "${TIMELINE_CSV}"
-    
-    yarn logs -applicationId "${APP_ID}" 2>/dev/null | grep -E "(Task.*started|Task.*finished)" | while read line; do
-        echo "$line" >> "${TIMELINE_CSV}.log"
-    done
-    
-    echo -e "${YELLOW}Timeline data saved to: ${TIMELINE_CSV}${NC}"
-    echo -e "${YELLOW}Note: Using yarn logs fallback. For better results, start JobHistory Server:${NC}"
-    echo -e "  ${BLUE}mapred --daemon start historyserver${NC}"
-    exit 0
+    echo -e "${YELLOW}Falling back to the history cache / job history file (.jhist)...${NC}"
 fi
 
-# REST API URL
-TASKS_URL="${HISTORY_SERVER}/ws/v1/history/mapreduce/jobs/${JOB_ID}/tasks"
-
-echo -e "${BLUE}Fetching tasks information...${NC}"
-
-# Fetch tasks data
-TASKS_JSON=$(curl -s "${TASKS_URL}")
-
-if [ -z "$TASKS_JSON" ] || echo "$TASKS_JSON" | grep -q "error"; then
-    echo -e "${YELLOW}Error fetching tasks data from JobHistory Server${NC}"
-    echo -e "${YELLOW}Response: ${TASKS_JSON}${NC}"
-    exit 1
+if [ -n "${HISTORY_SERVER}" ]; then
+    echo -e "${BLUE}Fetching task and attempt details...${NC}"
+
+    # Fetch all tasks and their successful attempts concurrently over pooled connections
+    if ! python3 "$(dirname "$0")/jobhistory_client.py" timeline "${JOB_ID}" \
+            --server "${HISTORY_SERVER}" \
+            --experiment-id "${EXPERIMENT_ID}" \
+            --slowstart "${SLOWSTART}" \
+            --output "${TIMELINE_CSV}"; then
+        echo -e "${YELLOW}Error fetching tasks data from JobHistory Server${NC}"
+        exit 1
+    fi
+elif python3 "$(dirname "$0")/jobhistory_client.py" timeline "${JOB_ID}" --offline \
+        --experiment-id "${EXPERIMENT_ID}" \
+        --slowstart "${SLOWSTART}" \
+        --output "${TIMELINE_CSV}" 2>/dev/null; then
+    # Job was prefetched into the local history cache earlier
+    echo -e "${GREEN}Using cached history data${NC}"
+else
+    # Copy the .jhist out of HDFS unless one was given (JHIST_FILE) or fetched earlier
+    if [ ! -f "${JHIST_LOCAL}" ]; then
+        JHIST_HDFS=$(hdfs dfs -ls -R ${HISTORY_DONE_DIRS} 2>/dev/null | grep -o "/[^ ]*/${JOB_ID}-[^ ]*\.jhist$" | head -1 || true)
+        if [ -n "${JHIST_HDFS}" ]; then
+            echo -e "${BLUE}Copying ${JHIST_HDFS}${NC}"
+            hdfs dfs -get -f "${JHIST_HDFS}" "${JHIST_LOCAL}"
+        fi
+    fi
+
+    if [ ! -f "${JHIST_LOCAL}" ]; then
+        echo -e "${YELLOW}Error: no .jhist file found for ${JOB_ID}${NC}"
+        echo -e "${YELLOW}Start the JobHistory Server or pass JHIST_FILE=<path>:${NC}"
+        echo -e "  ${BLUE}mapred --daemon start historyserver${NC}"
+        exit 1
+    fi
+
+    if ! python3 "$(dirname "$0")/jhist_parser.py" "${JHIST_LOCAL}" \
+            --experiment-id "${EXPERIMENT_ID}" \
+            --slowstart "${SLOWSTART}" \
+            --output "${TIMELINE_CSV}"; then
+        echo -e "${YELLOW}Error parsing ${JHIST_LOCAL}${NC}"
+        exit 1
+    fi
 fi
 
-# Initialize CSV file
-echo "experiment_id,slowstart_value,task_id,task_type,start_time,finish_time,elapsed_sec,shuffle_finish_time,merge_finish_time,reduce_finish_time" > "${TIMELINE_CSV}"
-
-# Parse JSON and extract task information
-echo "$TASKS_JSON" | python3 -c "
-import json
-import sys
-from datetime import datetime
-
-try:
-    data = json.load(sys.stdin)
-    tasks = data.get('tasks', {}).get('task', [])
-    
-    for task in tasks:
-        task_id = task.get('id', '')
-        task_type = task.get('type', '')
-        start_time = task.get('startTime', 0) // 1000  # Convert to seconds
-        finish_time = task.get('finishTime', 0) // 1000
-        elapsed = task.get('elapsedTime', 0) // 1000
-        
-        # Get successful attempt details
-        successful_attempt = task.get('successfulAttempt', '')
-        
-        # For reduce tasks, try to get shuffle/merge/reduce times
-        shuffle_finish = ''
-        merge_finish = ''
-        reduce_finish = ''
-        
-        if task_type == 'REDUCE' and successful_attempt:
-            # Fetch attempt details
-            attempt_url = '${HISTORY_SERVER}/ws/v1/history/mapreduce/jobs/${JOB_ID}/tasks/' + task_id + '/attempts/' + successful_attempt
-            import urllib.request
-            try:
-                with urllib.request.urlopen(attempt_url, timeout=5) as response:
-                    attempt_data = json.loads(response.read())
-                    attempt_info = attempt_data.get('taskAttempt', {})
-                    shuffle_finish = attempt_info.get('shuffleFinishTime', 0) // 1000 if attempt_info.get('shuffleFinishTime') else ''
-                    merge_finish = attempt_info.get('mergeFinishTime', 0) // 1000 if attempt_info.get('mergeFinishTime') else ''
-                    # reduce_finish is same as finish_time
-                    reduce_finish = finish_time
-            except:
-                pass
-        
-        print(f'${EXPERIMENT_ID},${SLOWSTART},{task_id},{task_type},{start_time},{finish_time},{elapsed},{shuffle_finish},{merge_finish},{reduce_finish}')
-        
-except Exception as e:
-    print(f'Error: {e}', file=sys.stderr)
-    sys.exit(1)
-" >> "${TIMELINE_CSV}"
-
 echo -e "${GREEN}Timeline data extracted: ${TIMELINE_CSV}${NC}"
 
 # Generate summary statistics
 echo -e "${BLUE}Generating timeline summary...${NC}"
 
-python3 -c "
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)" python3 -c "
 import csv
+import os
+import sys
 from datetime import datetime
 
-# Read timeline data
-map_tasks = []
-reduce_tasks = []
-
-with open('${TIMELINE_CSV}', 'r') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        if row['task_type'] == 'MAP':
-            map_tasks.append({
-                'start': int(row['start_time']),
-                'finish': int(row['finish_time']),
-                'elapsed': int(row['elapsed_sec'])
-            })
-        elif row['task_type'] == 'REDUCE':
-            reduce_tasks.append({
-                'start': int(row['start_time']),
-                'finish': int(row['finish_time']),
-                'elapsed': int(row['elapsed_sec']),
-                'shuffle_finish': int(row['shuffle_finish_time']) if row['shuffle_finish_time'] else 0,
-                'merge_finish': int(row['merge_finish_time']) if row['merge_finish_time'] else 0
-            })
+sys.path.insert(0, os.environ['SCRIPT_DIR'])
+from timeline_io import load_timeline, split_tasks, to_millis
+
+# Read timeline data (epoch seconds with millisecond precision; old second-resolution CSVs load too)
+map_tasks, reduce_tasks = split_tasks(load_timeline('${TIMELINE_CSV}'))
 
 if not map_tasks:
     print('No map tasks found')
@@ -192,7 +151,13 @@ reduce_start_pct = 0
 if reduce_start > 0 and map_duration > 0:
     reduce_start_pct = ((reduce_start - map_start) / map_duration) * 100
 
-# Write summary
+def ms(ts):
+    return to_millis(ts) if ts > 0 else 0
+
+def hms(ts):
+    return datetime.fromtimestamp(ts).strftime(\"%H:%M:%S.%f\")[:-3]
+
+# Write summary (times in epoch ms, durations in seconds with millisecond precision)
 with open('${SUMMARY_CSV}', 'w', newline='') as f:
     writer = csv.writer(f)
     writer.writerow(['experiment_id', 'slowstart_value', 'num_map_tasks', 'num_reduce_tasks',
@@ -201,21 +166,21 @@ with open('${SUMMARY_CSV}', 'w', newline='') as f:
                      'overlap_duration_sec', 'reduce_start_at_map_pct', 
                      'total_time_sec', 'time_saved_sec', 'parallel_efficiency_pct'])
     writer.writerow(['${EXPERIMENT_ID}', ${SLOWSTART}, len(map_tasks), len(reduce_tasks),
-                     map_start, map_end, map_duration,
-                     reduce_start, reduce_end, reduce_duration,
-                     overlap_duration, round(reduce_start_pct, 2),
-                     actual_time, time_saved, round(parallel_efficiency, 2)])
+                     ms(map_start), ms(map_end), round(map_duration, 3),
+                     ms(reduce_start), ms(reduce_end), round(reduce_duration, 3),
+                     round(overlap_duration, 3), round(reduce_start_pct, 2),
+                     round(actual_time, 3), round(time_saved, 3), round(parallel_efficiency, 2)])
 
 # Print summary
 print(f'\n=== Timeline Summary ===')
 print(f'Map Tasks: {len(map_tasks)}')
-print(f'Map Duration: {map_duration}s ({datetime.fromtimestamp(map_start).strftime(\"%H:%M:%S\")} -> {datetime.fromtimestamp(map_end).strftime(\"%H:%M:%S\")})')
+print(f'Map Duration: {map_duration:.3f}s ({hms(map_start)} -> {hms(map_end)})')
 print(f'')
 print(f'Reduce Tasks: {len(reduce_tasks)}')
-print(f'Reduce Duration: {reduce_duration}s ({datetime.fromtimestamp(reduce_start).strftime(\"%H:%M:%S\")} -> {datetime.fromtimestamp(reduce_end).strftime(\"%H:%M:%S\")})')
+print(f'Reduce Duration: {reduce_duration:.3f}s ({hms(reduce_start)} -> {hms(reduce_end)})')
 print(f'')
 print(f'Reduce started at: {reduce_start_pct:.1f}% of Map execution time')
-print(f'Overlap Duration: {overlap_duration}s')
+print(f'Overlap Duration: {overlap_duration:.3f}s')
 print(f'Parallel Efficiency: {parallel_efficiency:.1f}% time saved')
 print(f'')
 print(f'Timeline details: ${TIMELINE_CSV}')
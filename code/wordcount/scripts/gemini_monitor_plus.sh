@@ -19,12 +19,41 @@ echo "节点: $NODE_NAME"
 echo "进程数据: $PROCESS_LOG"
 echo "网络数据: $NET_LOG"
 
+# 二进制环形缓冲模式 (MONITOR_FORMAT=ring): 由 sample_ring.py 直接读 /proc 写定长记录,
+# RING_CAPACITY 条后覆盖最旧记录; 退出时导出为上面两个文本文件的原有格式
+if [ "$MONITOR_FORMAT" = "ring" ] && command -v python3 &> /dev/null; then
+    # 每条记录 proc 80 字节 / net 44 字节: 默认 20 万条约 16MB, 1 秒间隔 20 个 JVM 时约保留 2.5 小时
+    RING_CAPACITY=${RING_CAPACITY:-200000}
+    SAMPLE_RING="$(dirname "$0")/sample_ring.py"
+    python3 "$SAMPLE_RING" record "${PROCESS_LOG%.txt}.ring" 1 --kind proc --capacity "$RING_CAPACITY" --node "$NODE_NAME" &
+    PROC_RING_PID=$!
+    python3 "$SAMPLE_RING" record "${NET_LOG%.txt}.ring" 1 --kind net --capacity "$RING_CAPACITY" --node "$NODE_NAME" &
+    NET_RING_PID=$!
+    stop_rings() {
+        kill "$PROC_RING_PID" "$NET_RING_PID" 2>/dev/null
+        wait "$PROC_RING_PID" "$NET_RING_PID" 2>/dev/null
+        python3 "$SAMPLE_RING" export "${PROCESS_LOG%.txt}.ring" --output "$PROCESS_LOG"
+        python3 "$SAMPLE_RING" export "${NET_LOG%.txt}.ring" --output "$NET_LOG"
+        exit 0
+    }
+    trap stop_rings SIGINT SIGTERM
+    echo "环形缓冲模式: 容量 ${RING_CAPACITY} 条 (0 = 不限)"
+    wait
+    stop_rings
+fi
+
 # 初始化文件头
 # 1. 进程日志头 (模拟 pidstat 输出)
 echo "Time        UID      PID    %usr %system  %guest   %wait    %CPU   CPU  Command" > "$PROCESS_LOG"
 # 2. 网络日志头
 echo "Time        IFACE      rxpck/s   txpck/s    rxkB/s    txkB/s   rxcmp/s   txcmp/s  rxmcst/s" > "$NET_LOG"
 
+# 记录本脚本自身开销 (CPU/RSS/每轮 fork 的 sar/pidstat/pgrep): ${NODE_NAME}_overhead_gemini_monitor_plus_*.csv
+if [ -r /proc/stat ] && command -v python3 &> /dev/null; then
+    python3 "$(dirname "$0")/sampler_overhead.py" watch $$ "$NODE_NAME" --name gemini_monitor_plus \
+        --output-dir "$OUTPUT_DIR" > /dev/null &
+fi
+
 while true; do
     # 1. 获取时间戳
     TIMESTAMP=$(date +"%H:%M:%S")
@@ -197,3 +197,9 @@ echo "" >> "$REPORT_FILE"
 echo "Report generation completed: $(date)" >> "$REPORT_FILE"
 
 echo "Analysis report generated successfully: $REPORT_FILE"
+
+# Bootstrap confidence intervals and effect sizes (Markdown + HTML next to the text report)
+if python3 -c "import numpy" 2>/dev/null; then
+    python3 "$(dirname "$0")/stats_report.py" "$CSV_FILE" --output "${REPORT_FILE%.txt}_stats" \
+        || echo "Warning: statistical report generation failed"
+fi
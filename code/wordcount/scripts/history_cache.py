@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Immutable On-Disk Cache for Completed-Job History Data
+The JobHistory Server only serves finished jobs, so every response for a
+job (task list, attempts, counters) is immutable and can be stored once and
+reused forever. Bodies are gzip-compressed and stored by content hash;
+per-job refs map each endpoint to its object.
+Usage: python3 history_cache.py [--cache-dir metrics/history_cache] [job_id ...]
+
+Layout:
+    <cache_dir>/objects/<ab>/<sha256>.json.gz    response bodies
+    <cache_dir>/refs/<job_id>/<sha1(endpoint)>   "<sha256> <endpoint>"
+
+Populate with `jobhistory_client.py prefetch <job_id> ...`; read through
+any client built with open_client() (add --offline to never touch the network).
+"""
+
+import argparse
+import gzip
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+
+DEFAULT_CACHE_DIR = os.environ.get('MR_HISTORY_CACHE', 'metrics/history_cache')
+
+# Only per-job endpoints are immutable; the /jobs listing grows as jobs finish
+JOB_PATH_RE = re.compile(r'^/jobs/(job_\d+_\d+)(/.*)?$')
+
+
+def cacheable_job(path):
+    """Return the job ID an API path belongs to, or None if it must not be cached"""
+    match = JOB_PATH_RE.match(path)
+    return match.group(1) if match else None
+
+
+def atomic_write(path, data):
+    """Write bytes via a temp file + rename so readers never see partial files"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class HistoryCache:
+    """Content-addressed store of JobHistory responses keyed by job ID and endpoint"""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, offline=False):
+        self.root = root
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], f'{digest}.json.gz')
+
+    def _ref_path(self, job_id, endpoint):
+        name = hashlib.sha1(endpoint.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, 'refs', job_id, name)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, job_id, endpoint):
+        """Return the cached response body (bytes) or None"""
+        try:
+            with open(self._ref_path(job_id, endpoint), 'r') as f:
+                digest = f.read().split(' ', 1)[0]
+            with gzip.open(self._object_path(digest), 'rb') as f:
+                body = f.read()
+        except (OSError, EOFError):
+            self._count(False)
+            return None
+        if hashlib.sha256(body).hexdigest() != digest:
+            # Corrupt object: treat as a miss so it is refetched and rewritten
+            self._count(False)
+            return None
+        self._count(True)
+        return body
+
+    def put(self, job_id, endpoint, body):
+        """Store a response body; identical bodies share one object"""
+        digest = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            atomic_write(object_path, gzip.compress(body, compresslevel=6, mtime=0))
+        atomic_write(self._ref_path(job_id, endpoint), f'{digest} {endpoint}\n'.encode('utf-8'))
+        return digest
+
+    def jobs(self):
+        refs = os.path.join(self.root, 'refs')
+        return sorted(os.listdir(refs)) if os.path.isdir(refs) else []
+
+    def job_summary(self, job_id):
+        """(endpoint count, compressed bytes) for one cached job"""
+        ref_dir = os.path.join(self.root, 'refs', job_id)
+        count = 0
+        size = 0
+        for name in os.listdir(ref_dir):
+            with open(os.path.join(ref_dir, name), 'r') as f:
+                digest = f.read().split(' ', 1)[0]
+            count += 1
+            try:
+                size += os.path.getsize(self._object_path(digest))
+            except OSError:
+                pass
+        return count, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect the JobHistory response cache')
+    parser.add_argument('job_ids', nargs='*', help='Jobs to show (default: all cached jobs)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    cache = HistoryCache(args.cache_dir)
+    job_ids = args.job_ids or cache.jobs()
+    if not job_ids:
+        print(f"No cached jobs in {args.cache_dir}")
+        return
+
+    total = 0
+    print(f"{'job_id':<28} {'endpoints':>9} {'size_kb':>9}")
+    for job_id in job_ids:
+        try:
+            count, size = cache.job_summary(job_id)
+        except OSError:
+            print(f"{job_id:<28} {'-':>9} {'-':>9}")
+            continue
+        total += size
+        print(f"{job_id:<28} {count:>9} {size / 1024:>9.1f}")
+    print(f"Total: {len(job_ids)} jobs, {total / 1024 / 1024:.2f} MB in {args.cache_dir}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Offline .jhist Event-File Parser
+Streams the Avro-JSON job history file a finished job leaves in the HDFS
+done directory and rebuilds the task timeline (task/attempt start and finish,
+shuffle/merge finish, host, counters) without a running JobHistory Server.
+Usage: python3 jhist_parser.py <job.jhist> --experiment-id <id> --slowstart <value>
+       --output metrics/<id>_slowstart_<value>_timeline.csv [--counters-prefix metrics/<id>_slowstart_<value>]
+
+Copy the file out of HDFS first, e.g.
+    hdfs dfs -get /tmp/hadoop-yarn/staging/history/done/2025/11/28/000000/job_..._0018-*.jhist .
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import sys
+
+from jobhistory_client import TIMELINE_HEADER, timeline_rows
+from job_counters import COUNTERS_HEADER
+
+JHIST_MAGIC = 'Avro-Json'
+EVENT_NAMESPACE = 'org.apache.hadoop.mapreduce.jobhistory.'
+AVRO_PRIMITIVES = {'null', 'boolean', 'int', 'long', 'float', 'double', 'bytes', 'string'}
+
+ATTEMPT_STARTED = {'MAP_ATTEMPT_STARTED', 'REDUCE_ATTEMPT_STARTED',
+                   'SETUP_ATTEMPT_STARTED', 'CLEANUP_ATTEMPT_STARTED'}
+ATTEMPT_FINISHED = {'MAP_ATTEMPT_FINISHED', 'REDUCE_ATTEMPT_FINISHED',
+                    'SETUP_ATTEMPT_FINISHED', 'CLEANUP_ATTEMPT_FINISHED'}
+ATTEMPT_UNSUCCESSFUL = {'MAP_ATTEMPT_FAILED', 'MAP_ATTEMPT_KILLED', 'REDUCE_ATTEMPT_FAILED',
+                        'REDUCE_ATTEMPT_KILLED', 'SETUP_ATTEMPT_FAILED', 'SETUP_ATTEMPT_KILLED',
+                        'CLEANUP_ATTEMPT_FAILED', 'CLEANUP_ATTEMPT_KILLED'}
+
+
+def unwrap(value):
+    """Strip Avro-JSON union wrappers: {"string": "x"} -> "x" """
+    if isinstance(value, dict):
+        if len(value) == 1:
+            (key, inner), = value.items()
+            if key in AVRO_PRIMITIVES or key.startswith(EVENT_NAMESPACE):
+                return unwrap(inner)
+        return {k: unwrap(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [unwrap(v) for v in value]
+    return value
+
+
+def counters_dict(counters):
+    """JhCounters record -> {group: {name: value}}"""
+    if not counters:
+        return {}
+    return {group['name']: {c['name']: c['value'] for c in group.get('counts', [])}
+            for group in counters.get('groups', [])}
+
+
+def open_jhist(path):
+    return gzip.open(path, 'rt') if path.endswith('.gz') else open(path, 'r')
+
+
+def iter_events(path):
+    """
+    Yield (event_type, payload) for every event in a .jhist file
+
+    The first two lines are the "Avro-Json" magic and the schema; after
+    that there is one JSON event per line, so the file is never held in
+    memory.
+    """
+    with open_jhist(path) as f:
+        magic = f.readline().strip()
+        if magic != JHIST_MAGIC:
+            raise ValueError(f"{path}: not an Avro-Json .jhist file (header {magic[:20]!r})")
+        f.readline()  # schema
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            yield record.get('type', ''), unwrap(record.get('event', {}))
+
+
+def iter_tasks(path, include_auxiliary=False):
+    """
+    Yield one REST-shaped task dict per finished task, in completion order
+
+    Attempts always precede their TASK_FINISHED/TASK_FAILED event, so a
+    task is emitted and dropped as soon as it completes; memory is bounded
+    by the number of tasks in flight rather than the size of the job.
+    Each dict has the same keys as the JobHistory /tasks API plus an
+    'attempt' dict for the successful (or last) attempt and 'counters'.
+    """
+    pending = {}
+
+    def task_state(task_id, task_type=''):
+        return pending.setdefault(task_id, {'id': task_id, 'type': task_type, 'startTime': 0,
+                                            'attempts': {}, 'last_attempt': None})
+
+    for event_type, payload in iter_events(path):
+        if event_type == 'TASK_STARTED':
+            task = task_state(payload['taskid'], payload.get('taskType', ''))
+            task['type'] = payload.get('taskType', task['type'])
+            task['startTime'] = payload.get('startTime', 0)
+            task['splitLocations'] = payload.get('splitLocations', '')
+
+        elif event_type in ATTEMPT_STARTED:
+            task = task_state(payload['taskid'], payload.get('taskType', ''))
+            attempt_id = payload['attemptId']
+            tracker = (payload.get('trackerName') or '').split('/')[-1]
+            http_port = payload.get('httpPort')
+            task['attempts'][attempt_id] = {
+                'id': attempt_id,
+                'startTime': payload.get('startTime', 0),
+                'nodeHttpAddress': f"{tracker}:{http_port}" if tracker and http_port else tracker,
+                'assignedContainerId': payload.get('containerId', ''),
+                'locality': payload.get('locality', ''),
+            }
+            task['last_attempt'] = attempt_id
+
+        elif event_type in ATTEMPT_FINISHED or event_type in ATTEMPT_UNSUCCESSFUL:
+            task = task_state(payload['taskid'], payload.get('taskType', ''))
+            attempt_id = payload['attemptId']
+            attempt = task['attempts'].setdefault(attempt_id, {'id': attempt_id, 'startTime': 0})
+            host = payload.get('hostname') or ''
+            attempt.update({
+                'state': payload.get('taskStatus') or payload.get('status', ''),
+                'finishTime': payload.get('finishTime', 0),
+                'rack': payload.get('rackname', ''),
+                'counters': counters_dict(payload.get('counters')),
+            })
+            if host and not attempt.get('nodeHttpAddress'):
+                attempt['nodeHttpAddress'] = host
+            if 'shuffleFinishTime' in payload:
+                attempt['shuffleFinishTime'] = payload['shuffleFinishTime']
+                attempt['mergeFinishTime'] = payload.get('sortFinishTime', 0)
+            if event_type in ATTEMPT_UNSUCCESSFUL:
+                attempt['diagnostics'] = payload.get('error', '')
+            task['last_attempt'] = attempt_id
+
+        elif event_type in ('TASK_FINISHED', 'TASK_FAILED'):
+            task = pending.pop(payload['taskid'], None) or {'id': payload['taskid'], 'type': '', 'startTime': 0,
+                                                            'attempts': {}, 'last_attempt': None}
+            finished = event_type == 'TASK_FINISHED'
+            attempt_id = (payload.get('successfulAttemptId') if finished
+                          else payload.get('failedDueToAttempt')) or task['last_attempt']
+            attempt = task['attempts'].get(attempt_id) or {}
+            finish = payload.get('finishTime', 0)
+            task_type = payload.get('taskType') or task['type']
+            if not include_auxiliary and task_type not in ('MAP', 'REDUCE'):
+                continue
+            yield {
+                'id': task['id'],
+                'type': task_type,
+                'state': 'SUCCEEDED' if finished else payload.get('status', 'FAILED'),
+                'startTime': task['startTime'],
+                'finishTime': finish,
+                'elapsedTime': finish - task['startTime'] if finish and task['startTime'] else 0,
+                'successfulAttempt': attempt_id if finished else '',
+                'numAttempts': len(task['attempts']),
+                'attempt': attempt,
+                'counters': counters_dict(payload.get('counters')) or attempt.get('counters', {}),
+            }
+
+
+def job_counter_rows(path):
+    """Job-scope counter rows from the JOB_FINISHED event (total/map/reduce)"""
+    job_id = ''
+    for event_type, payload in iter_events(path):
+        if event_type == 'JOB_FINISHED':
+            job_id = payload.get('jobid', '')
+            totals = counters_dict(payload.get('totalCounters'))
+            maps = counters_dict(payload.get('mapCounters'))
+            reduces = counters_dict(payload.get('reduceCounters'))
+            rows = []
+            for group, values in totals.items():
+                for name, value in values.items():
+                    rows.append({'job_id': job_id, 'scope': 'job', 'task_id': '', 'task_type': '',
+                                 'counter_group': group, 'counter_name': name, 'value': value,
+                                 'map_value': maps.get(group, {}).get(name, 0),
+                                 'reduce_value': reduces.get(group, {}).get(name, 0)})
+            return job_id, rows
+    return job_id, []
+
+
+def task_counter_rows(job_id, task):
+    return [{'job_id': job_id, 'scope': 'task', 'task_id': task['id'], 'task_type': task['type'],
+             'counter_group': group, 'counter_name': name, 'value': value,
+             'map_value': '', 'reduce_value': ''}
+            for group, values in task['counters'].items() for name, value in values.items()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline .jhist timeline extraction')
+    parser.add_argument('jhist', help='Job history file (.jhist, optionally .gz)')
+    parser.add_argument('--experiment-id', required=True)
+    parser.add_argument('--slowstart', required=True)
+    parser.add_argument('--output', required=True, help='Timeline CSV path')
+    parser.add_argument('--counters-prefix', default=None,
+                        help='Also write <prefix>_counters.csv (same layout as job_counters.py)')
+    args = parser.parse_args()
+
+    counters_file = None
+    counters_writer = None
+    job_id = ''
+    try:
+        if args.counters_prefix:
+            # Job totals sit in the last event; a first pass keeps the second one streaming
+            job_id, job_rows = job_counter_rows(args.jhist)
+            counters_file = open(f"{args.counters_prefix}_counters.csv", 'w', newline='')
+            counters_writer = csv.DictWriter(counters_file, fieldnames=COUNTERS_HEADER)
+            counters_writer.writeheader()
+            counters_writer.writerows(job_rows)
+
+        counts = {'MAP': 0, 'REDUCE': 0}
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=TIMELINE_HEADER)
+            writer.writeheader()
+            for task in iter_tasks(args.jhist):
+                writer.writerows(timeline_rows([task], args.experiment_id, args.slowstart))
+                counts[task['type']] = counts.get(task['type'], 0) + 1
+                if counters_writer:
+                    counters_writer.writerows(task_counter_rows(job_id, task))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if counters_file:
+            counters_file.close()
+
+    print(f"Parsed {counts['MAP']} map and {counts['REDUCE']} reduce tasks from {args.jhist}")
+    print(f"Timeline: {args.output}")
+    if args.counters_prefix:
+        print(f"Counters: {args.counters_prefix}_counters.csv")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Job and Task Counter Ingestion
+Pulls the full job counters and per-task counters of a MapReduce job into a
+structured table, either from the JobHistory REST API or from the job client
+output ("Counters: N" block printed by hadoop jar).
+Usage:
+  python3 job_counters.py ingest --log metrics/job_<id>.log --output-prefix metrics/<id>_slowstart_<v>
+  python3 job_counters.py ingest --job-id <job_id> --server http://hadoop001:19888 --output-prefix ...
+  python3 job_counters.py stats --log metrics/job_<id>.log
+"""
+
+import argparse
+import csv
+import re
+import sys
+
+from jobhistory_client import JobHistoryError, add_client_arguments, open_client
+
+# Per-task counters kept as columns of the wide task table
+TASK_COUNTER_COLUMNS = [
+    'MAP_INPUT_RECORDS', 'MAP_OUTPUT_RECORDS', 'MAP_OUTPUT_BYTES', 'MAP_OUTPUT_MATERIALIZED_BYTES',
+    'REDUCE_INPUT_RECORDS', 'REDUCE_SHUFFLE_BYTES', 'SPILLED_RECORDS',
+    'GC_TIME_MILLIS', 'CPU_MILLISECONDS', 'PHYSICAL_MEMORY_BYTES',
+    'HDFS_BYTES_READ', 'HDFS_BYTES_WRITTEN', 'FILE_BYTES_READ', 'FILE_BYTES_WRITTEN',
+]
+COUNTERS_HEADER = ['job_id', 'scope', 'task_id', 'task_type', 'counter_group', 'counter_name',
+                   'value', 'map_value', 'reduce_value']
+
+# Group display names printed by the job client
+GROUP_NAMES = {
+    'File System Counters': 'org.apache.hadoop.mapreduce.FileSystemCounter',
+    'Job Counters': 'org.apache.hadoop.mapreduce.JobCounter',
+    'Map-Reduce Framework': 'org.apache.hadoop.mapreduce.TaskCounter',
+    'Shuffle Errors': 'Shuffle Errors',
+    'File Input Format Counters': 'org.apache.hadoop.mapreduce.lib.input.FileInputFormatCounter',
+    'File Output Format Counters': 'org.apache.hadoop.mapreduce.lib.output.FileOutputFormatCounter',
+}
+
+# Counter display names printed by the job client -> counter enum names
+DISPLAY_NAMES = {
+    'Launched map tasks': 'TOTAL_LAUNCHED_MAPS',
+    'Launched reduce tasks': 'TOTAL_LAUNCHED_REDUCES',
+    'Failed map tasks': 'NUM_FAILED_MAPS',
+    'Failed reduce tasks': 'NUM_FAILED_REDUCES',
+    'Killed map tasks': 'NUM_KILLED_MAPS',
+    'Killed reduce tasks': 'NUM_KILLED_REDUCES',
+    'Data-local map tasks': 'DATA_LOCAL_MAPS',
+    'Rack-local map tasks': 'RACK_LOCAL_MAPS',
+    'Other local map tasks': 'OTHER_LOCAL_MAPS',
+    'Total time spent by all maps in occupied slots (ms)': 'SLOTS_MILLIS_MAPS',
+    'Total time spent by all reduces in occupied slots (ms)': 'SLOTS_MILLIS_REDUCES',
+    'Total time spent by all map tasks (ms)': 'MILLIS_MAPS',
+    'Total time spent by all reduce tasks (ms)': 'MILLIS_REDUCES',
+    'Total vcore-milliseconds taken by all map tasks': 'VCORES_MILLIS_MAPS',
+    'Total vcore-milliseconds taken by all reduce tasks': 'VCORES_MILLIS_REDUCES',
+    'Total megabyte-milliseconds taken by all map tasks': 'MB_MILLIS_MAPS',
+    'Total megabyte-milliseconds taken by all reduce tasks': 'MB_MILLIS_REDUCES',
+    'Map input records': 'MAP_INPUT_RECORDS',
+    'Map output records': 'MAP_OUTPUT_RECORDS',
+    'Map output bytes': 'MAP_OUTPUT_BYTES',
+    'Map output materialized bytes': 'MAP_OUTPUT_MATERIALIZED_BYTES',
+    'Input split bytes': 'SPLIT_RAW_BYTES',
+    'Combine input records': 'COMBINE_INPUT_RECORDS',
+    'Combine output records': 'COMBINE_OUTPUT_RECORDS',
+    'Reduce input groups': 'REDUCE_INPUT_GROUPS',
+    'Reduce shuffle bytes': 'REDUCE_SHUFFLE_BYTES',
+    'Reduce input records': 'REDUCE_INPUT_RECORDS',
+    'Reduce output records': 'REDUCE_OUTPUT_RECORDS',
+    'Spilled Records': 'SPILLED_RECORDS',
+    'Shuffled Maps': 'SHUFFLED_MAPS',
+    'Failed Shuffles': 'FAILED_SHUFFLE',
+    'Merged Map outputs': 'MERGED_MAP_OUTPUTS',
+    'GC time elapsed (ms)': 'GC_TIME_MILLIS',
+    'CPU time spent (ms)': 'CPU_MILLISECONDS',
+    'Physical memory (bytes) snapshot': 'PHYSICAL_MEMORY_BYTES',
+    'Virtual memory (bytes) snapshot': 'VIRTUAL_MEMORY_BYTES',
+    'Total committed heap usage (bytes)': 'COMMITTED_HEAP_BYTES',
+    'Peak Map Physical memory (bytes)': 'MAP_PHYSICAL_MEMORY_BYTES_MAX',
+    'Peak Map Virtual memory (bytes)': 'MAP_VIRTUAL_MEMORY_BYTES_MAX',
+    'Peak Reduce Physical memory (bytes)': 'REDUCE_PHYSICAL_MEMORY_BYTES_MAX',
+    'Peak Reduce Virtual memory (bytes)': 'REDUCE_VIRTUAL_MEMORY_BYTES_MAX',
+    'Bytes Read': 'BYTES_READ',
+    'Bytes Written': 'BYTES_WRITTEN',
+}
+
+# "HDFS: Number of bytes read" -> HDFS_BYTES_READ
+FS_COUNTER_RE = re.compile(r'^(\w+): Number of (bytes read|bytes written|read operations|'
+                           r'large read operations|write operations|bytes read erasure-coded)$')
+FS_SUFFIXES = {
+    'bytes read': 'BYTES_READ', 'bytes written': 'BYTES_WRITTEN', 'read operations': 'READ_OPS',
+    'large read operations': 'LARGE_READ_OPS', 'write operations': 'WRITE_OPS',
+    'bytes read erasure-coded': 'BYTES_READ_EC',
+}
+COUNTERS_LINE_RE = re.compile(r'\bCounters: \d+\s*$')
+JOB_ID_RE = re.compile(r'\b(job_\d+_\d+)\b')
+
+
+def counter_name(display):
+    """Translate a job client display name into the counter enum name"""
+    display = display.strip()
+    if display in DISPLAY_NAMES:
+        return DISPLAY_NAMES[display]
+    match = FS_COUNTER_RE.match(display)
+    if match:
+        return f"{match.group(1).upper()}_{FS_SUFFIXES[match.group(2)]}"
+    return re.sub(r'[^A-Za-z0-9]+', '_', display).strip('_').upper()
+
+
+def parse_client_output(lines):
+    """
+    Parse the "Counters: N" block of hadoop jar console output
+
+    Returns (job_id, counters) where counters is {(group, name): value}.
+    Only the last block is kept, so retried submissions in one log are fine.
+    """
+    job_id = None
+    counters = {}
+    group = None
+    in_block = False
+    for raw in lines:
+        line = raw.rstrip('\n')
+        match = JOB_ID_RE.search(line)
+        if match and 'mapreduce.Job' in line:
+            job_id = match.group(1)
+        if COUNTERS_LINE_RE.search(line):
+            in_block = True
+            counters = {}
+            group = None
+            continue
+        if not in_block:
+            continue
+        if not line.startswith('\t') and not line.startswith(' '):
+            in_block = False
+            continue
+        text = line.strip()
+        if '=' in text:
+            display, _, value = text.rpartition('=')
+            try:
+                counters[(group or '', counter_name(display))] = int(value.replace(',', ''))
+            except ValueError:
+                continue
+        elif text:
+            group = GROUP_NAMES.get(text, text)
+    return job_id, counters
+
+
+def rows_from_client_output(job_id, counters):
+    return [{'job_id': job_id or '', 'scope': 'job', 'task_id': '', 'task_type': '',
+             'counter_group': group, 'counter_name': name, 'value': value,
+             'map_value': '', 'reduce_value': ''}
+            for (group, name), value in sorted(counters.items())]
+
+
+def fetch_rest_counters(client, job_id):
+    """
+    Fetch job counters plus every task's counters concurrently
+
+    Returns (rows, task_table, errors).
+    """
+    rows = []
+    data = client.get_json(f'/jobs/{job_id}/counters')
+    for group in (data.get('jobCounters') or {}).get('counterGroup', []):
+        for counter in group.get('counter', []):
+            rows.append({'job_id': job_id, 'scope': 'job', 'task_id': '', 'task_type': '',
+                         'counter_group': group.get('counterGroupName', ''),
+                         'counter_name': counter.get('name', ''),
+                         'value': counter.get('totalCounterValue', ''),
+                         'map_value': counter.get('mapCounterValue', ''),
+                         'reduce_value': counter.get('reduceCounterValue', '')})
+
+    tasks = client.list_tasks(job_id)
+    results, errors = client.map_concurrent(
+        lambda task: client.get_json(f"/jobs/{job_id}/tasks/{task['id']}/counters"), tasks)
+
+    task_table = []
+    for task, result in zip(tasks, results):
+        if result is None:
+            continue
+        wide = {'task_id': task['id'], 'task_type': task.get('type', '')}
+        for group in (result.get('jobTaskCounters') or {}).get('taskCounterGroup', []):
+            for counter in group.get('counter', []):
+                name = counter.get('name', '')
+                rows.append({'job_id': job_id, 'scope': 'task', 'task_id': task['id'],
+                             'task_type': task.get('type', ''),
+                             'counter_group': group.get('counterGroupName', ''),
+                             'counter_name': name, 'value': counter.get('value', ''),
+                             'map_value': '', 'reduce_value': ''})
+                if name in TASK_COUNTER_COLUMNS:
+                    wide[name] = counter.get('value', '')
+        task_table.append(wide)
+    return rows, task_table, errors
+
+
+def job_totals(rows):
+    """{counter_name: value} for job-scope rows"""
+    totals = {}
+    for row in rows:
+        if row['scope'] == 'job' and row['value'] != '':
+            totals[row['counter_name']] = int(row['value'])
+    return totals
+
+
+def job_stats(rows):
+    """
+    Values for process_metrics.sh: bytes_read bytes_written map_tasks reduce_tasks
+
+    Task counts are launched minus failed and killed attempts, i.e. the
+    number of tasks that actually ran to completion. When the JobCounter
+    group is missing they are counted from the per-task rows instead.
+    """
+    totals = job_totals(rows)
+    if 'TOTAL_LAUNCHED_MAPS' in totals:
+        maps = (totals['TOTAL_LAUNCHED_MAPS'] - totals.get('NUM_FAILED_MAPS', 0)
+                - totals.get('NUM_KILLED_MAPS', 0))
+        reduces = (totals.get('TOTAL_LAUNCHED_REDUCES', 0) - totals.get('NUM_FAILED_REDUCES', 0)
+                   - totals.get('NUM_KILLED_REDUCES', 0))
+    else:
+        task_ids = {(row['task_type'], row['task_id']) for row in rows if row['scope'] == 'task'}
+        maps = sum(1 for task_type, _ in task_ids if task_type == 'MAP')
+        reduces = sum(1 for task_type, _ in task_ids if task_type == 'REDUCE')
+    return (totals.get('HDFS_BYTES_READ', 0), totals.get('HDFS_BYTES_WRITTEN', 0),
+            max(maps, 0), max(reduces, 0))
+
+
+def load_rows(args):
+    """Load counter rows from REST when a job ID is available, else from the log"""
+    log_job_id, log_counters = None, {}
+    if args.log:
+        with open(args.log, 'r', errors='replace') as f:
+            log_job_id, log_counters = parse_client_output(f)
+
+    job_id = args.job_id or log_job_id
+    if job_id and not args.no_rest:
+        client = open_client(args)
+        if client:
+            with client:
+                try:
+                    rows, task_table, errors = fetch_rest_counters(client, job_id)
+                    for task, error in errors:
+                        print(f"Warning: counters unavailable for {task.get('id')}: {error}", file=sys.stderr)
+                    return rows, task_table
+                except JobHistoryError as e:
+                    print(f"Warning: REST counters unavailable for {job_id}: {e}", file=sys.stderr)
+
+    if not log_counters:
+        raise ValueError('no counters found (no reachable JobHistory Server and no Counters block in log)')
+    return rows_from_client_output(job_id, log_counters), []
+
+
+def write_tables(rows, task_table, prefix):
+    """Write <prefix>_counters.csv and, for REST data, <prefix>_task_counters.csv"""
+    counters_csv = f"{prefix}_counters.csv"
+    with open(counters_csv, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COUNTERS_HEADER)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    task_csv = None
+    if task_table:
+        task_csv = f"{prefix}_task_counters.csv"
+        with open(task_csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['task_id', 'task_type'] + TASK_COUNTER_COLUMNS,
+                                    restval='')
+            writer.writeheader()
+            writer.writerows(task_table)
+    return counters_csv, task_csv
+
+
+def cmd_ingest(args):
+    try:
+        rows, task_table = load_rows(args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    counters_csv, task_csv = write_tables(rows, task_table, args.output_prefix)
+    print(f"Counters ({len(rows)} rows): {counters_csv}")
+    if task_csv:
+        print(f"Task counters ({len(task_table)} tasks): {task_csv}")
+    return 0
+
+
+def cmd_stats(args):
+    try:
+        rows, task_table = load_rows(args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if args.output_prefix:
+        # stdout is parsed by process_metrics.sh, so keep it to the stats line
+        write_tables(rows, task_table, args.output_prefix)
+    print(' '.join(str(v) for v in job_stats(rows)))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Job and task counter ingestion')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, func, help_text in [('ingest', cmd_ingest, 'Write job/task counter tables'),
+                                  ('stats', cmd_stats, 'Print "bytes_read bytes_written map_tasks reduce_tasks"')]:
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('--log', default=None, help='hadoop jar console output (job client log)')
+        sub.add_argument('--job-id', default=None, help='Job ID (default: parsed from --log)')
+        sub.add_argument('--no-rest', action='store_true', help='Only use the job client log')
+        add_client_arguments(sub)
+        sub.add_argument('--output-prefix', required=(name == 'ingest'),
+                         help='Write <prefix>_counters.csv and <prefix>_task_counters.csv')
+        sub.set_defaults(func=func)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Concurrent JobHistory REST Client
+Fetches task and attempt details for a finished MapReduce job over pooled
+keep-alive HTTP connections with bounded parallelism and retries.
+Usage:
+  python3 jobhistory_client.py timeline <job_id> --server http://hadoop001:19888 \\
+      --experiment-id <id> --slowstart <value> --output metrics/<id>_slowstart_<value>_timeline.csv
+  python3 jobhistory_client.py prefetch <job_id> [<job_id> ...] [--from-file jobs.txt]
+"""
+
+import argparse
+import csv
+import http.client
+import json
+import queue
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from history_cache import DEFAULT_CACHE_DIR, HistoryCache, cacheable_job
+
+API_PREFIX = '/ws/v1/history/mapreduce'
+DEFAULT_SERVERS = ['http://hadoop001:19888', 'http://localhost:19888']
+
+TIMELINE_HEADER = [
+    'experiment_id', 'slowstart_value', 'task_id', 'task_type', 'start_time', 'finish_time',
+    'elapsed_sec', 'shuffle_finish_time', 'merge_finish_time', 'reduce_finish_time',
+    'successful_attempt', 'node_http_address',
+]
+
+
+class JobHistoryError(Exception):
+    """Raised when a JobHistory request fails permanently"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class ConnectionPool:
+    """Fixed-size pool of keep-alive HTTP connections to one server"""
+
+    def __init__(self, base_url, size, timeout):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or 'http'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = queue.Queue()
+        for _ in range(size):
+            self._slots.put(None)
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def acquire(self):
+        self._slots.get()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn, reusable=True):
+        if reusable:
+            self._idle.put(conn)
+        else:
+            conn.close()
+        self._slots.put(None)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class JobHistoryClient:
+    """Client for the MapReduce JobHistory Server REST API"""
+
+    def __init__(self, base_url, max_workers=8, retries=3, timeout=10, backoff=0.5, cache=None):
+        self.base_url = base_url.rstrip('/')
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = cache
+        self.pool = ConnectionPool(self.base_url, max_workers, timeout)
+
+    def close(self):
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_json(self, path):
+        """
+        GET API_PREFIX + path, retrying connection errors and 5xx responses
+
+        Per-job paths are served from / stored in the history cache when one
+        is attached; an offline cache raises instead of going to the network.
+        """
+        url_path = API_PREFIX + path
+        job_id = cacheable_job(path) if self.cache else None
+        if self.cache:
+            body = self.cache.get(job_id, path) if job_id else None
+            if body is not None:
+                return json.loads(body)
+            if self.cache.offline:
+                raise JobHistoryError(f"{url_path}: not in history cache (offline)", 404)
+
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+            conn = self.pool.acquire()
+            reusable = False
+            try:
+                conn.request('GET', url_path, headers={'Accept': 'application/json',
+                                                       'Connection': 'keep-alive'})
+                response = conn.getresponse()
+                body = response.read()
+                reusable = not response.will_close
+            except (OSError, http.client.HTTPException) as e:
+                last_error = JobHistoryError(f"{url_path}: {e}")
+                continue
+            finally:
+                self.pool.release(conn, reusable)
+
+            if response.status == 200:
+                try:
+                    data = json.loads(body)
+                except ValueError as e:
+                    raise JobHistoryError(f"{url_path}: invalid JSON ({e})", response.status)
+                if job_id:
+                    self.cache.put(job_id, path, body)
+                return data
+            message = f"{url_path}: HTTP {response.status} {body[:200].decode('utf-8', 'replace')}"
+            if response.status < 500:
+                # 404 for an unknown job/task will not succeed on retry
+                raise JobHistoryError(message, response.status)
+            last_error = JobHistoryError(message, response.status)
+        raise last_error
+
+    def is_available(self):
+        try:
+            self.get_json('/jobs')
+            return True
+        except JobHistoryError:
+            return False
+
+    def list_tasks(self, job_id):
+        data = self.get_json(f'/jobs/{job_id}/tasks')
+        return (data.get('tasks') or {}).get('task', [])
+
+    def get_attempt(self, job_id, task_id, attempt_id):
+        data = self.get_json(f'/jobs/{job_id}/tasks/{task_id}/attempts/{attempt_id}')
+        return data.get('taskAttempt', {})
+
+    def map_concurrent(self, func, items):
+        """
+        Apply func to items on the bounded worker pool
+
+        Returns (results, errors): results are in input order (None for
+        failures) and errors is a list of (item, exception).
+        """
+        results = [None] * len(items)
+        errors = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(func, item) for item in items]
+            for i, future in enumerate(futures):
+                try:
+                    results[i] = future.result()
+                except JobHistoryError as e:
+                    errors.append((items[i], e))
+        return results, errors
+
+    def fetch_task_details(self, job_id):
+        """
+        Fetch every task plus its successful attempt, MAP and REDUCE alike
+
+        Returns (tasks, errors) where each task dict carries an 'attempt' key
+        (empty dict if the attempt could not be fetched).
+        """
+        tasks = self.list_tasks(job_id)
+
+        def fetch(task):
+            attempt_id = task.get('successfulAttempt')
+            if not attempt_id:
+                return {}
+            return self.get_attempt(job_id, task['id'], attempt_id)
+
+        attempts, errors = self.map_concurrent(fetch, tasks)
+        for task, attempt in zip(tasks, attempts):
+            task['attempt'] = attempt or {}
+        return tasks, errors
+
+    def prefetch(self, job_ids):
+        """
+        Fetch everything the analysis scripts read for many jobs at once
+
+        Job info, job counters and task lists are fetched per job, then the
+        task counters and successful attempts of all jobs share one worker
+        pool. Returns (per-job {job_id: task count}, errors).
+        """
+        def fetch_job(job_id):
+            self.get_json(f'/jobs/{job_id}')
+            self.get_json(f'/jobs/{job_id}/counters')
+            return self.list_tasks(job_id)
+
+        task_lists, errors = self.map_concurrent(fetch_job, job_ids)
+        items = []
+        counts = {}
+        for job_id, tasks in zip(job_ids, task_lists):
+            if tasks is None:
+                continue
+            counts[job_id] = len(tasks)
+            for task in tasks:
+                items.append((job_id, task['id'], task.get('successfulAttempt')))
+
+        def fetch_task(item):
+            job_id, task_id, attempt_id = item
+            self.get_json(f'/jobs/{job_id}/tasks/{task_id}/counters')
+            if attempt_id:
+                self.get_attempt(job_id, task_id, attempt_id)
+
+        _, task_errors = self.map_concurrent(fetch_task, items)
+        return counts, errors + task_errors
+
+
+def find_server(candidates, timeout=5):
+    """Return the first responsive JobHistory server URL, or None"""
+    for url in candidates:
+        client = JobHistoryClient(url, max_workers=1, retries=0, timeout=timeout)
+        try:
+            if client.is_available():
+                return url
+        finally:
+            client.close()
+    return None
+
+
+def open_client(args):
+    """
+    Build a client from add_client_arguments() options
+
+    Without a reachable server the cache is used offline, so analyses of
+    already-fetched jobs keep working. Returns None when neither is usable.
+    """
+    cache = None if args.no_cache else HistoryCache(args.cache_dir, offline=args.offline)
+    server = args.server
+    if not server and not args.offline:
+        server = find_server(DEFAULT_SERVERS)
+    if not server:
+        if cache is None:
+            return None
+        cache.offline = True
+        server = DEFAULT_SERVERS[0]
+    return JobHistoryClient(server, max_workers=args.workers, retries=args.retries,
+                            timeout=args.timeout, cache=cache)
+
+
+def describe_client(client):
+    if client.cache is None:
+        return client.base_url
+    if client.cache.offline:
+        return f"history cache {client.cache.root} (offline, {client.cache.hits} hits)"
+    return f"{client.base_url} (cache: {client.cache.hits} hits, {client.cache.misses} misses)"
+
+
+def to_ms(ms):
+    """JobHistory epoch milliseconds, kept as-is ('' when unset)"""
+    return int(ms) if ms and ms > 0 else ''
+
+
+def timeline_rows(tasks, experiment_id, slowstart):
+    """Convert fetched task details into timeline CSV rows (times in epoch ms)"""
+    rows = []
+    for task in tasks:
+        attempt = task.get('attempt', {})
+        start = to_ms(task.get('startTime', 0))
+        finish = to_ms(task.get('finishTime', 0))
+        row = {
+            'experiment_id': experiment_id,
+            'slowstart_value': slowstart,
+            'task_id': task.get('id', ''),
+            'task_type': task.get('type', ''),
+            'start_time': start,
+            'finish_time': finish,
+            'elapsed_sec': round(task.get('elapsedTime', 0) / 1000, 3),
+            'shuffle_finish_time': '',
+            'merge_finish_time': '',
+            'reduce_finish_time': '',
+            'successful_attempt': task.get('successfulAttempt', ''),
+            'node_http_address': attempt.get('nodeHttpAddress', ''),
+        }
+        if row['task_type'] == 'REDUCE' and attempt:
+            row['shuffle_finish_time'] = to_ms(attempt.get('shuffleFinishTime', 0))
+            row['merge_finish_time'] = to_ms(attempt.get('mergeFinishTime', 0))
+            row['reduce_finish_time'] = finish
+        rows.append(row)
+    return rows
+
+
+def cmd_timeline(args):
+    client = open_client(args)
+    if client is None:
+        print("Error: JobHistory Server not accessible via REST API", file=sys.stderr)
+        return 2
+
+    started = time.time()
+    with client:
+        try:
+            tasks, errors = client.fetch_task_details(args.job_id)
+        except JobHistoryError as e:
+            print(f"Error fetching tasks for {args.job_id}: {e}", file=sys.stderr)
+            return 1
+
+    for task, error in errors:
+        print(f"Warning: attempt details unavailable for {task.get('id')}: {error}", file=sys.stderr)
+
+    rows = timeline_rows(tasks, args.experiment_id, args.slowstart)
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=TIMELINE_HEADER)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"Fetched {len(tasks)} tasks ({len(errors)} attempt errors) from {describe_client(client)} "
+          f"in {time.time() - started:.2f}s")
+    return 0
+
+
+def cmd_prefetch(args):
+    job_ids = list(args.job_ids)
+    if args.from_file:
+        with open(args.from_file, 'r') as f:
+            job_ids.extend(re.findall(r'job_\d+_\d+', f.read()))
+    job_ids = list(dict.fromkeys(job_ids))
+    if not job_ids:
+        print("Error: no job IDs given", file=sys.stderr)
+        return 1
+    if args.no_cache:
+        print("Error: prefetch needs the cache (drop --no-cache)", file=sys.stderr)
+        return 1
+
+    client = open_client(args)
+    if client is None or client.cache.offline:
+        print("Error: JobHistory Server not accessible via REST API", file=sys.stderr)
+        return 2
+
+    started = time.time()
+    with client:
+        counts, errors = client.prefetch(job_ids)
+    for item, error in errors:
+        print(f"Warning: {item}: {error}", file=sys.stderr)
+    for job_id in job_ids:
+        print(f"  {job_id}: {counts[job_id]} tasks" if job_id in counts else f"  {job_id}: failed")
+    print(f"Prefetched {len(counts)}/{len(job_ids)} jobs into {client.cache.root} "
+          f"({client.cache.hits} already cached, {client.cache.misses} not cached) in {time.time() - started:.2f}s")
+    return 0 if len(counts) == len(job_ids) and not errors else 1
+
+
+def add_client_arguments(parser):
+    parser.add_argument('--server', default=None,
+                        help='JobHistory base URL (default: first reachable of hadoop001/localhost:19888)')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent requests (default: 8)')
+    parser.add_argument('--retries', type=int, default=3, help='Retries per request (default: 3)')
+    parser.add_argument('--timeout', type=float, default=10, help='Per-request timeout in seconds')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'History response cache (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--no-cache', action='store_true', help='Always go to the server')
+    parser.add_argument('--offline', action='store_true', help='Serve from the cache only')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JobHistory REST client')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    timeline = subparsers.add_parser('timeline', help='Write the task timeline CSV for a job')
+    timeline.add_argument('job_id', help='Job ID, e.g. job_1764041163594_0018')
+    timeline.add_argument('--experiment-id', required=True)
+    timeline.add_argument('--slowstart', required=True)
+    timeline.add_argument('--output', required=True, help='Timeline CSV path')
+    add_client_arguments(timeline)
+    timeline.set_defaults(func=cmd_timeline)
+
+    prefetch = subparsers.add_parser('prefetch', help='Cache the history data of finished jobs')
+    prefetch.add_argument('job_ids', nargs='*', help='Job IDs, e.g. job_1764041163594_0018')
+    prefetch.add_argument('--from-file', default=None,
+                          help='Also take every job_<id> found in this file (e.g. a batch log)')
+    add_client_arguments(prefetch)
+    prefetch.set_defaults(func=cmd_prefetch)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
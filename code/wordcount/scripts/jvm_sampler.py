@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Per-Process Sampler for MapReduce JVMs (YarnChild / MRAppMaster)
+Replaces collect_mapreduce_metrics.sh's one-shot `pidstat -p <list>`: the
+task JVMs are rediscovered from /proc/*/cmdline on every tick, so reducers
+launched after slowstart (and every later map wave) are sampled too, and no
+`jps` is forked. For each live JVM it reads /proc/<pid>/stat, status and io,
+and it records when each PID appears and exits.
+Usage: python3 jvm_sampler.py <node_name> [interval] [--output-dir mapreduce_metrics] [--duration SEC]
+       python3 jvm_sampler.py <node_name> --adaptive [--fast 0.15] [--slow 5] [--hold 3]
+
+Output (mapreduce_metrics/):
+    <node>_jvm_<ts>.csv          one row per JVM per tick
+    <node>_jvm_events_<ts>.csv   appear / exit events with attempt IDs and lifetimes
+    <node>_overhead_jvm_sampler_<ts>.csv   the sampler's own CPU/RSS/jitter (sampler_overhead.py)
+
+CPU % is measured over the last tick; memory, thread and context-switch
+values are point-in-time; fault and I/O columns are cumulative counters.
+/proc/<pid>/io is only readable for our own user's processes (or as root);
+its columns stay empty otherwise.
+
+With --adaptive the tick rate follows the job's phase: every transition
+(a JVM appearing or exiting, a step in the JVMs' total CPU or in the node's
+network throughput) switches to `fast` ticks for `hold` seconds, after
+which the interval backs off to `slow` during steady phases. interval_sec
+is the measured time since the previous tick in both modes.
+"""
+
+import argparse
+import csv
+import os
+import re
+import signal
+import sys
+import time
+
+from proc_sampler import (CLK_TCK, PAGE_SIZE, AdaptiveSchedule, MonotonicSchedule, list_pids, network_bytes,
+                          pid_cmdline, pid_stat, read_file, uptime)
+from rate_engine import RateEngine
+from sampler_overhead import SelfMonitor, overhead_path
+
+SAMPLE_HEADER = ['timestamp', 'pid', 'role', 'attempt_id', 'task_type', 'state', 'cpu_percent', 'utime_sec',
+                 'stime_sec', 'threads', 'rss_mb', 'rss_peak_mb', 'vsize_mb', 'swap_mb', 'minflt', 'majflt',
+                 'voluntary_ctxt_switches', 'nonvoluntary_ctxt_switches', 'read_bytes', 'write_bytes',
+                 'rchar', 'wchar', 'interval_sec']
+EVENTS_HEADER = ['timestamp', 'event', 'pid', 'role', 'attempt_id', 'task_type', 'start_time', 'lifetime_sec']
+
+ROLES = [('mrapp', re.compile(r'org\.apache\.hadoop\.mapreduce\.v2\.app\.MRAppMaster\b')),
+         ('yarnchild', re.compile(r'org\.apache\.hadoop\.mapred\.YarnChild\b'))]
+# YarnChild <umbilical host> <port> <attempt id> <jvm id>
+ATTEMPT_RE = re.compile(r'\b(attempt_\d+_\d+_([mr])_\d+_\d+)\b')
+STATUS_KB = {'VmRSS': 'rss_mb', 'VmHWM': 'rss_peak_mb', 'VmSwap': 'swap_mb'}
+STATUS_COUNT = {'Threads': 'threads', 'voluntary_ctxt_switches': 'voluntary_ctxt_switches',
+                'nonvoluntary_ctxt_switches': 'nonvoluntary_ctxt_switches'}
+IO_FIELDS = ('read_bytes', 'write_bytes', 'rchar', 'wchar')
+# A step is a change from the smoothed level by more than max(absolute, relative * level)
+CPU_STEP = (50.0, 0.3)   # JVM CPU %, summed over JVMs
+NET_STEP = (2.0, 0.3)    # node network MB/s, rx + tx
+
+
+def boot_time():
+    for line in read_file('/proc/stat').splitlines():
+        if line.startswith('btime'):
+            return int(line.split()[1])
+    return time.time() - uptime()
+
+
+def classify(cmdline):
+    """(role, attempt_id, task_type) for a MapReduce JVM command line, or None"""
+    # Only the JVM itself, not the launch_container.sh shell that mentions the same class
+    if not cmdline.split(' ', 1)[0].endswith('java'):
+        return None
+    for role, pattern in ROLES:
+        if pattern.search(cmdline):
+            match = ATTEMPT_RE.search(cmdline) if role == 'yarnchild' else None
+            if match:
+                return role, match.group(1), 'MAP' if match.group(2) == 'm' else 'REDUCE'
+            return role, '', ''
+    return None
+
+
+def read_status(pid):
+    values = {}
+    try:
+        text = read_file(f'/proc/{pid}/status')
+    except OSError:
+        return values
+    for line in text.splitlines():
+        key, _, rest = line.partition(':')
+        if key in STATUS_KB:
+            values[STATUS_KB[key]] = f"{int(rest.split()[0]) / 1024:.1f}"
+        elif key in STATUS_COUNT:
+            values[STATUS_COUNT[key]] = rest.strip()
+    return values
+
+
+def read_io(pid):
+    try:
+        text = read_file(f'/proc/{pid}/io')
+    except OSError:
+        return {}
+    values = {}
+    for line in text.splitlines():
+        key, _, rest = line.partition(':')
+        if key in IO_FIELDS:
+            values[key] = rest.strip()
+    return values
+
+
+class JvmTracker:
+    """Rediscovers MapReduce JVMs each tick and turns /proc readings into rows and events"""
+
+    def __init__(self):
+        self.boot = boot_time()
+        self.live = {}  # pid -> {'start', 'role', 'attempt_id', 'task_type', 'jiffies', 'seen'}
+        self.last_tick = None
+
+    def discover(self):
+        found = {}
+        for pid in list_pids():
+            info = classify(pid_cmdline(pid))
+            if info:
+                found[pid] = info
+        return found
+
+    def tick(self):
+        """Returns (sample_rows, events) for this tick"""
+        now = time.time()
+        now_mono = time.monotonic()
+        interval = f"{now_mono - self.last_tick:.3f}" if self.last_tick else ''
+        self.last_tick = now_mono
+        rows = []
+        events = []
+        current = {}
+
+        for pid, (role, attempt_id, task_type) in self.discover().items():
+            fields = pid_stat(pid)
+            if not fields:
+                continue  # exited between the scan and the read
+            # state=0 ... minflt=7 majflt=9 utime=11 stime=12 ... starttime=19 vsize=20 rss=21
+            start = self.boot + int(fields[19]) / CLK_TCK
+            jiffies = int(fields[11]) + int(fields[12])
+            known = self.live.get(pid)
+            if known and (abs(known['start'] - start) > 1 or known['attempt_id'] != attempt_id
+                          or known['role'] != role):
+                # PID reused (or exec'd into a different task): close out the old one first
+                events.append(self._exit_event(pid, known, now))
+                known = None
+            if known is None:
+                known = {'start': start, 'role': role, 'attempt_id': attempt_id, 'task_type': task_type,
+                         'jiffies': None, 'seen': None}
+                events.append([f"{now:.3f}", 'appear', pid, role, attempt_id, task_type, f"{start:.3f}", ''])
+
+            if known['jiffies'] is not None:
+                cpu = (jiffies - known['jiffies']) / CLK_TCK / (now_mono - known['seen']) * 100
+            else:
+                age = now - start
+                cpu = jiffies / CLK_TCK / age * 100 if age > 0 else 0.0
+            known['jiffies'], known['seen'], known['last_time'] = jiffies, now_mono, now
+            current[pid] = known
+
+            row = {
+                'timestamp': f"{now:.3f}", 'pid': pid, 'role': role, 'attempt_id': attempt_id,
+                'task_type': task_type, 'state': fields[0], 'cpu_percent': f"{cpu:.1f}",
+                'utime_sec': f"{int(fields[11]) / CLK_TCK:.2f}", 'stime_sec': f"{int(fields[12]) / CLK_TCK:.2f}",
+                'rss_mb': f"{int(fields[21]) * PAGE_SIZE / 1048576:.1f}", 'vsize_mb': f"{int(fields[20]) / 1048576:.1f}",
+                'minflt': fields[7], 'majflt': fields[9], 'interval_sec': interval,
+            }
+            row.update(read_status(pid))
+            row.update(read_io(pid))
+            rows.append(row)
+
+        for pid, known in self.live.items():
+            if pid not in current:
+                events.append(self._exit_event(pid, known, now))
+        self.live = current
+        return rows, events
+
+    def _exit_event(self, pid, known, now):
+        # The JVM ended between its last sample and now
+        last = known.get('last_time', now)
+        return [f"{now:.3f}", 'exit', pid, known['role'], known['attempt_id'], known['task_type'],
+                f"{known['start']:.3f}", f"{last - known['start']:.1f}"]
+
+
+class TransitionDetector:
+    """Decides after each tick whether the job is changing phase"""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.level = {}  # signal -> smoothed value
+        self.rates = RateEngine()
+        self.reasons = {}
+
+    def _step(self, name, value, threshold):
+        level = self.level.get(name)
+        if level is None:
+            self.level[name] = value
+            return False
+        step = abs(value - level) > max(threshold[0], threshold[1] * level)
+        # Jump to the new level on a step so one change triggers once
+        self.level[name] = value if step else level + self.alpha * (value - level)
+        return step
+
+    def observe(self, rows, events):
+        """Reason string for a transition at this tick, or None"""
+        reason = None
+        if events:
+            reason = 'spawn' if any(e[1] == 'appear' for e in events) else 'exit'
+        cpu = sum(float(r['cpu_percent']) for r in rows)
+        if self._step('cpu', cpu, CPU_STEP) and not reason:
+            reason = 'cpu_step'
+        rx, tx = network_bytes()
+        rate = self.rates.rate('net', time.monotonic(), rx + tx)
+        if rate is not None and self._step('net', rate / 1048576, NET_STEP) and not reason:
+            reason = 'net_step'
+        if reason:
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        return reason
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-process sampler for YarnChild / MRAppMaster JVMs')
+    parser.add_argument('node_name', help='Node name used in the output file names')
+    parser.add_argument('interval', nargs='?', type=float, default=1.0, help='Seconds between ticks (default: 1)')
+    parser.add_argument('--output-dir', default='mapreduce_metrics', help='Output directory (default: mapreduce_metrics)')
+    parser.add_argument('--duration', type=float, default=None, help='Stop after this many seconds')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Sample fast around phase transitions and back off in steady phases')
+    parser.add_argument('--fast', type=float, default=0.15, help='Adaptive: seconds between ticks near a transition')
+    parser.add_argument('--slow', type=float, default=5.0, help='Adaptive: longest steady-state interval')
+    parser.add_argument('--hold', type=float, default=3.0, help='Adaptive: seconds to stay fast after a transition')
+    parser.add_argument('--no-overhead', action='store_true',
+                        help="Don't record this sampler's own CPU/RSS/jitter (<output-dir>/<node>_overhead_*.csv)")
+    args = parser.parse_args()
+
+    if args.interval <= 0 or (args.adaptive and not 0 < args.fast <= args.slow):
+        print("Error: interval must be positive (and --fast no larger than --slow)")
+        sys.exit(1)
+    if not os.path.exists('/proc/stat'):
+        print("Error: /proc is not available on this system")
+        sys.exit(1)
+
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    os.makedirs(args.output_dir, exist_ok=True)
+    samples_path = os.path.join(args.output_dir, f"{args.node_name}_jvm_{stamp}.csv")
+    events_path = os.path.join(args.output_dir, f"{args.node_name}_jvm_events_{stamp}.csv")
+
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stop.append(True))
+
+    tracker = JvmTracker()
+    detector = TransitionDetector() if args.adaptive else None
+    if args.adaptive:
+        schedule = AdaptiveSchedule(args.fast, args.slow, args.hold)
+    else:
+        schedule = MonotonicSchedule(args.interval)
+    overhead = None
+    if not args.no_overhead:
+        # Adaptive ticks are judged against the fast interval, where lateness matters most
+        overhead = SelfMonitor(args.node_name, 'jvm_sampler', args.fast if args.adaptive else args.interval,
+                               overhead_path(args.output_dir, args.node_name, 'jvm_sampler'))
+    print(f"MapReduce JVM sampling started on {args.node_name}")
+    if args.adaptive:
+        print(f"  Adaptive interval: {args.fast:g}s near transitions, up to {args.slow:g}s when steady")
+    print(f"  Samples: {samples_path}")
+    print(f"  Events:  {events_path}")
+
+    appeared = exited = 0
+    with open(samples_path, 'w', newline='', buffering=1) as samples_file, \
+            open(events_path, 'w', newline='', buffering=1) as events_file:
+        samples = csv.DictWriter(samples_file, fieldnames=SAMPLE_HEADER)
+        samples.writeheader()
+        events = csv.writer(events_file)
+        events.writerow(EVENTS_HEADER)
+        due = None
+        while not stop:
+            if overhead:
+                overhead.tick(due, schedule.missed)
+            rows, new_events = tracker.tick()
+            samples.writerows(rows)
+            events.writerows(new_events)
+            appeared += sum(1 for e in new_events if e[1] == 'appear')
+            exited += sum(1 for e in new_events if e[1] == 'exit')
+            if detector and detector.observe(rows, new_events):
+                schedule.trigger()
+            if args.duration and time.monotonic() - schedule.start >= args.duration:
+                break
+            schedule.wait()
+            due = schedule.due
+
+    if overhead:
+        overhead.close(schedule.missed)
+    print(f"MapReduce JVM sampling stopped: {appeared} JVM(s) appeared, {exited} exited, "
+          f"{len(tracker.live)} still running")
+    if detector:
+        reasons = ', '.join(f"{k} {v}" for k, v in sorted(detector.reasons.items())) or 'none'
+        print(f"  {schedule.tick + 1} ticks, transitions: {reasons}")
+    if schedule.missed:
+        print(f"Warning: {schedule.missed} tick(s) skipped because sampling overran the interval",
+              file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
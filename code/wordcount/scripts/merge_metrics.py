@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Time-Aligned Multi-Node Metrics Merger
+Merges per-node metric CSVs into one file ordered by clock-corrected time.
+Every input (and every section of a convert_pidstat_to_csv.py file) is read
+as its own time-ordered stream and combined with a heap-based k-way merge,
+so memory does not grow with file size. Rows are tagged with their node,
+and each node's timestamps are shifted by the clock offset measured
+against this host while collecting (see the `offsets` command).
+Usage:
+  python3 merge_metrics.py merge <output.csv> <node_csv ...> [--offsets other_node_monitoring/clock_offsets.csv]
+      [--offset hadoop002=-1.8] [--date 20251128]
+  python3 merge_metrics.py offsets <node ...> [--samples 5] [--output other_node_monitoring/clock_offsets.csv]
+
+Input files may be given as node=path to name the node explicitly; otherwise
+the node_name column, an other_node_monitoring/<node>/ parent or the
+<node>_... file name prefix is used. The side-channel CSVs written next to
+the system metrics (<node>_rates_*, <node>_dirio_*, <node>_overhead_*) are
+long-format series with their own schema and are skipped by header, so
+system_metrics/*_<ts>.csv globs can be passed as they are.
+"""
+
+import argparse
+import bisect
+import csv
+import heapq
+import os
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from dir_io import DIRIO_HEADER
+from rate_engine import RATES_HEADER
+from sampler_overhead import OVERHEAD_HEADER
+from timeline_io import MS_THRESHOLD
+
+DEFAULT_OFFSETS = 'other_node_monitoring/clock_offsets.csv'
+OFFSETS_HEADER = ['node', 'measured_at', 'offset_sec', 'rtt_sec']
+BASE_COLUMNS = ['node_name', 'timestamp', 'source']
+DATE_RE = re.compile(r'(?<!\d)(20\d{6})(?!\d)')
+CLOCK_RE = re.compile(r'(\d{1,2}):(\d{2}):(\d{2})(?:\s*([AP]M))?$')
+# A time-of-day that jumps back by more than this has crossed midnight
+ROLLOVER_SEC = 12 * 3600
+SIDE_CHANNELS = {'rates': RATES_HEADER, 'dirio': DIRIO_HEADER, 'overhead': OVERHEAD_HEADER}
+
+
+def side_channel(header):
+    """'rates' / 'dirio' / 'overhead' if a CSV header is one of the samplers' side-channel schemas, else None"""
+    for name, columns in SIDE_CHANNELS.items():
+        if header[:len(columns)] == columns:
+            return name
+    return None
+
+
+def node_for(path):
+    """Best-effort node name when the file has no node_name column"""
+    parts = os.path.normpath(path).split(os.sep)
+    if 'other_node_monitoring' in parts:
+        i = parts.index('other_node_monitoring')
+        if i + 2 < len(parts):
+            return parts[i + 1]
+    return os.path.basename(path).split('_')[0].rsplit('.', 1)[0]
+
+
+def file_date(path, override=None):
+    """Date for time-of-day-only stamps: --date, a YYYYMMDD in the file name, else the file's mtime"""
+    if override:
+        return datetime.strptime(override, '%Y%m%d')
+    match = DATE_RE.search(os.path.basename(path))
+    if match:
+        try:
+            return datetime.strptime(match.group(1), '%Y%m%d')
+        except ValueError:
+            pass
+    mtime = datetime.fromtimestamp(os.path.getmtime(path))
+    return datetime(mtime.year, mtime.month, mtime.day)
+
+
+class TimeParser:
+    """Parse one stream's timestamp cells into epoch seconds"""
+
+    def __init__(self, date):
+        self.day = date
+        self.last_clock = None
+
+    def __call__(self, value):
+        value = value.strip()
+        if not value:
+            return None
+        try:
+            ts = float(value)
+            return ts / 1000.0 if ts >= MS_THRESHOLD else ts
+        except ValueError:
+            pass
+        if '-' in value:
+            for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S'):
+                try:
+                    return datetime.strptime(value[:19], fmt).timestamp()
+                except ValueError:
+                    pass
+            return None
+        # pidstat stamps: "13:30:44 13:30:45" (interval start/end) or "01:30:45 PM"
+        match = CLOCK_RE.search(value)
+        if not match:
+            return None
+        hour, minute, second, meridiem = match.groups()
+        hour = int(hour)
+        if meridiem:
+            hour = hour % 12 + (12 if meridiem == 'PM' else 0)
+        clock = hour * 3600 + int(minute) * 60 + int(second)
+        if self.last_clock is not None and clock < self.last_clock - ROLLOVER_SEC:
+            self.day += timedelta(days=1)
+        self.last_clock = clock
+        return (self.day + timedelta(seconds=clock)).timestamp()
+
+
+def scan_sections(path):
+    """
+    Find the CSV sections of a file
+
+    Plain CSVs are one section. convert_pidstat_to_csv.py writes
+    '# CPU Metrics' / '# Memory Metrics' / '# I/O Metrics' blocks, each with
+    its own header and each time-ordered on its own.
+    Returns [(source, byte_offset_of_first_data_row, header)].
+    """
+    sections = []
+    with open(path, 'rb') as f:
+        first = f.readline()
+        if not first.startswith(b'#'):
+            header = next(csv.reader([first.decode('utf-8', 'replace')]), [])
+            return [('system', f.tell(), header)] if header else []
+        line = first
+        while line:
+            if line.startswith(b'#'):
+                source = line.decode('utf-8', 'replace').strip('#, \r\n').split()[0].lower().replace('/', '')
+                header_line = f.readline().decode('utf-8', 'replace')
+                header = next(csv.reader([header_line]), [])
+                if header:
+                    sections.append((source, f.tell(), header))
+            line = f.readline()
+    return sections
+
+
+class ClockOffsets:
+    """Per-node clock offsets (node clock minus local clock), interpolated over time"""
+
+    def __init__(self, fixed=None):
+        self.fixed = dict(fixed or {})
+        self.points = {}
+
+    def load(self, path):
+        with open(path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                try:
+                    point = (float(row['measured_at']), float(row['offset_sec']))
+                except (KeyError, ValueError):
+                    continue
+                self.points.setdefault(row['node'], []).append(point)
+        for points in self.points.values():
+            points.sort()
+
+    def offset(self, node, ts):
+        if node in self.fixed:
+            return self.fixed[node]
+        points = self.points.get(node)
+        if not points:
+            return 0.0
+        i = bisect.bisect_left(points, (ts,))
+        if i == 0:
+            return points[0][1]
+        if i == len(points):
+            return points[-1][1]
+        (t0, o0), (t1, o1) = points[i - 1], points[i]
+        return o0 + (o1 - o0) * (ts - t0) / (t1 - t0) if t1 > t0 else o1
+
+    def describe(self, node):
+        if node in self.fixed:
+            return f"{self.fixed[node]:+.3f}s (fixed)"
+        points = self.points.get(node)
+        if not points:
+            return "none"
+        return f"{points[-1][1]:+.3f}s ({len(points)} measurement(s))"
+
+
+class Stream:
+    """One time-ordered section of one file, yielding (corrected_ts, node, source, values, raw_ts, offset)"""
+
+    def __init__(self, path, node, source, byte_offset, header, date, offsets, columns):
+        self.path = path
+        self.source = source
+        self.byte_offset = byte_offset
+        self.header = header
+        self.node = node
+        self.parse_time = TimeParser(date)
+        self.offsets = offsets
+        self.columns = columns
+        self.rows = 0
+        self.out_of_order = 0
+
+    def __iter__(self):
+        ts_index = self.header.index('timestamp') if 'timestamp' in self.header else 0
+        node_index = self.header.index('node_name') if 'node_name' in self.header else None
+        positions = [self.header.index(c) if c in self.header else None for c in self.columns]
+        last = None
+        with open(self.path, 'rb') as f:
+            f.seek(self.byte_offset)
+            lines = (line.decode('utf-8', 'replace') for line in f)
+            for row in csv.reader(lines):
+                if not row:
+                    continue
+                if row[0].startswith('#'):
+                    break  # next pidstat section
+                raw = row[ts_index] if ts_index < len(row) else ''
+                ts = self.parse_time(raw)
+                if ts is None:
+                    continue
+                node = row[node_index] if node_index is not None and node_index < len(row) and row[node_index] \
+                    else self.node
+                offset = self.offsets.offset(node, ts)
+                corrected = ts - offset
+                if last is not None and corrected < last:
+                    self.out_of_order += 1
+                last = corrected
+                self.rows += 1
+                values = [row[p] if p is not None and p < len(row) else '' for p in positions]
+                yield corrected, node, self.source, values, raw, offset
+
+
+def open_streams(specs, offsets, date=None):
+    """Build streams for node=path / path specs; returns (streams, extra_columns)"""
+    plans = []
+    columns = []
+    for spec in specs:
+        node, sep, path = spec.partition('=')
+        if not sep or not os.path.exists(path):
+            node, path = None, spec
+        for source, byte_offset, header in scan_sections(path):
+            kind = side_channel(header)
+            if kind:
+                print(f"Skipping {path}: {kind} side-channel CSV, not system metrics", file=sys.stderr)
+                continue
+            plans.append((path, node or node_for(path), source, byte_offset, header))
+            for column in header:
+                if column not in BASE_COLUMNS and column not in columns:
+                    columns.append(column)
+    streams = [Stream(path, node, source, byte_offset, header, file_date(path, date), offsets, columns)
+               for path, node, source, byte_offset, header in plans]
+    return streams, columns
+
+
+def merge(streams, columns, output):
+    """k-way merge of the streams by corrected time into output; returns rows written per node"""
+    per_node = {}
+    with open(output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(BASE_COLUMNS + columns + ['raw_timestamp', 'clock_offset_sec'])
+        merged = heapq.merge(*streams, key=lambda item: item[0])
+        for corrected, node, source, values, raw, offset in merged:
+            writer.writerow([node, f"{corrected:.3f}", source] + values + [raw, f"{offset:.3f}"])
+            per_node[node] = per_node.get(node, 0) + 1
+    return per_node
+
+
+def measure_offset(node, samples=5, timeout=10):
+    """
+    Estimate node clock minus local clock over ssh
+
+    NTP-style: the remote reading is assumed to be taken halfway through the
+    round trip; the sample with the shortest round trip is kept.
+    Returns (offset_sec, rtt_sec) or None if the node cannot be reached.
+    """
+    best = None
+    for _ in range(samples):
+        t0 = time.time()
+        try:
+            result = subprocess.run(['ssh', '-o', 'BatchMode=yes', node, 'date +%s.%N'],
+                                    capture_output=True, text=True, timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            return best
+        t1 = time.time()
+        try:
+            remote = float(result.stdout.strip())
+        except ValueError:
+            return best
+        rtt = t1 - t0
+        if best is None or rtt < best[1]:
+            best = (remote - (t0 + t1) / 2, rtt)
+    return best
+
+
+def cmd_offsets(args):
+    exists = os.path.exists(args.output)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    failed = 0
+    with open(args.output, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if not exists:
+            writer.writerow(OFFSETS_HEADER)
+        for node in args.nodes:
+            measured = measure_offset(node, args.samples)
+            if measured is None:
+                print(f"Warning: could not measure clock offset of {node}", file=sys.stderr)
+                failed += 1
+                continue
+            offset, rtt = measured
+            writer.writerow([node, f"{time.time():.3f}", f"{offset:.4f}", f"{rtt:.4f}"])
+            print(f"  {node:<15} offset {offset:+.3f}s (rtt {rtt * 1000:.0f} ms)")
+    return 1 if failed == len(args.nodes) else 0
+
+
+def cmd_merge(args):
+    fixed = {}
+    for item in args.offset:
+        node, _, value = item.partition('=')
+        try:
+            fixed[node] = float(value)
+        except ValueError:
+            print(f"Error: --offset expects node=seconds, got {item}")
+            return 1
+    offsets = ClockOffsets(fixed)
+    if args.offsets and os.path.exists(args.offsets):
+        offsets.load(args.offsets)
+    elif args.offsets != DEFAULT_OFFSETS:
+        print(f"Warning: offsets file {args.offsets} not found, using uncorrected clocks", file=sys.stderr)
+
+    missing = [s for s in args.files if not os.path.exists(s) and not os.path.exists(s.partition('=')[2])]
+    if missing:
+        print("Error: The following files do not exist:")
+        for path in missing:
+            print(f"  - {path}")
+        return 1
+
+    streams, columns = open_streams(args.files, offsets, args.date)
+    if not streams:
+        print("Error: no CSV data found in the input files")
+        return 1
+    per_node = merge(streams, columns, args.output)
+
+    print(f"Merged {len(streams)} stream(s) from {len(args.files)} file(s) into {args.output}")
+    for node, rows in sorted(per_node.items()):
+        print(f"  {node:<24}: {rows} rows, clock offset {offsets.describe(node)}")
+    for stream in streams:
+        if stream.out_of_order:
+            print(f"Warning: {stream.out_of_order} row(s) out of time order in {stream.path} [{stream.source}]",
+                  file=sys.stderr)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time-aligned multi-node metrics merge')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    merge_parser = subparsers.add_parser('merge', help='Merge node CSVs ordered by corrected time')
+    merge_parser.add_argument('output', help='Merged CSV path')
+    merge_parser.add_argument('files', nargs='+', help='Node CSV files (path or node=path)')
+    merge_parser.add_argument('--offsets', default=DEFAULT_OFFSETS,
+                              help=f'Clock offsets CSV from the offsets command (default: {DEFAULT_OFFSETS})')
+    merge_parser.add_argument('--offset', action='append', default=[],
+                              help='Fixed offset node=seconds (node clock minus local), overrides --offsets')
+    merge_parser.add_argument('--date', default=None,
+                              help='YYYYMMDD for time-of-day-only stamps (default: from file name or mtime)')
+    merge_parser.set_defaults(func=cmd_merge)
+
+    offsets_parser = subparsers.add_parser('offsets', help='Measure node clock offsets over ssh')
+    offsets_parser.add_argument('nodes', nargs='+', help='Remote nodes')
+    offsets_parser.add_argument('--samples', type=int, default=5, help='Round trips per node (default: 5)')
+    offsets_parser.add_argument('--output', default=DEFAULT_OFFSETS,
+                                help=f'Offsets CSV, appended to (default: {DEFAULT_OFFSETS})')
+    offsets_parser.set_defaults(func=cmd_offsets)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
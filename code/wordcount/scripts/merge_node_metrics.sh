@@ -2,7 +2,8 @@
 
 # Multi-Node Metrics Merger Script
 # Usage: ./merge_node_metrics.sh <output_file> <node_csv_files...>
-# This script merges metrics from multiple nodes into a single CSV for analysis
+# This script merges metrics from multiple nodes into a single CSV for analysis,
+# ordered by clock-corrected timestamp (see merge_metrics.py)
 
 OUTPUT_FILE=${1}
 shift
@@ -29,7 +30,8 @@ echo "Node files to merge: ${NODE_FILES[*]}"
 # Check if all input files exist
 missing_files=()
 for file in "${NODE_FILES[@]}"; do
-    if [ ! -f "$file" ]; then
+    # node=path names the node of files without a node_name column
+    if [ ! -f "$file" ] && [ ! -f "${file#*=}" ]; then
         missing_files+=("$file")
     fi
 done
@@ -42,23 +44,17 @@ if [ ${#missing_files[@]} -gt 0 ]; then
     exit 1
 fi
 
-# Create output file with header from first input file
-echo "Creating merged metrics file..."
-head -1 "${NODE_FILES[0]}" > "$OUTPUT_FILE"
+# Merge by clock-corrected time (heap k-way merge, rows tagged with their node)
+# Offsets measured by collect_remote_metrics.sh; MERGE_OFFSETS overrides the file
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+OFFSETS_FILE=${MERGE_OFFSETS:-other_node_monitoring/clock_offsets.csv}
 
-# Merge data from all node files (skip headers)
-total_rows=0
-for file in "${NODE_FILES[@]}"; do
-    node_name=$(basename "$file" .csv)
-    file_rows=$(tail -n +2 "$file" | wc -l)
-    
-    echo "Processing $file: $file_rows data rows"
-    
-    # Append data rows (skip header)
-    tail -n +2 "$file" >> "$OUTPUT_FILE"
-    
-    total_rows=$((total_rows + file_rows))
-done
+echo "Creating merged metrics file..."
+if ! python3 "$SCRIPT_DIR/merge_metrics.py" merge "$OUTPUT_FILE" "${NODE_FILES[@]}" --offsets "$OFFSETS_FILE"; then
+    echo "Error: Merge failed"
+    exit 1
+fi
+total_rows=$(($(wc -l < "$OUTPUT_FILE") - 1))
 
 echo ""
 echo "✅ Merge completed successfully!"
@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""
+Streaming Metrics Agent and Collector
+Streams each node's metric files to the master while the run is going,
+instead of collect_remote_metrics.sh copying them with ssh/scp afterwards.
+The agent on each node tails the CSV/TXT files the samplers write
+(system_metrics/, mapreduce_metrics/) and sends the new complete lines in
+batches over TCP to an asyncio collector on the master, which appends them
+under other_node_monitoring/<node>/ - the same layout
+collect_remote_metrics.sh produces, so packaging and analysis are
+unchanged.
+Usage:
+  python3 metrics_stream.py collect [--host 0.0.0.0] [--port 9950] [--output other_node_monitoring]
+  python3 metrics_stream.py agent <node_name> --collector HOST:PORT [--dirs system_metrics mapreduce_metrics]
+                                  [--spool .metrics_spool] [--flush 1.0]
+  python3 metrics_stream.py loopback       # agent + collector on 127.0.0.1, with a collector restart
+
+Protocol: frames are a 4-byte big-endian length plus a JSON object.
+    agent -> collector   hello {node, session, next_seq}
+                         batch {seq, files: [{path, generation, offset, data}]}
+    collector -> agent   welcome {last_seq}, ack {seq}
+Delivery:
+    - every batch is spooled to disk before it is sent and deleted once
+      acked; after a disconnect (or an agent restart) unacked batches are
+      resent, oldest first, with exponential reconnect backoff;
+    - per-node sequence numbers let the collector drop replays and count
+      gaps; file offsets make appends idempotent;
+    - a source file that is truncated or replaced (new inode) starts a new
+      generation at offset 0, and the collector rewrites its copy instead
+      of appending; data past the end of the collector's copy (e.g. the
+      copy was removed by disk_watchdog.py --retention) is refused with a
+      warning rather than appended at the wrong place;
+    - at most --window batches are in flight, and once the spool holds
+      --spool-limit bytes the agent stops reading further lines (the data
+      stays in the source files), so a slow collector never grows memory.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import select
+import shutil
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+from history_cache import atomic_write
+
+FRAME = struct.Struct('!I')
+MAX_FRAME = 16 << 20
+DEFAULT_PORT = 9950
+DEFAULT_OUTPUT = 'other_node_monitoring'
+DEFAULT_DIRS = ['system_metrics', 'mapreduce_metrics']
+STREAM_EXTENSIONS = ('.csv', '.txt', '.log')
+BATCH_BYTES = 256 << 10
+
+
+def encode(message):
+    payload = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    return FRAME.pack(len(payload)) + payload
+
+
+def recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('connection closed')
+        data += chunk
+    return data
+
+
+def recv_frame(sock):
+    size, = FRAME.unpack(recv_exact(sock, FRAME.size))
+    if size > MAX_FRAME:
+        raise ConnectionError(f'frame of {size} bytes exceeds limit')
+    return json.loads(recv_exact(sock, size))
+
+
+class Spool:
+    """Unacked batches as <seq>.json files plus the source-file offsets and generations already spooled"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        state = {}
+        state_path = os.path.join(root, 'state.json')
+        if os.path.exists(state_path):
+            with open(state_path, 'r') as f:
+                state = json.load(f)
+        # A fresh spool restarts sequence numbers; the session tells the collector
+        self.session = state.get('session') or os.urandom(8).hex()
+        self.next_seq = state.get('next_seq', 1)
+        self.offsets = state.get('offsets', {})
+        self.generations = state.get('generations', {})  # path -> [generation, inode]
+        self.pending = sorted(int(n[:-5]) for n in os.listdir(root) if n[:-5].isdigit() and n.endswith('.json'))
+        self.bytes = sum(os.path.getsize(self._path(seq)) for seq in self.pending)
+
+    def _path(self, seq):
+        return os.path.join(self.root, f'{seq}.json')
+
+    def add(self, files, inodes):
+        """Spool a batch; the offsets and generations are committed only after the batch is on disk"""
+        seq = self.next_seq
+        data = json.dumps({'type': 'batch', 'seq': seq, 'files': files}).encode('utf-8')
+        atomic_write(self._path(seq), data)
+        self.next_seq += 1
+        for entry in files:
+            self.offsets[entry['path']] = entry['offset'] + len(entry['data'].encode('utf-8', 'surrogateescape'))
+            self.generations[entry['path']] = [entry['generation'], inodes[entry['path']]]
+        self.pending.append(seq)
+        self.bytes += len(data)
+        self._save()
+        return seq
+
+    def load(self, seq):
+        with open(self._path(seq), 'r') as f:
+            return json.load(f)
+
+    def ack(self, seq):
+        """Drop every batch up to and including seq"""
+        while self.pending and self.pending[0] <= seq:
+            done = self.pending.pop(0)
+            path = self._path(done)
+            self.bytes -= os.path.getsize(path)
+            os.unlink(path)
+
+    def _save(self):
+        atomic_write(os.path.join(self.root, 'state.json'),
+                     json.dumps({'session': self.session, 'next_seq': self.next_seq,
+                                 'offsets': self.offsets, 'generations': self.generations}).encode('utf-8'))
+
+
+class Agent:
+    """Tails metric files into spooled batches and streams them to the collector"""
+
+    def __init__(self, node_name, collector, dirs, spool_dir, flush=1.0, window=32, spool_limit=256 << 20):
+        self.node_name = node_name
+        self.collector = collector
+        self.dirs = dirs
+        self.spool = Spool(spool_dir)
+        self.flush = flush
+        self.window = window
+        self.spool_limit = spool_limit
+        self.sock = None
+        self.unsent = []
+        self.in_flight = []
+        self.backoff = 0.5
+        self.next_connect = 0.0
+        self.stats = {'batches': 0, 'bytes': 0, 'reconnects': 0, 'throttled': 0}
+        self.stop = threading.Event()
+
+    def watched_files(self):
+        for folder in self.dirs:
+            for root, subdirs, names in os.walk(folder):
+                subdirs.sort()
+                for name in sorted(names):
+                    if name.endswith(STREAM_EXTENSIONS):
+                        yield os.path.join(root, name).replace(os.sep, '/')
+
+    def poll(self):
+        """Read new complete lines from every watched file into spooled batches"""
+        files = []
+        inodes = {}
+        size = 0
+        for path in self.watched_files():
+            if self.spool.bytes >= self.spool_limit:
+                self.stats['throttled'] += 1
+                break
+            offset = self.spool.offsets.get(path, 0)
+            generation, inode = self.spool.generations.get(path, [0, None])
+            try:
+                with open(path, 'rb') as f:
+                    st = os.fstat(f.fileno())
+                    if st.st_size < offset or (inode is not None and st.st_ino != inode):
+                        # Truncated or replaced: a new generation, sent from the start
+                        offset, generation = 0, generation + 1
+                    f.seek(offset)
+                    data = f.read(BATCH_BYTES)
+            except OSError:
+                continue
+            end = data.rfind(b'\n')
+            if end < 0:
+                continue
+            files.append({'path': path, 'generation': generation, 'offset': offset,
+                          'data': data[:end + 1].decode('utf-8', 'surrogateescape')})
+            inodes[path] = st.st_ino
+            size += end + 1
+            if size >= BATCH_BYTES:
+                self.unsent.append(self.spool.add(files, inodes))
+                files, inodes, size = [], {}, 0
+        if files:
+            self.unsent.append(self.spool.add(files, inodes))
+
+    def connect(self):
+        if time.monotonic() < self.next_connect:
+            return False
+        host, _, port = self.collector.rpartition(':')
+        try:
+            sock = socket.create_connection((host, int(port)), timeout=5)
+            sock.sendall(encode({'type': 'hello', 'node': self.node_name, 'session': self.spool.session,
+                                 'next_seq': self.spool.next_seq}))
+            welcome = recv_frame(sock)
+        except (OSError, ValueError, ConnectionError):
+            self.next_connect = time.monotonic() + self.backoff
+            self.backoff = min(self.backoff * 2, 30.0)
+            return False
+        sock.settimeout(None)
+        self.sock = sock
+        self.backoff = 0.5
+        self.stats['reconnects'] += 1
+        # The collector already has everything up to last_seq
+        self.spool.ack(welcome.get('last_seq', 0))
+        self.unsent = list(self.spool.pending)
+        self.in_flight = []
+        return True
+
+    def disconnect(self):
+        if self.sock:
+            self.sock.close()
+        self.sock = None
+        self.next_connect = time.monotonic() + self.backoff
+
+    def pump(self, timeout):
+        """Send what the window allows and process acks for up to timeout seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            while self.unsent and len(self.in_flight) < self.window:
+                seq = self.unsent.pop(0)
+                if seq not in self.spool.pending:
+                    continue
+                payload = encode(self.spool.load(seq))
+                self.sock.sendall(payload)
+                self.in_flight.append(seq)
+                self.stats['batches'] += 1
+                self.stats['bytes'] += len(payload)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            readable, _, _ = select.select([self.sock], [], [], remaining)
+            if readable:
+                message = recv_frame(self.sock)
+                if message.get('type') == 'ack':
+                    self.spool.ack(message['seq'])
+                    self.in_flight = [s for s in self.in_flight if s > message['seq']]
+
+    def run(self, duration=None):
+        started = time.monotonic()
+        while not self.stop.is_set():
+            self.poll()
+            if self.sock is None:
+                self.connect()
+            if self.sock is not None:
+                try:
+                    self.pump(self.flush)
+                except (OSError, ValueError, ConnectionError):
+                    self.disconnect()
+            else:
+                self.stop.wait(self.flush)
+            if duration and time.monotonic() - started >= duration:
+                break
+        # Last lines and a final attempt to drain the spool
+        self.poll()
+        if self.sock is None:
+            self.next_connect = 0
+            self.connect()
+        if self.sock is not None:
+            try:
+                self.pump(2.0)
+            except (OSError, ValueError, ConnectionError):
+                pass
+            self.disconnect()
+
+
+class Collector:
+    """asyncio server appending every node's batches under <output>/<node>/"""
+
+    def __init__(self, output=DEFAULT_OUTPUT):
+        self.output = output
+        self.state_path = os.path.join(output, '.stream_state.json')
+        self.last_seq = {}  # node -> [session, seq, {path: generation}]
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r') as f:
+                self.last_seq = json.load(f)
+            for state in self.last_seq.values():
+                if len(state) < 3:
+                    state.append({})
+        self.locks = {}
+        self.connections = set()
+        self.refused = set()  # (target, generation) already warned about
+        self.stats = {'batches': 0, 'duplicates': 0, 'gaps': 0, 'bytes': 0, 'rewrites': 0, 'refused': 0}
+        self.server = None
+
+    def _target(self, node, path):
+        parts = [p for p in path.split('/') if p not in ('', '.', '..')]
+        return os.path.join(self.output, node, *parts)
+
+    def _write(self, node, batch):
+        """Append each file's data at its offset; overlap with what is already on disk is skipped.
+        A new generation starting at offset 0 rewrites the copy; data past its end is refused."""
+        written = 0
+        generations = self.last_seq[node][2]
+        for entry in batch['files']:
+            target = self._target(node, entry['path'])
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            data = entry['data'].encode('utf-8', 'surrogateescape')
+            generation = entry.get('generation')
+            previous = generations.get(entry['path'])
+            mode = 'ab'
+            if generation is not None and generation != previous:
+                generations[entry['path']] = generation
+                if entry['offset'] == 0:
+                    mode = 'wb'
+            if mode == 'wb':
+                if previous is not None and os.path.exists(target):
+                    self.stats['rewrites'] += 1
+                    print(f"Warning: {node} {entry['path']} was truncated or replaced on the node; "
+                          f"rewriting {target}", file=sys.stderr)
+                skip = 0
+            else:
+                have = os.path.getsize(target) if os.path.exists(target) else 0
+                skip = have - entry['offset']
+                if skip >= len(data):
+                    continue
+                if skip < 0:
+                    # The copy is shorter than the offset (deleted or cut): appending would misplace the data
+                    self.stats['refused'] += 1
+                    if (target, generation) not in self.refused:
+                        self.refused.add((target, generation))
+                        print(f"Warning: {target} has {have} bytes but {node} sent {entry['path']} from offset "
+                              f"{entry['offset']}; refusing to append until the file starts over "
+                              f"(re-fetch it with collect_remote_metrics.sh)", file=sys.stderr)
+                    continue
+            with open(target, mode) as f:
+                f.write(data[skip:])
+            written += len(data) - skip
+        self.last_seq[node][1] = batch['seq']
+        atomic_write(self.state_path, json.dumps(self.last_seq).encode('utf-8'))
+        return written
+
+    async def _read(self, reader):
+        size, = FRAME.unpack(await reader.readexactly(FRAME.size))
+        if size > MAX_FRAME:
+            raise ConnectionError(f'frame of {size} bytes exceeds limit')
+        return json.loads(await reader.readexactly(size))
+
+    async def handle(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            hello = await self._read(reader)
+            node = hello['node']
+            lock = self.locks.setdefault(node, asyncio.Lock())
+            async with lock:
+                if self.last_seq.get(node, [None])[0] != hello['session']:
+                    self.last_seq[node] = [hello['session'], 0, {}]
+            writer.write(encode({'type': 'welcome', 'last_seq': self.last_seq[node][1]}))
+            await writer.drain()
+            while True:
+                batch = await self._read(reader)
+                async with lock:
+                    last = self.last_seq[node][1]
+                    if batch['seq'] <= last:
+                        self.stats['duplicates'] += 1
+                    else:
+                        if batch['seq'] != last + 1:
+                            self.stats['gaps'] += 1
+                            print(f"Warning: {node} sequence gap {last} -> {batch['seq']}", file=sys.stderr)
+                        # File I/O off the event loop so other nodes keep streaming
+                        self.stats['bytes'] += await asyncio.to_thread(self._write, node, batch)
+                        self.stats['batches'] += 1
+                writer.write(encode({'type': 'ack', 'seq': batch['seq']}))
+                # Backpressure: stop reading this agent until it has taken our acks
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, KeyError):
+            pass
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+
+    async def start(self, host='0.0.0.0', port=DEFAULT_PORT):
+        os.makedirs(self.output, exist_ok=True)
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            for writer in list(self.connections):
+                writer.close()
+            await self.server.wait_closed()
+
+
+def cmd_collect(args):
+    collector = Collector(args.output)
+
+    async def serve():
+        server = await collector.start(args.host, args.port)
+        print(f"Collector listening on {args.host}:{args.port}, writing to {args.output}/<node>/")
+        loop = asyncio.get_running_loop()
+        stopped = loop.create_future()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, lambda: stopped.done() or stopped.set_result(True))
+        async with server:
+            await stopped
+        await collector.stop()
+
+    asyncio.run(serve())
+    stats = collector.stats
+    print(f"Collector stopped: {stats['batches']} batches, {stats['bytes']} bytes, "
+          f"{stats['duplicates']} duplicate(s), {stats['gaps']} gap(s), "
+          f"{stats['rewrites']} rewrite(s), {stats['refused']} refused")
+    return 0
+
+
+def cmd_agent(args):
+    dirs = [d for d in args.dirs if os.path.isdir(d)]
+    if not dirs:
+        print(f"Error: None of the directories exist: {' '.join(args.dirs)}")
+        return 1
+    agent = Agent(args.node_name, args.collector, dirs, args.spool, args.flush, args.window,
+                  args.spool_limit * 1048576)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: agent.stop.set())
+    print(f"Streaming {' '.join(dirs)} from {args.node_name} to {args.collector}")
+    agent.run(args.duration)
+    stats = agent.stats
+    print(f"Agent stopped: {stats['batches']} batches sent ({stats['bytes']} bytes), "
+          f"{stats['reconnects']} connection(s), {len(agent.spool.pending)} batch(es) left in {args.spool}")
+    return 0
+
+
+def cmd_loopback(args):
+    """Agent and collector on 127.0.0.1 with a collector outage in the middle, then the source
+    file replaced by a shorter one and a copy deleted on the master; compares the copies"""
+    work = tempfile.mkdtemp(prefix='metrics_stream_')
+    source = os.path.join(work, 'node', 'system_metrics')
+    os.makedirs(source)
+    output = os.path.join(work, 'master', DEFAULT_OUTPUT)
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+
+    loop = asyncio.new_event_loop()
+    collector = Collector(output)
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(collector.start('127.0.0.1', port), loop).result()
+
+    cwd = os.getcwd()
+    os.chdir(os.path.join(work, 'node'))
+    agent = Agent('hadoop002', f'127.0.0.1:{port}', ['system_metrics'], '.metrics_spool', flush=0.1, window=4)
+    thread = threading.Thread(target=agent.run, daemon=True)
+    thread.start()
+    try:
+        path = os.path.join('system_metrics', 'hadoop002_test.csv')
+        with open(path, 'w', buffering=1) as f:
+            f.write('node_name,timestamp,value\n')
+            for i in range(args.rows):
+                f.write(f'hadoop002,{time.time():.3f},{i}\n')
+                if i == args.rows // 3:
+                    asyncio.run_coroutine_threadsafe(collector.stop(), loop).result()
+                    print("Collector stopped; agent spools")
+                if i == 2 * args.rows // 3:
+                    collector = Collector(output)
+                    asyncio.run_coroutine_threadsafe(collector.start('127.0.0.1', port), loop).result()
+                    print(f"Collector restarted; {len(agent.spool.pending)} batch(es) spooled")
+                time.sleep(0.002)
+
+        def drain():
+            deadline = time.monotonic() + 30
+            time.sleep(0.5)
+            while time.monotonic() < deadline and agent.spool.pending:
+                time.sleep(0.1)
+
+        copy = os.path.join(output, 'hadoop002', 'system_metrics', 'hadoop002_test.csv')
+        drain()
+        with open(path, 'rb') as a, open(copy, 'rb') as b:
+            same = a.read() == b.read()
+        # A sampler restart replaces the file with a shorter one: the copy must start over
+        with open(path + '.tmp', 'w') as f:
+            f.write('node_name,timestamp,value\n')
+            f.write(''.join(f'hadoop002,{time.time():.3f},{i}\n' for i in range(10)))
+        os.replace(path + '.tmp', path)
+        drain()
+        with open(path, 'rb') as a, open(copy, 'rb') as b:
+            replaced = a.read() == b.read()
+        # The copy deleted on the master (disk_watchdog.py --retention): later lines are refused, not misplaced
+        os.unlink(copy)
+        with open(path, 'a') as f:
+            f.write(f'hadoop002,{time.time():.3f},10\n')
+        drain()
+        refused = not os.path.exists(copy) and collector.stats['refused'] > 0
+        agent.stop.set()
+        thread.join()
+        print(f"Rows: {args.rows}, reconnects: {agent.stats['reconnects']}, "
+              f"collector duplicates: {collector.stats['duplicates']}, gaps: {collector.stats['gaps']}, "
+              f"rewrites: {collector.stats['rewrites']}, refused: {collector.stats['refused']}")
+        for ok, label in ((same, 'streamed copy is identical'), (replaced, 'replaced file is rewritten'),
+                          (refused, 'append past a deleted copy is refused')):
+            print(f"Loopback OK: {label}" if ok else f"Error: {label} - failed")
+        return 0 if same and replaced and refused else 1
+    finally:
+        os.chdir(cwd)
+        asyncio.run_coroutine_threadsafe(collector.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream node metric files to a collector on the master')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    collect = subparsers.add_parser('collect', help='Run the collector (on the master)')
+    collect.add_argument('--host', default='0.0.0.0')
+    collect.add_argument('--port', type=int, default=DEFAULT_PORT)
+    collect.add_argument('--output', default=DEFAULT_OUTPUT, help=f'Output directory (default: {DEFAULT_OUTPUT})')
+    collect.set_defaults(func=cmd_collect)
+
+    agent = subparsers.add_parser('agent', help='Run the agent (on a node)')
+    agent.add_argument('node_name')
+    agent.add_argument('--collector', required=True, help='HOST:PORT of the collector')
+    agent.add_argument('--dirs', nargs='+', default=DEFAULT_DIRS, help=f"Directories to stream (default: {' '.join(DEFAULT_DIRS)})")
+    agent.add_argument('--spool', default='.metrics_spool', help='Spool directory (default: .metrics_spool)')
+    agent.add_argument('--flush', type=float, default=1.0, help='Seconds between batches (default: 1)')
+    agent.add_argument('--window', type=int, default=32, help='Unacked batches in flight (default: 32)')
+    agent.add_argument('--spool-limit', type=int, default=256, help='Spool size in MB before reading pauses')
+    agent.add_argument('--duration', type=float, default=None, help='Stop after this many seconds')
+    agent.set_defaults(func=cmd_agent)
+
+    loopback = subparsers.add_parser('loopback', help='Self-check on 127.0.0.1 with a collector outage')
+    loopback.add_argument('--rows', type=int, default=3000)
+    loopback.set_defaults(func=cmd_loopback)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Mock MapReduce JobHistory Server
+Serves a synthetic finished job over the JobHistory REST API (HTTP/1.1
+keep-alive) so the history tooling can be exercised without a cluster.
+Usage: python3 mock_jobhistory_server.py [--port 19888] [--maps 60] [--reduces 4]
+       [--latency 0.05] [--fail-rate 0.1]
+
+In Python:
+    with MockJobHistoryServer(maps=100, reduces=4) as server:
+        client = JobHistoryClient(server.url)
+        client.list_tasks(server.job_id)
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_PREFIX = '/ws/v1/history/mapreduce'
+DEFAULT_JOB_ID = 'job_1764041163594_0018'
+
+MAP_COUNTERS = {
+    'org.apache.hadoop.mapreduce.FileSystemCounter': ['FILE_BYTES_READ', 'FILE_BYTES_WRITTEN',
+                                                      'HDFS_BYTES_READ', 'HDFS_BYTES_WRITTEN'],
+    'org.apache.hadoop.mapreduce.TaskCounter': ['MAP_INPUT_RECORDS', 'MAP_OUTPUT_RECORDS',
+                                                'MAP_OUTPUT_BYTES', 'MAP_OUTPUT_MATERIALIZED_BYTES',
+                                                'SPILLED_RECORDS', 'GC_TIME_MILLIS', 'CPU_MILLISECONDS',
+                                                'PHYSICAL_MEMORY_BYTES'],
+}
+REDUCE_COUNTERS = {
+    'org.apache.hadoop.mapreduce.FileSystemCounter': ['FILE_BYTES_READ', 'FILE_BYTES_WRITTEN',
+                                                      'HDFS_BYTES_READ', 'HDFS_BYTES_WRITTEN'],
+    'org.apache.hadoop.mapreduce.TaskCounter': ['REDUCE_INPUT_GROUPS', 'REDUCE_INPUT_RECORDS',
+                                                'REDUCE_OUTPUT_RECORDS', 'REDUCE_SHUFFLE_BYTES',
+                                                'SPILLED_RECORDS', 'GC_TIME_MILLIS', 'CPU_MILLISECONDS',
+                                                'PHYSICAL_MEMORY_BYTES'],
+}
+
+
+def build_job(job_id, maps, reduces, seed=42):
+    """Generate a deterministic synthetic job: tasks, attempts and counters"""
+    rng = random.Random(seed)
+    app = job_id[len('job_'):]
+    start = 1764051516000
+    tasks = {}
+    attempts = {}
+    counters = {}
+
+    def counter_values(spec):
+        return {group: {name: rng.randint(1000, 10 ** 8) for name in names} for group, names in spec.items()}
+
+    map_end = start
+    for i in range(maps):
+        task_id = f'task_{app}_m_{i:06d}'
+        attempt_id = f'attempt_{app}_m_{i:06d}_0'
+        t0 = start + (i // 8) * 30000 + rng.randint(0, 3000)
+        t1 = t0 + rng.randint(20000, 40000)
+        map_end = max(map_end, t1)
+        tasks[task_id] = {'id': task_id, 'type': 'MAP', 'state': 'SUCCEEDED', 'progress': 100.0,
+                          'startTime': t0, 'finishTime': t1, 'elapsedTime': t1 - t0,
+                          'successfulAttempt': attempt_id}
+        attempts[attempt_id] = {'id': attempt_id, 'type': 'MAP', 'state': 'SUCCEEDED', 'progress': 100.0,
+                                'startTime': t0, 'finishTime': t1, 'elapsedTime': t1 - t0,
+                                'nodeHttpAddress': f'hadoop00{i % 3 + 1}:8042', 'rack': '/default-rack',
+                                'assignedContainerId': f'container_{app}_01_{i + 2:06d}', 'diagnostics': ''}
+        counters[task_id] = counter_values(MAP_COUNTERS)
+
+    for i in range(reduces):
+        task_id = f'task_{app}_r_{i:06d}'
+        attempt_id = f'attempt_{app}_r_{i:06d}_0'
+        t0 = start + (map_end - start) // 3 + rng.randint(0, 5000)
+        shuffle = map_end + rng.randint(1000, 5000)
+        merge = shuffle + rng.randint(1000, 10000)
+        t1 = merge + rng.randint(20000, 60000)
+        tasks[task_id] = {'id': task_id, 'type': 'REDUCE', 'state': 'SUCCEEDED', 'progress': 100.0,
+                          'startTime': t0, 'finishTime': t1, 'elapsedTime': t1 - t0,
+                          'successfulAttempt': attempt_id}
+        attempts[attempt_id] = {'id': attempt_id, 'type': 'REDUCE', 'state': 'SUCCEEDED', 'progress': 100.0,
+                                'startTime': t0, 'finishTime': t1, 'elapsedTime': t1 - t0,
+                                'shuffleFinishTime': shuffle, 'mergeFinishTime': merge,
+                                'elapsedShuffleTime': shuffle - t0, 'elapsedMergeTime': merge - shuffle,
+                                'elapsedReduceTime': t1 - merge,
+                                'nodeHttpAddress': f'hadoop00{i % 3 + 1}:8042', 'rack': '/default-rack',
+                                'assignedContainerId': f'container_{app}_01_{maps + i + 2:06d}',
+                                'diagnostics': ''}
+        counters[task_id] = counter_values(REDUCE_COUNTERS)
+
+    return {'id': job_id, 'tasks': tasks, 'attempts': attempts, 'counters': counters,
+            'startTime': start, 'finishTime': max(t['finishTime'] for t in tasks.values())}
+
+
+def job_counters(job):
+    """Aggregate task counters into the jobCounters JSON shape"""
+    groups = {}
+    for task_id, task_counters in job['counters'].items():
+        kind = 'map' if job['tasks'][task_id]['type'] == 'MAP' else 'reduce'
+        for group, values in task_counters.items():
+            for name, value in values.items():
+                entry = groups.setdefault(group, {}).setdefault(
+                    name, {'name': name, 'totalCounterValue': 0, 'mapCounterValue': 0, 'reduceCounterValue': 0})
+                entry['totalCounterValue'] += value
+                entry[f'{kind}CounterValue'] += value
+    return {'jobCounters': {'id': job['id'], 'counterGroup': [
+        {'counterGroupName': group, 'counter': list(values.values())} for group, values in groups.items()]}}
+
+
+class JobHistoryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body leave in one write (handle_one_request flushes after each
+    # request); separate small writes hit a ~40ms Nagle/delayed-ACK stall per request
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    ROUTES = [
+        (re.compile(r'^/jobs/?$'), 'jobs'),
+        (re.compile(r'^/jobs/(?P<job>[^/]+)/?$'), 'job'),
+        (re.compile(r'^/jobs/(?P<job>[^/]+)/counters/?$'), 'job_counters'),
+        (re.compile(r'^/jobs/(?P<job>[^/]+)/tasks/?$'), 'tasks'),
+        (re.compile(r'^/jobs/(?P<job>[^/]+)/tasks/(?P<task>[^/]+)/?$'), 'task'),
+        (re.compile(r'^/jobs/(?P<job>[^/]+)/tasks/(?P<task>[^/]+)/counters/?$'), 'task_counters'),
+        (re.compile(r'^/jobs/(?P<job>[^/]+)/tasks/(?P<task>[^/]+)/attempts/?$'), 'attempts'),
+        (re.compile(r'^/jobs/(?P<job>[^/]+)/tasks/(?P<task>[^/]+)/attempts/(?P<attempt>[^/]+)/?$'), 'attempt'),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_found(self, message):
+        self.send_json(404, {'RemoteException': {'exception': 'NotFoundException', 'message': message,
+                                                 'javaClassName': 'org.apache.hadoop.yarn.webapp.NotFoundException'}})
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if server.fail_rate and server.rng.random() < server.fail_rate:
+            self.send_json(500, {'RemoteException': {'exception': 'WebApplicationException',
+                                                     'message': 'injected failure'}})
+            return
+
+        path = self.path.split('?', 1)[0]
+        if not path.startswith(API_PREFIX):
+            self.not_found(f'unknown path {path}')
+            return
+        path = path[len(API_PREFIX):]
+
+        for pattern, route in self.ROUTES:
+            match = pattern.match(path)
+            if match:
+                getattr(self, f'route_{route}')(**match.groupdict())
+                return
+        self.not_found(f'unknown path {path}')
+
+    def lookup_job(self, job):
+        if job != self.server.job['id']:
+            self.not_found(f'job, {job}, is not found')
+            return None
+        return self.server.job
+
+    def route_jobs(self):
+        job = self.server.job
+        self.send_json(200, {'jobs': {'job': [{'id': job['id'], 'state': 'SUCCEEDED',
+                                               'startTime': job['startTime'], 'finishTime': job['finishTime']}]}})
+
+    def route_job(self, job):
+        data = self.lookup_job(job)
+        if data:
+            tasks = data['tasks'].values()
+            self.send_json(200, {'job': {
+                'id': data['id'], 'state': 'SUCCEEDED', 'startTime': data['startTime'],
+                'finishTime': data['finishTime'],
+                'mapsTotal': sum(1 for t in tasks if t['type'] == 'MAP'),
+                'mapsCompleted': sum(1 for t in tasks if t['type'] == 'MAP'),
+                'reducesTotal': sum(1 for t in tasks if t['type'] == 'REDUCE'),
+                'reducesCompleted': sum(1 for t in tasks if t['type'] == 'REDUCE'),
+            }})
+
+    def route_job_counters(self, job):
+        data = self.lookup_job(job)
+        if data:
+            self.send_json(200, job_counters(data))
+
+    def route_tasks(self, job):
+        data = self.lookup_job(job)
+        if data:
+            self.send_json(200, {'tasks': {'task': list(data['tasks'].values())}})
+
+    def route_task(self, job, task):
+        data = self.lookup_job(job)
+        if data:
+            if task not in data['tasks']:
+                self.not_found(f'task, {task}, is not found')
+            else:
+                self.send_json(200, {'task': data['tasks'][task]})
+
+    def route_task_counters(self, job, task):
+        data = self.lookup_job(job)
+        if data:
+            if task not in data['counters']:
+                self.not_found(f'task, {task}, is not found')
+                return
+            groups = [{'counterGroupName': group,
+                       'counter': [{'name': name, 'value': value} for name, value in values.items()]}
+                      for group, values in data['counters'][task].items()]
+            self.send_json(200, {'jobTaskCounters': {'id': task, 'taskCounterGroup': groups}})
+
+    def route_attempts(self, job, task):
+        data = self.lookup_job(job)
+        if data:
+            attempt_id = data['tasks'].get(task, {}).get('successfulAttempt')
+            attempts = [data['attempts'][attempt_id]] if attempt_id else []
+            self.send_json(200, {'taskAttempts': {'taskAttempt': attempts}})
+
+    def route_attempt(self, job, task, attempt):
+        data = self.lookup_job(job)
+        if data:
+            if attempt not in data['attempts']:
+                self.not_found(f'attempt, {attempt}, is not found')
+            else:
+                self.send_json(200, {'taskAttempt': data['attempts'][attempt]})
+
+
+class MockJobHistoryServer:
+    """Run the mock server on a background thread (context manager)"""
+
+    def __init__(self, host='127.0.0.1', port=0, job_id=DEFAULT_JOB_ID, maps=60, reduces=4,
+                 latency=0.0, fail_rate=0.0, seed=42):
+        self.httpd = ThreadingHTTPServer((host, port), JobHistoryHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.job = build_job(job_id, maps, reduces, seed)
+        self.httpd.latency = latency
+        self.httpd.fail_rate = fail_rate
+        self.httpd.rng = random.Random(seed)
+        self.httpd.lock = threading.Lock()
+        self.httpd.request_count = 0
+        self.job_id = job_id
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def request_count(self):
+        return self.httpd.request_count
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock MapReduce JobHistory Server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=19888)
+    parser.add_argument('--job-id', default=DEFAULT_JOB_ID)
+    parser.add_argument('--maps', type=int, default=60)
+    parser.add_argument('--reduces', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.0, help='Delay added to every response (seconds)')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500')
+    args = parser.parse_args()
+
+    server = MockJobHistoryServer(args.host, args.port, args.job_id, args.maps, args.reduces,
+                                  args.latency, args.fail_rate)
+    print(f"Mock JobHistory Server at {server.url} serving {args.job_id} "
+          f"({args.maps} maps, {args.reduces} reduces). Press Ctrl+C to stop")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -117,6 +117,14 @@ if [ ${JOB_EXIT_CODE} -eq 0 ]; then
             echo -e "${YELLOW}Warning: Timeline extraction failed. Make sure JobHistory Server is running.${NC}"
             echo -e "${YELLOW}To start: mapred --daemon start historyserver${NC}"
         }
+
+        # Per-phase resource stats (pre_reduce / overlap / shuffle_tail / reduce)
+        TIMELINE_CSV="${METRICS_DIR}/${EXPERIMENT_ID}_slowstart_${SLOWSTART_VALUE}_timeline.csv"
+        if [ -f "${TIMELINE_CSV}" ] && [ -f "${SYSTEM_METRICS_FILE}" ]; then
+            python3 "$(dirname "$0")/aggregate_metrics.py" stats "${SYSTEM_METRICS_FILE}" \
+                --timeline "${TIMELINE_CSV}" \
+                --output "${METRICS_DIR}/${EXPERIMENT_ID}_slowstart_${SLOWSTART_VALUE}_metric_stats.csv" > /dev/null || true
+        fi
     else
         echo -e "${YELLOW}Warning: Could not extract application ID from job log${NC}"
     fi
@@ -1,7 +1,8 @@
 #!/bin/bash
 
 # Package Experiment Results Script
-# Packages metrics, system_metrics, and other_node_monitoring into a zip file
+# Packages metrics, system_metrics, and other_node_monitoring into the shared
+# content-addressed results store (package_store.py), or a zip file with PACKAGE_FORMAT=zip
 # Usage: ./package_results.sh [output_filename]
 
 # Colors for output
@@ -17,17 +18,12 @@ DIRS_TO_PACKAGE=("metrics" "system_metrics" "other_node_monitoring" "mapreduce_m
 TIMESTAMP=$(date +%Y%m%d_%H%M%S)
 DEFAULT_OUTPUT="experiment_results_${TIMESTAMP}.zip"
 OUTPUT_FILE=${1:-"${DEFAULT_OUTPUT}"}
+PACKAGE_FORMAT=${PACKAGE_FORMAT:-store}
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 
 echo -e "${BLUE}=== Package Experiment Results ===${NC}"
 echo -e "${YELLOW}Output File: ${OUTPUT_FILE}${NC}"
 
-# Check if zip command is available
-if ! command -v zip &> /dev/null; then
-    echo -e "${RED}✗ Error: 'zip' command not found${NC}"
-    echo -e "${YELLOW}Please install zip: sudo apt-get install zip${NC}"
-    exit 1
-fi
-
 # Check which directories exist and calculate total size
 existing_dirs=()
 total_size=0
@@ -53,6 +49,27 @@ if [ ${#existing_dirs[@]} -eq 0 ]; then
     exit 1
 fi
 
+# Store mode: identical files are kept once across all packages, new ones compressed in parallel
+if [ "${PACKAGE_FORMAT}" != "zip" ]; then
+    PACKAGE_NAME=$(basename "${OUTPUT_FILE}" .zip)
+    echo -e "\n${CYAN}Packaging into results store...${NC}"
+    if python3 "${SCRIPT_DIR}/package_store.py" pack "${PACKAGE_NAME}" "${existing_dirs[@]}"; then
+        echo -e "\n${GREEN}✓ Successfully packaged experiment results!${NC}"
+        echo -e "${BLUE}To get a zip for transfer:${NC}"
+        echo -e "  python3 ${SCRIPT_DIR}/package_store.py export ${PACKAGE_NAME} ${PACKAGE_NAME}.zip"
+        exit 0
+    fi
+    echo -e "\n${RED}✗ Error: Failed to package into results store${NC}"
+    exit 1
+fi
+
+# Check if zip command is available
+if ! command -v zip &> /dev/null; then
+    echo -e "${RED}✗ Error: 'zip' command not found${NC}"
+    echo -e "${YELLOW}Please install zip: sudo apt-get install zip${NC}"
+    exit 1
+fi
+
 # Remove existing output file if it exists
 if [ -f "${OUTPUT_FILE}" ]; then
     echo -e "\n${YELLOW}Removing existing ${OUTPUT_FILE}...${NC}"
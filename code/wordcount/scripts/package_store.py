@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Results Packaging
+Packages metrics/, system_metrics/, other_node_monitoring/ and
+mapreduce_metrics/ into a shared object store instead of a fresh zip each
+time. Files are stored once by SHA-256 of their content (unchanged node
+CSVs, duplicated PNGs and logs are never stored twice); new objects are
+gzip-compressed in parallel; each package is a small JSON manifest mapping
+paths to object hashes. Files whose size and mtime match the previous
+manifest are not re-hashed.
+Usage:
+  python3 package_store.py pack <name> [dirs ...] [--store results_store] [--workers N]
+  python3 package_store.py list [--store results_store]
+  python3 package_store.py restore <name> <dest_dir>
+  python3 package_store.py export <name> <output.zip>
+
+Layout:
+    <store>/objects/<ab>/<sha256>.gz    file contents
+    <store>/manifests/<name>.json       {"name", "created", "experiments", "files": [...]}
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+import zipfile
+
+from history_cache import atomic_write
+
+DEFAULT_STORE = os.environ.get('MR_RESULTS_STORE', 'results_store')
+DEFAULT_DIRS = ['metrics', 'system_metrics', 'other_node_monitoring', 'mapreduce_metrics']
+EXCLUDE_RE = re.compile(r'(^|/)(\.git|__pycache__|\.run_cache|history_cache|\.metrics_spool)(/|$)|\.pyc$|experiments\.db'
+                        r'|\.stream_state\.json$|\.disk_watchdog[^/]*\.json$')
+SUMMARY_RE = re.compile(r'(^|/)batch_summary_.*\.csv$')
+CHUNK = 1 << 20
+
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class PackageStore:
+    """Object store plus manifests; packages share every identical file"""
+
+    def __init__(self, root=DEFAULT_STORE):
+        self.root = root
+
+    def object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], f'{digest}.gz')
+
+    def manifest_path(self, name):
+        return os.path.join(self.root, 'manifests', f'{name}.json')
+
+    def has(self, digest):
+        return os.path.exists(self.object_path(digest))
+
+    def manifests(self):
+        folder = os.path.join(self.root, 'manifests')
+        if not os.path.isdir(folder):
+            return []
+        names = [n[:-len('.json')] for n in os.listdir(folder) if n.endswith('.json')]
+        return sorted((self.load_manifest(n) for n in names), key=lambda m: (m['created'], m['name']))
+
+    def load_manifest(self, name):
+        path = name if name.endswith('.json') and os.path.exists(name) else self.manifest_path(name)
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def read(self, digest):
+        with gzip.open(self.object_path(digest), 'rb') as f:
+            return f.read()
+
+    def open(self, digest):
+        return gzip.open(self.object_path(digest), 'rb')
+
+    def _put(self, path, digest, level):
+        """Compress one file into the store; returns stored bytes (0 if another package raced us)"""
+        target = self.object_path(digest)
+        if os.path.exists(target):
+            return 0
+        with open(path, 'rb') as f:
+            data = gzip.compress(f.read(), compresslevel=level, mtime=0)
+        atomic_write(target, data)
+        return len(data)
+
+    def pack(self, name, dirs, workers=None, level=6):
+        """
+        Store the files under dirs as package `name`
+
+        Returns (manifest, stats) where stats counts hashed/reused/new/stored bytes.
+        """
+        previous = {}
+        for manifest in self.manifests():
+            for entry in manifest['files']:
+                previous[(entry['path'], entry['size'], entry['mtime_ns'])] = entry['sha256']
+
+        files = []
+        for folder in dirs:
+            for root, subdirs, names in os.walk(folder):
+                subdirs.sort()
+                for file_name in sorted(names):
+                    path = os.path.join(root, file_name).replace(os.sep, '/')
+                    if not EXCLUDE_RE.search(path):
+                        files.append(path)
+
+        stats = {'files': len(files), 'hashed': 0, 'new_objects': 0, 'bytes': 0, 'stored_bytes': 0}
+        entries = []
+        pending = {}
+        for path in files:
+            stat = os.stat(path)
+            digest = previous.get((path, stat.st_size, stat.st_mtime_ns))
+            if digest is None or not self.has(digest):
+                digest = file_digest(path)
+                stats['hashed'] += 1
+            entries.append({'path': path, 'sha256': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+            stats['bytes'] += stat.st_size
+            if not self.has(digest):
+                pending.setdefault(digest, path)
+
+        # zlib releases the GIL, so threads compress in parallel
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for stored in pool.map(lambda item: self._put(item[1], item[0], level), pending.items()):
+                stats['stored_bytes'] += stored
+        stats['new_objects'] = len(pending)
+
+        manifest = {
+            'name': name,
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'experiments': self._experiments(entries),
+            'files': entries,
+        }
+        atomic_write(self.manifest_path(name), json.dumps(manifest, indent=1).encode('utf-8'))
+        return manifest, stats
+
+    def _experiments(self, entries):
+        """Experiment IDs and slowstart values from the package's batch summaries"""
+        experiments = {}
+        for entry in entries:
+            if SUMMARY_RE.search(entry['path']):
+                text = self.read(entry['sha256']).decode('utf-8', 'replace')
+                for row in csv.DictReader(io.StringIO(text)):
+                    if row.get('experiment_id'):
+                        experiments[row['experiment_id']] = row.get('slowstart_value', '')
+        return [{'experiment_id': k, 'slowstart_value': v} for k, v in sorted(experiments.items())]
+
+    def restore(self, name, dest):
+        manifest = self.load_manifest(name)
+        for entry in manifest['files']:
+            target = os.path.join(dest, entry['path'])
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with self.open(entry['sha256']) as src, open(target, 'wb') as out:
+                while True:
+                    chunk = src.read(CHUNK)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+            os.utime(target, ns=(entry['mtime_ns'], entry['mtime_ns']))
+        return len(manifest['files'])
+
+    def export(self, name, output):
+        """Write a package as a plain zip (same layout package_results.sh used to produce)"""
+        manifest = self.load_manifest(name)
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for entry in manifest['files']:
+                info = zipfile.ZipInfo(entry['path'], time.localtime(entry['mtime_ns'] / 1e9)[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                zf.writestr(info, self.read(entry['sha256']))
+        return len(manifest['files'])
+
+
+def human(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+
+def cmd_pack(args, store):
+    dirs = [d for d in (args.dirs or DEFAULT_DIRS) if os.path.isdir(d)]
+    if not dirs:
+        print(f"Error: None of the target directories exist: {' '.join(args.dirs or DEFAULT_DIRS)}")
+        return 1
+    started = time.time()
+    manifest, stats = store.pack(args.name, dirs, args.workers, args.level)
+    print(f"Package: {args.name} ({store.manifest_path(args.name)})")
+    print(f"  Files: {stats['files']} ({human(stats['bytes'])}), re-hashed {stats['hashed']}")
+    print(f"  New objects: {stats['new_objects']} ({human(stats['stored_bytes'])} compressed), "
+          f"{stats['files'] - stats['new_objects']} already stored")
+    print(f"  Experiments: {len(manifest['experiments'])}")
+    print(f"  Time: {time.time() - started:.2f}s")
+    return 0
+
+
+def cmd_list(args, store):
+    manifests = store.manifests()
+    print(f"{'name':<48} {'created':<20} {'files':>6} {'size':>8} {'experiments':>11}")
+    for manifest in manifests:
+        size = sum(e['size'] for e in manifest['files'])
+        print(f"{manifest['name']:<48} {manifest['created']:<20} {len(manifest['files']):>6} "
+              f"{human(size):>8} {len(manifest['experiments']):>11}")
+    objects = os.path.join(store.root, 'objects')
+    stored = sum(os.path.getsize(os.path.join(root, n)) for root, _, names in os.walk(objects) for n in names)
+    print(f"\n{len(manifests)} package(s), object store {human(stored)}")
+    return 0
+
+
+def cmd_restore(args, store):
+    count = store.restore(args.name, args.dest)
+    print(f"Restored {count} files into {args.dest}")
+    return 0
+
+
+def cmd_export(args, store):
+    count = store.export(args.name, args.output)
+    print(f"Exported {count} files to {args.output} ({human(os.path.getsize(args.output))})")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Content-addressed experiment results packaging')
+    parser.add_argument('--store', default=DEFAULT_STORE, help=f'Store directory (default: {DEFAULT_STORE})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pack = subparsers.add_parser('pack', help='Package result directories')
+    pack.add_argument('name', help='Package name, e.g. experiment_results_20251128_140236_5gb_wordcount')
+    pack.add_argument('dirs', nargs='*', help=f"Directories (default: {' '.join(DEFAULT_DIRS)})")
+    pack.add_argument('--workers', type=int, default=None, help='Compression threads (default: CPU count)')
+    pack.add_argument('--level', type=int, default=6, help='gzip level (default: 6)')
+    pack.set_defaults(func=cmd_pack)
+
+    list_parser = subparsers.add_parser('list', help='List packages')
+    list_parser.set_defaults(func=cmd_list)
+
+    restore = subparsers.add_parser('restore', help='Recreate a package as files')
+    restore.add_argument('name')
+    restore.add_argument('dest')
+    restore.set_defaults(func=cmd_restore)
+
+    export = subparsers.add_parser('export', help='Write a package as a zip')
+    export.add_argument('name')
+    export.add_argument('output')
+    export.set_defaults(func=cmd_export)
+
+    args = parser.parse_args()
+    try:
+        sys.exit(args.func(args, PackageStore(args.store)))
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
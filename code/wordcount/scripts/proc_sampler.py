@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Low-Overhead /proc System Sampler
+Resident replacement for collect_metrics.sh's per-tick top/free/uptime/
+iostat/ps/bc pipeline. Reads /proc/stat, /proc/meminfo, /proc/loadavg,
+/proc/diskstats, /proc/net/dev and the Hadoop JVMs' /proc/<pid>/stat
+directly and samples on a monotonic schedule (tick k fires at
+start + k * interval, so the period never drifts; missed ticks are skipped,
+not bunched up). Sub-second intervals are supported.
+Usage: python3 proc_sampler.py <node_name> [interval] [--output system_metrics/<node>_<ts>.csv] [--duration SEC] [--rates PATH] [--dir-io PATH]
+
+Output keeps collect_metrics.sh's CSV schema:
+    cpu_percent         busy share of all CPUs over the last interval
+    memory_*            "used" as free(1) reports it: total - free - buffers - cache
+    load_avg            1-minute load average
+    disk_reads/writes   KB/s read/written by whole disks over the last interval
+    network_rx/tx_mb    cumulative MB received/sent on all interfaces
+    java_*              Hadoop JVMs (cmdline mentions hadoop/yarn and jar/Main):
+                        CPU % over the last interval, RSS % of RAM, process count
+Timestamps are epoch seconds with millisecond precision.
+With --rates, per-interval rates of every cumulative counter (shuffle
+throughput, per-interface, per-disk, context switches, per-JVM I/O) are
+written alongside by rate_engine.py from the same tick; with --dir-io,
+per-device I/O of the Hadoop data/local dirs, labelled by role (dir_io.py).
+"""
+
+import argparse
+import os
+import re
+import signal
+import sys
+import time
+
+CSV_HEADER = ['node_name', 'timestamp', 'cpu_percent', 'memory_used_mb', 'memory_total_mb', 'memory_percent',
+              'load_avg', 'disk_reads', 'disk_writes', 'network_rx_mb', 'network_tx_mb',
+              'java_cpu_percent', 'java_memory_percent', 'java_processes']
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+SECTOR_BYTES = 512
+# Same selection as collect_metrics.sh: ps aux | grep -E "(hadoop|yarn)" | grep -E "(jar|Main)"
+HADOOP_RE = re.compile(r'hadoop|yarn')
+LAUNCH_RE = re.compile(r'jar|Main')
+# Partitions, device-mapper and virtual devices would double count or add noise
+VIRTUAL_DISK_RE = re.compile(r'^(loop|ram|zram|dm-|sr|md|fd)')
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read().decode('ascii', 'replace')
+
+
+def cpu_times():
+    """(busy, total) jiffies summed over all CPUs"""
+    fields = [int(v) for v in read_file('/proc/stat').split('\n', 1)[0].split()[1:]]
+    # user nice system idle iowait irq softirq steal [guest guest_nice, already in user/nice]
+    total = sum(fields[:8])
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+    return total - idle, total
+
+
+def meminfo():
+    values = {}
+    for line in read_file('/proc/meminfo').splitlines():
+        key, _, rest = line.partition(':')
+        parts = rest.split()
+        if parts:
+            values[key] = int(parts[0])
+    return values
+
+
+def memory_usage(info):
+    """(used_mb, total_mb, percent) the way free(1) computes "used" """
+    total = info.get('MemTotal', 0)
+    used = total - info.get('MemFree', 0) - info.get('Buffers', 0) - info.get('Cached', 0) \
+        - info.get('SReclaimable', 0)
+    used = max(used, 0)
+    return used / 1024, total / 1024, (used * 100.0 / total if total else 0.0)
+
+
+def load_average():
+    return float(read_file('/proc/loadavg').split()[0])
+
+
+def whole_disks():
+    try:
+        return {name for name in os.listdir('/sys/block') if not VIRTUAL_DISK_RE.match(name)}
+    except OSError:
+        return None
+
+
+def disk_sectors(disks):
+    """(sectors_read, sectors_written) summed over whole disks"""
+    read = written = 0
+    for line in read_file('/proc/diskstats').splitlines():
+        parts = line.split()
+        if len(parts) < 10:
+            continue
+        name = parts[2]
+        if disks is not None and name not in disks:
+            continue
+        if disks is None and (VIRTUAL_DISK_RE.match(name) or name[-1].isdigit()):
+            continue
+        read += int(parts[5])
+        written += int(parts[9])
+    return read, written
+
+
+def network_interfaces():
+    """
+    Per-interface /proc/net/dev counters as {iface: [16 ints]}
+
+    Receive: bytes packets errs drop fifo frame compressed multicast
+    Transmit: bytes packets errs drop fifo colls carrier compressed
+    """
+    interfaces = {}
+    for line in read_file('/proc/net/dev').splitlines()[2:]:
+        name, _, data = line.partition(':')
+        parts = data.split()
+        if len(parts) >= 16:
+            interfaces[name.strip()] = [int(v) for v in parts[:16]]
+    return interfaces
+
+
+def network_bytes():
+    """(rx_bytes, tx_bytes) summed over all interfaces, like collect_metrics.sh"""
+    rx = tx = 0
+    for counters in network_interfaces().values():
+        rx += counters[0]
+        tx += counters[8]
+    return rx, tx
+
+
+def uptime():
+    return float(read_file('/proc/uptime').split()[0])
+
+
+def pid_cmdline(pid):
+    try:
+        return read_file(f'/proc/{pid}/cmdline').replace('\0', ' ').strip()
+    except OSError:
+        return ''
+
+
+def pid_stat(pid):
+    """Fields of /proc/<pid>/stat after the command name (index 0 = state), or None if gone"""
+    try:
+        data = read_file(f'/proc/{pid}/stat')
+    except OSError:
+        return None
+    # comm may contain spaces and parentheses; it ends at the last ')'
+    return data[data.rfind(')') + 2:].split()
+
+
+def list_pids():
+    return [int(name) for name in os.listdir('/proc') if name.isdigit()]
+
+
+def hadoop_pids():
+    me = os.getpid()
+    pids = []
+    for pid in list_pids():
+        if pid == me:
+            continue
+        cmdline = pid_cmdline(pid)
+        if HADOOP_RE.search(cmdline) and LAUNCH_RE.search(cmdline):
+            pids.append(pid)
+    return pids
+
+
+class MonotonicSchedule:
+    """
+    Drift-free tick source: tick k is due at start + k * interval on the monotonic clock
+
+    When a tick is overdue by more than a whole interval the missed ticks
+    are skipped (counted in `missed`) instead of firing back to back.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.start = self.due = time.monotonic()
+        self.tick = 0
+        self.missed = 0
+
+    def wait(self):
+        """Sleep until the next tick; returns its scheduled monotonic time"""
+        self.tick += 1
+        due = self.start + self.tick * self.interval
+        now = time.monotonic()
+        if now - due >= self.interval:
+            skipped = int((now - due) // self.interval)
+            self.tick += skipped
+            self.missed += skipped
+            due = self.start + self.tick * self.interval
+        self.due = due
+        if due > now:
+            time.sleep(due - now)
+        return due
+
+
+class AdaptiveSchedule:
+    """
+    Variable-rate tick source: `fast` seconds between ticks for `hold`
+    seconds after trigger(), then the interval grows by `backoff` per tick
+    up to `slow`
+
+    `effective` is the measured time between the last two ticks, which is
+    what each sample should report as its interval; `due` is when the last
+    tick was scheduled.
+    """
+
+    def __init__(self, fast=0.15, slow=5.0, hold=3.0, backoff=1.5):
+        self.fast = fast
+        self.slow = slow
+        self.hold = hold
+        self.backoff = backoff
+        self.interval = fast
+        self.start = self.last = time.monotonic()
+        self.fast_until = self.start + hold
+        self.effective = 0.0
+        self.due = self.start
+        self.tick = 0
+        self.missed = 0
+        self.triggers = 0
+
+    def trigger(self):
+        """A transition was seen: sample fast for the next `hold` seconds"""
+        self.triggers += 1
+        self.fast_until = time.monotonic() + self.hold
+        self.interval = self.fast
+
+    def wait(self):
+        """Sleep until the next tick; returns its monotonic time"""
+        self.tick += 1
+        due = self.due = self.last + self.interval
+        now = time.monotonic()
+        if due > now:
+            time.sleep(due - now)
+        elif now - due >= self.interval:
+            self.missed += 1
+        now = time.monotonic()
+        self.effective = now - self.last
+        self.last = now
+        if now < self.fast_until:
+            self.interval = self.fast
+        else:
+            self.interval = min(self.interval * self.backoff, self.slow)
+        return now
+
+
+class SystemSampler:
+    """Keeps the previous counter readings so each sample covers exactly one interval"""
+
+    def __init__(self, node_name):
+        self.node_name = node_name
+        self.disks = whole_disks()
+        self.prev = None
+        self.prev_jvm = {}
+        self.snapshot()
+
+    def snapshot(self):
+        """Read every cumulative counter once; returns the previous snapshot"""
+        previous = self.prev
+        self.prev = {
+            'time': time.monotonic(),
+            'cpu': cpu_times(),
+            'disk': disk_sectors(self.disks),
+        }
+        return previous
+
+    def java_usage(self, elapsed, mem_total_kb):
+        """(cpu_percent, memory_percent, count) over the Hadoop JVMs"""
+        now_uptime = uptime()
+        cpu = mem = 0.0
+        seen = {}
+        for pid in hadoop_pids():
+            fields = pid_stat(pid)
+            if not fields:
+                continue
+            # state=0 ... utime=11 stime=12 ... starttime=19 vsize=20 rss=21
+            jiffies = int(fields[11]) + int(fields[12])
+            start = int(fields[19])
+            seen[pid] = (start, jiffies)
+            previous = self.prev_jvm.get(pid)
+            if previous and previous[0] == start and elapsed > 0:
+                cpu += (jiffies - previous[1]) / CLK_TCK / elapsed * 100
+            else:
+                # First sighting: lifetime average, which is what ps %CPU reports
+                age = now_uptime - start / CLK_TCK
+                cpu += jiffies / CLK_TCK / age * 100 if age > 0 else 0.0
+            if mem_total_kb:
+                mem += int(fields[21]) * PAGE_SIZE / 1024 / mem_total_kb * 100
+        self.prev_jvm = seen
+        return cpu, mem, len(seen)
+
+    def sample(self):
+        previous = self.snapshot()
+        current = self.prev
+        elapsed = current['time'] - previous['time']
+
+        busy = current['cpu'][0] - previous['cpu'][0]
+        total = current['cpu'][1] - previous['cpu'][1]
+        cpu_percent = busy * 100.0 / total if total > 0 else 0.0
+
+        info = meminfo()
+        used_mb, total_mb, mem_percent = memory_usage(info)
+
+        sectors_read = max(current['disk'][0] - previous['disk'][0], 0)
+        sectors_written = max(current['disk'][1] - previous['disk'][1], 0)
+        kb_factor = SECTOR_BYTES / 1024 / elapsed if elapsed > 0 else 0
+        rx, tx = network_bytes()
+        java_cpu, java_mem, java_count = self.java_usage(elapsed, info.get('MemTotal', 0))
+
+        return [self.node_name, f"{time.time():.3f}", f"{cpu_percent:.1f}", f"{used_mb:.0f}", f"{total_mb:.0f}",
+                f"{mem_percent:.1f}", f"{load_average():.2f}", f"{sectors_read * kb_factor:.0f}",
+                f"{sectors_written * kb_factor:.0f}", f"{rx / 1048576:.0f}", f"{tx / 1048576:.0f}",
+                f"{java_cpu:.1f}", f"{java_mem:.1f}", str(java_count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='/proc-based system metrics sampler')
+    parser.add_argument('node_name', help='Node name written to every row')
+    parser.add_argument('interval', nargs='?', type=float, default=1.0, help='Seconds between samples (default: 1)')
+    parser.add_argument('--output', default=None,
+                        help='CSV path (default: system_metrics/<node_name>_<YYYYMMDD_HHMMSS>.csv)')
+    parser.add_argument('--duration', type=float, default=None, help='Stop after this many seconds')
+    parser.add_argument('--rates', default=None, help='Also write per-interval counter rates to this CSV')
+    parser.add_argument('--dir-io', default=None,
+                        help='Also write per-device I/O for the Hadoop data/local dirs to this CSV (dir_io.py)')
+    parser.add_argument('--no-overhead', action='store_true',
+                        help="Don't record this sampler's own CPU/RSS/jitter (system_metrics/<node>_overhead_*.csv)")
+    args = parser.parse_args()
+
+    if args.interval <= 0:
+        print("Error: interval must be positive")
+        sys.exit(1)
+    if not os.path.exists('/proc/stat'):
+        print("Error: /proc is not available on this system")
+        sys.exit(1)
+
+    output = args.output or f"system_metrics/{args.node_name}_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+    # monitor_job.sh stops the collector with kill (SIGTERM): leave the loop and flush
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stop.append(True))
+
+    sampler = SystemSampler(args.node_name)
+    rates = rates_file = rates_writer = None
+    if args.rates:
+        import csv
+        from rate_engine import RATES_HEADER, NodeRates, RateEngine
+        os.makedirs(os.path.dirname(args.rates) or '.', exist_ok=True)
+        rates = NodeRates(args.node_name, RateEngine(max_gap=max(60.0, args.interval * 3)))
+        rates.sample()  # baseline, so the first tick already has rates
+        rates_file = open(args.rates, 'w', newline='', buffering=1)
+        rates_writer = csv.writer(rates_file)
+        rates_writer.writerow(RATES_HEADER)
+    dir_io = dir_io_file = dir_io_writer = None
+    if args.dir_io:
+        import csv
+        from dir_io import DIRIO_HEADER, DirIO
+        from rate_engine import RateEngine
+        os.makedirs(os.path.dirname(args.dir_io) or '.', exist_ok=True)
+        dir_io = DirIO(args.node_name, engine=RateEngine(max_gap=max(60.0, args.interval * 3)))
+        dir_io_file = open(args.dir_io, 'w', newline='', buffering=1)
+        dir_io_writer = csv.writer(dir_io_file)
+        dir_io_writer.writerow(DIRIO_HEADER)
+    overhead = None
+    if not args.no_overhead:
+        from sampler_overhead import SelfMonitor, overhead_path
+        overhead = SelfMonitor(args.node_name, 'proc_sampler', args.interval,
+                               overhead_path(os.path.dirname(output) or '.', args.node_name, 'proc_sampler'))
+    schedule = MonotonicSchedule(args.interval)
+    print(f"System metrics collection started. Output: {output}")
+    print(f"Collection interval: {args.interval:g} second(s)")
+    if rates:
+        print(f"Counter rates: {args.rates}")
+    if dir_io:
+        print(f"Directory I/O: {args.dir_io} ({', '.join(d['device'] for d in dir_io.devices) or 'no devices'})")
+
+    with open(output, 'w', buffering=1) as f:
+        f.write(','.join(CSV_HEADER) + '\n')
+        while not stop:
+            due = schedule.wait()
+            if stop:
+                break
+            if overhead:
+                overhead.tick(due, schedule.missed)
+            f.write(','.join(sampler.sample()) + '\n')
+            if rates:
+                rates_writer.writerows(rates.sample())
+            if dir_io:
+                dir_io_writer.writerows(dir_io.sample())
+            if args.duration and schedule.tick * args.interval >= args.duration:
+                break
+
+    if rates_file:
+        rates_file.close()
+    if dir_io_file:
+        dir_io_file.close()
+    if overhead:
+        overhead.close(schedule.missed)
+    if schedule.missed:
+        print(f"Warning: {schedule.missed} tick(s) skipped because sampling overran the interval",
+              file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -26,56 +26,20 @@ JOB_EXIT_CODE=${JOB_EXIT_CODE:-1}
 
 echo "Processing metrics for experiment: $EXPERIMENT_ID"
 
-# Function to calculate average from a column in metrics file
-calculate_avg() {
-    local file="$1"
-    local column="$2"
-    if [ -f "$file" ] && [ $(wc -l < "$file") -gt 1 ]; then
-        tail -n +2 "$file" | awk -F, -v col="$column" '{sum+=$col; count++} END {if(count>0) printf "%.2f", sum/count; else print "0"}'
-    else
-        echo "0"
-    fi
-}
-
-# Function to calculate maximum from a column in metrics file
-calculate_max() {
-    local file="$1"
-    local column="$2"
-    if [ -f "$file" ] && [ $(wc -l < "$file") -gt 1 ]; then
-        tail -n +2 "$file" | awk -F, -v col="$column" '{if($col>max || NR==1) max=$col} END {printf "%.2f", max+0}'
-    else
-        echo "0"
-    fi
-}
-
-# Function to extract Hadoop job statistics from log
+# Function to extract Hadoop job statistics from the job counters
+# (JobHistory REST API when reachable, else the "Counters:" block of the log).
+# Also writes the full counter tables next to the log.
 extract_job_stats() {
     local log_file="$1"
-    local bytes_read=0
-    local bytes_written=0
-    local map_tasks=0
-    local reduce_tasks=0
+    local stats=""
     
     if [ -f "$log_file" ]; then
-        # Extract bytes read and written from job counters
-        bytes_read=$(grep -i "bytes.*read" "$log_file" | tail -1 | grep -o '[0-9,]\+' | tr -d ',' | head -1 || echo "0")
-        bytes_written=$(grep -i "bytes.*written" "$log_file" | tail -1 | grep -o '[0-9,]\+' | tr -d ',' | head -1 || echo "0")
-        
-        # Extract number of map and reduce tasks
-        map_tasks=$(grep -i "map.*100%" "$log_file" | wc -l || echo "0")
-        reduce_tasks=$(grep -i "reduce.*100%" "$log_file" | wc -l || echo "0")
-        
-        # Alternative extraction methods for task counts
-        if [ "$map_tasks" -eq 0 ]; then
-            map_tasks=$(grep -o "map [0-9]*%" "$log_file" | wc -l || echo "0")
-        fi
-        
-        if [ "$reduce_tasks" -eq 0 ]; then
-            reduce_tasks=$(grep -o "reduce [0-9]*%" "$log_file" | wc -l || echo "0")
-        fi
+        stats=$(python3 "$(dirname "$0")/job_counters.py" stats --log "$log_file" \
+            --output-prefix "$(dirname "$log_file")/${EXPERIMENT_ID}_slowstart_${SLOWSTART_VALUE}" \
+            --retries 1 --timeout 5 2>/dev/null)
     fi
     
-    echo "$bytes_read $bytes_written $map_tasks $reduce_tasks"
+    echo "${stats:-0 0 0 0}"
 }
 
 # Function to extract timing information from job log
@@ -112,13 +76,9 @@ extract_job_timings() {
 if [ -f "$SYSTEM_METRICS_FILE" ]; then
     echo "Processing system metrics from: $SYSTEM_METRICS_FILE"
     
-    # Calculate averages and maximums
-    avg_cpu=$(calculate_avg "$SYSTEM_METRICS_FILE" 2)
-    max_cpu=$(calculate_max "$SYSTEM_METRICS_FILE" 2)
-    avg_memory=$(calculate_avg "$SYSTEM_METRICS_FILE" 3)
-    max_memory=$(calculate_max "$SYSTEM_METRICS_FILE" 3)
-    avg_load=$(calculate_avg "$SYSTEM_METRICS_FILE" 6)
-    max_load=$(calculate_max "$SYSTEM_METRICS_FILE" 6)
+    # Averages and maximums of cpu_percent, memory_used_mb and load_avg in one pass
+    read avg_cpu max_cpu avg_memory max_memory avg_load max_load < <(
+        python3 "$(dirname "$0")/aggregate_metrics.py" summary "$SYSTEM_METRICS_FILE" 2>/dev/null || echo "0 0 0 0 0 0")
 else
     echo "Warning: System metrics file not found: $SYSTEM_METRICS_FILE"
     avg_cpu=0
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Per-Interval Rate Engine for Cumulative Kernel Counters
+collect_metrics.sh records disk I/O from a single iostat snapshot and its
+legacy network columns are cumulative packet counts, so per-node shuffle
+bandwidth cannot be read from the data. RateEngine turns any cumulative counter into a
+per-second rate over the interval since its previous reading:
+    - a counter that goes backwards from the top half of the 32-bit range
+      is treated as a 32-bit wrap (older kernels/drivers);
+    - any other decrease is a reset (interface or process restarted): the
+      new value is counted from zero, as Prometheus' rate() does;
+    - gaps longer than max_gap (sampler stopped) re-baseline instead of
+      averaging over the gap; --state keeps the last readings across
+      sampler restarts within the same boot.
+Usage:
+  python3 rate_engine.py record <node_name> [interval] [--output system_metrics/<node>_rates_<ts>.csv] [--duration SEC]
+  python3 rate_engine.py derive <system_metrics.csv ...> [--output rates.csv]
+
+Output rows (long format): timestamp, node_name, interval_sec, kind, series, metric, value
+    shuffle/<node>   rx_mb_s tx_mb_s: the node's external interfaces (lo and
+                     virtual devices excluded), i.e. shuffle plus HDFS traffic
+    net/<iface>      rx_bytes_s tx_bytes_s rx_packets_s tx_packets_s [util_percent]
+    disk/<device>    read_bytes_s write_bytes_s reads_s writes_s util_percent (io_ticks)
+    cpu/all          ctxt_s forks_s
+    proc/<pid>       read_bytes_s write_bytes_s ctxt_switches_s (Hadoop JVMs)
+`derive` recomputes shuffle/<node> from existing system_metrics CSVs. Their
+network_rx_mb / network_tx_mb columns mean different things per collector:
+proc_sampler.py writes cumulative MB, collect_metrics.sh's legacy awk
+(LEGACY_COLLECTOR=1 or no python3) sums /proc/net/dev fields 3 and 11 of
+every interface, lo included, i.e. received/sent packets / 2^20. Files from
+the legacy collector (whole-second timestamps) are skipped.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import signal
+import sys
+import time
+
+from proc_sampler import (SECTOR_BYTES, MonotonicSchedule, hadoop_pids, network_interfaces, pid_stat, read_file,
+                          whole_disks)
+
+RATES_HEADER = ['timestamp', 'node_name', 'interval_sec', 'kind', 'series', 'metric', 'value']
+WRAP_32 = 1 << 32
+DEFAULT_MAX_GAP = 60.0
+
+
+def boot_id():
+    try:
+        return read_file('/proc/sys/kernel/random/boot_id').strip()
+    except OSError:
+        return ''
+
+
+class RateEngine:
+    """Remembers the last (time, value) of every counter key and converts new readings to deltas and rates"""
+
+    WRAP = 'wrap'
+    RESET = 'reset'
+
+    def __init__(self, max_gap=DEFAULT_MAX_GAP):
+        self.max_gap = max_gap
+        self.last = {}  # key -> (time, value)
+        self.wraps = 0
+        self.resets = 0
+
+    def delta(self, key, now, value):
+        """(delta, elapsed, event) since the previous reading of key; None on the first or after a long gap"""
+        previous = self.last.get(key)
+        self.last[key] = (now, value)
+        if previous is None:
+            return None
+        elapsed = now - previous[0]
+        if elapsed <= 0 or (self.max_gap and elapsed > self.max_gap):
+            return None
+        delta = value - previous[1]
+        if delta >= 0:
+            return delta, elapsed, None
+        if WRAP_32 // 2 <= previous[1] < WRAP_32 and value < WRAP_32 // 2:
+            self.wraps += 1
+            return value + WRAP_32 - previous[1], elapsed, self.WRAP
+        self.resets += 1
+        return value, elapsed, self.RESET
+
+    def rate(self, key, now, value):
+        """Per-second rate since the previous reading of key, or None"""
+        result = self.delta(key, now, value)
+        return result[0] / result[1] if result else None
+
+    def forget(self, key):
+        self.last.pop(key, None)
+
+    def prune(self, now):
+        """Drop counters not updated within max_gap (exited processes, removed interfaces)"""
+        if self.max_gap:
+            for key in [k for k, (t, _) in self.last.items() if now - t > self.max_gap]:
+                del self.last[key]
+
+    def save(self, path):
+        state = {'boot_id': boot_id(), 'last': [[list(k), t, v] for k, (t, v) in self.last.items()]}
+        with open(path, 'w') as f:
+            json.dump(state, f)
+
+    def load(self, path):
+        """Resume from a saved state; ignored after a reboot, when every counter restarted"""
+        try:
+            with open(path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get('boot_id') != boot_id():
+            return False
+        self.last = {tuple(k): (t, v) for k, t, v in state.get('last', [])}
+        return True
+
+
+def external_interfaces(interfaces):
+    """Interfaces that carry traffic between nodes: not lo, and backed by a device when any is"""
+    names = [name for name in interfaces if name != 'lo']
+    physical = [name for name in names if os.path.exists(f'/sys/class/net/{name}/device')]
+    return physical or names
+
+
+def link_speed(iface):
+    """Link speed in Mbit/s, or None when the driver does not report one"""
+    try:
+        speed = int(read_file(f'/sys/class/net/{iface}/speed'))
+    except (OSError, ValueError):
+        return None
+    return speed if speed > 0 else None
+
+
+def disk_counters(disks):
+    """{device: (reads, sectors_read, writes, sectors_written, io_ticks_ms)} for whole disks"""
+    counters = {}
+    for line in read_file('/proc/diskstats').splitlines():
+        parts = line.split()
+        if len(parts) < 13 or (disks is not None and parts[2] not in disks):
+            continue
+        if disks is None and parts[2][-1].isdigit():
+            continue
+        counters[parts[2]] = (int(parts[3]), int(parts[5]), int(parts[7]), int(parts[9]), int(parts[12]))
+    return counters
+
+
+def cpu_counters():
+    """(context switches, forks) since boot from /proc/stat"""
+    ctxt = forks = 0
+    for line in read_file('/proc/stat').splitlines():
+        if line.startswith('ctxt '):
+            ctxt = int(line.split()[1])
+        elif line.startswith('processes '):
+            forks = int(line.split()[1])
+    return ctxt, forks
+
+
+def process_counters(pid):
+    """(read_bytes, write_bytes, context switches) for one process, or None if unreadable"""
+    values = {}
+    try:
+        for name in ('io', 'status'):
+            for line in read_file(f'/proc/{pid}/{name}').splitlines():
+                key, _, rest = line.partition(':')
+                if key in ('read_bytes', 'write_bytes', 'voluntary_ctxt_switches', 'nonvoluntary_ctxt_switches'):
+                    values[key] = int(rest)
+    except (OSError, ValueError):
+        return None
+    return (values.get('read_bytes', 0), values.get('write_bytes', 0),
+            values.get('voluntary_ctxt_switches', 0) + values.get('nonvoluntary_ctxt_switches', 0))
+
+
+class NodeRates:
+    """Reads every cumulative counter on this node once per tick and emits rate rows"""
+
+    def __init__(self, node_name, engine=None):
+        self.node_name = node_name
+        self.engine = engine or RateEngine()
+        self.disks = whole_disks()
+        self.speeds = {}
+        self.last_tick = None
+
+    def _rates(self, now, kind, series, values):
+        """{metric: rate} for the counters in values; empty on the first reading"""
+        rates = {}
+        for metric, value in values.items():
+            rate = self.engine.rate((kind, series, metric), now, value)
+            if rate is not None:
+                rates[metric] = rate
+        return rates
+
+    def sample(self, now=None):
+        now = time.time() if now is None else now
+        interval = now - self.last_tick if self.last_tick else 0.0
+        self.last_tick = now
+        rows = []
+
+        def emit(kind, series, metric, value):
+            rows.append([f"{now:.3f}", self.node_name, f"{interval:.3f}", kind, series, metric, f"{value:.2f}"])
+
+        interfaces = network_interfaces()
+        shuffle_rx = shuffle_tx = None
+        external = set(external_interfaces(interfaces))
+        for iface, counters in interfaces.items():
+            if iface == 'lo':
+                continue
+            rates = self._rates(now, 'net', iface, {'rx_bytes_s': counters[0], 'tx_bytes_s': counters[8],
+                                                    'rx_packets_s': counters[1], 'tx_packets_s': counters[9]})
+            for metric, value in rates.items():
+                emit('net', iface, metric, value)
+            if 'rx_bytes_s' in rates:
+                if iface not in self.speeds:
+                    self.speeds[iface] = link_speed(iface)
+                if self.speeds[iface]:
+                    busiest = max(rates['rx_bytes_s'], rates.get('tx_bytes_s', 0))
+                    emit('net', iface, 'util_percent', busiest * 8 / (self.speeds[iface] * 1e6) * 100)
+                if iface in external:
+                    shuffle_rx = (shuffle_rx or 0) + rates['rx_bytes_s']
+                    shuffle_tx = (shuffle_tx or 0) + rates.get('tx_bytes_s', 0)
+        if shuffle_rx is not None:
+            emit('shuffle', self.node_name, 'rx_mb_s', shuffle_rx / 1048576)
+            emit('shuffle', self.node_name, 'tx_mb_s', shuffle_tx / 1048576)
+
+        for device, (reads, sectors_read, writes, sectors_written, io_ticks) in disk_counters(self.disks).items():
+            rates = self._rates(now, 'disk', device, {'read_bytes_s': sectors_read * SECTOR_BYTES,
+                                                      'write_bytes_s': sectors_written * SECTOR_BYTES,
+                                                      'reads_s': reads, 'writes_s': writes,
+                                                      'util_percent': io_ticks})
+            if 'util_percent' in rates:
+                # io_ticks is milliseconds the device was busy: ms/s / 10 = percent
+                rates['util_percent'] = min(rates['util_percent'] / 10, 100.0)
+            for metric, value in rates.items():
+                emit('disk', device, metric, value)
+
+        ctxt, forks = cpu_counters()
+        for metric, value in self._rates(now, 'cpu', 'all', {'ctxt_s': ctxt, 'forks_s': forks}).items():
+            emit('cpu', 'all', metric, value)
+
+        for pid in hadoop_pids():
+            fields = pid_stat(pid)
+            counters = process_counters(pid)
+            if not fields or counters is None:
+                continue
+            # Key on pid and start time so a reused PID starts a new series
+            series = f"{pid}:{fields[19]}"
+            rates = self._rates(now, 'proc', series, {'read_bytes_s': counters[0], 'write_bytes_s': counters[1],
+                                                      'ctxt_switches_s': counters[2]})
+            for metric, value in rates.items():
+                emit('proc', str(pid), metric, value)
+
+        self.engine.prune(now)
+        return rows
+
+
+def network_in_bytes(samples):
+    """
+    True if one system-metrics file's network_rx_mb / network_tx_mb hold MB
+
+    Only proc_sampler.py writes bytes (in MB); collect_metrics.sh's legacy
+    awk writes packet counts under the same names. proc_sampler.py stamps rows
+    to the millisecond, the legacy collector with whole `date +%s` seconds.
+    """
+    for row in samples:
+        try:
+            if float(row['timestamp']) % 1:
+                return True
+        except (KeyError, TypeError, ValueError):
+            continue
+    return False
+
+
+def shuffle_rates(samples, engine):
+    """
+    shuffle/<node> rates from system-metrics rows' cumulative network_rx_mb / network_tx_mb
+
+    samples: dicts with node_name, timestamp (epoch seconds) and the two
+    columns, in time order, from files that pass network_in_bytes(). Yields
+    {node_name, timestamp, interval_sec, rx_mb_s, tx_mb_s}.
+    """
+    for row in samples:
+        try:
+            node, now = row['node_name'], float(row['timestamp'])
+            rx, tx = float(row['network_rx_mb']), float(row['network_tx_mb'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        rx_delta = engine.delta(('shuffle', node, 'rx'), now, rx)
+        tx_delta = engine.delta(('shuffle', node, 'tx'), now, tx)
+        if rx_delta and tx_delta:
+            elapsed = rx_delta[1]
+            yield {'node_name': node, 'timestamp': now, 'interval_sec': elapsed,
+                   'rx_mb_s': rx_delta[0] / elapsed, 'tx_mb_s': tx_delta[0] / elapsed}
+
+
+def cmd_record(args):
+    if args.interval <= 0:
+        print("Error: interval must be positive")
+        return 1
+    if not os.path.exists('/proc/stat'):
+        print("Error: /proc is not available on this system")
+        return 1
+    output = args.output or f"system_metrics/{args.node_name}_rates_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stop.append(True))
+
+    engine = RateEngine(max_gap=max(args.max_gap, args.interval * 3))
+    if args.state and engine.load(args.state):
+        print(f"Resumed counter state from {args.state}")
+    rates = NodeRates(args.node_name, engine)
+    overhead = None
+    if not args.no_overhead:
+        from sampler_overhead import SelfMonitor, overhead_path
+        overhead = SelfMonitor(args.node_name, 'rate_engine', args.interval,
+                               overhead_path(os.path.dirname(output) or '.', args.node_name, 'rate_engine'))
+    schedule = MonotonicSchedule(args.interval)
+    print(f"Rate collection started. Output: {output}")
+    due = None
+    with open(output, 'w', newline='', buffering=1) as f:
+        writer = csv.writer(f)
+        writer.writerow(RATES_HEADER)
+        while not stop:
+            if overhead:
+                overhead.tick(due, schedule.missed)
+            writer.writerows(rates.sample())
+            if args.duration and schedule.tick * args.interval >= args.duration:
+                break
+            due = schedule.wait()
+    if overhead:
+        overhead.close(schedule.missed)
+    if args.state:
+        engine.save(args.state)
+    print(f"Rate collection stopped: {engine.wraps} counter wrap(s), {engine.resets} reset(s)")
+    return 0
+
+
+def cmd_derive(args):
+    paths = sorted({p for pattern in args.inputs for p in glob.glob(pattern)})
+    if not paths:
+        print(f"Error: No files match: {' '.join(args.inputs)}")
+        return 1
+    samples = []
+    skipped = 0
+    for path in paths:
+        with open(path, 'r', newline='') as f:
+            rows = list(csv.DictReader(f))
+        if not network_in_bytes(rows):
+            skipped += 1
+            print(f"Warning: {path}: network columns are packet counts (collect_metrics.sh legacy collector), "
+                  f"skipped", file=sys.stderr)
+            continue
+        for row in rows:
+            row.setdefault('node_name', os.path.basename(path).split('_')[0])
+            samples.append(row)
+    engine = RateEngine(max_gap=args.max_gap)
+    rows = []
+    for rate in shuffle_rates(samples, engine):
+        for metric in ('rx_mb_s', 'tx_mb_s'):
+            rows.append([f"{rate['timestamp']:.3f}", rate['node_name'], f"{rate['interval_sec']:.3f}", 'shuffle',
+                         rate['node_name'], metric, f"{rate[metric]:.2f}"])
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        writer = csv.writer(out)
+        writer.writerow(RATES_HEADER)
+        writer.writerows(rows)
+    finally:
+        if args.output:
+            out.close()
+    print(f"Derived {len(rows) // 2} shuffle interval(s) from {len(paths) - skipped} file(s), "
+          f"{engine.resets} counter reset(s)", file=sys.stderr)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-interval rates for cumulative kernel counters')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record = subparsers.add_parser('record', help='Sample /proc counters and write per-interval rates')
+    record.add_argument('node_name')
+    record.add_argument('interval', nargs='?', type=float, default=1.0, help='Seconds between samples (default: 1)')
+    record.add_argument('--output', default=None,
+                        help='CSV path (default: system_metrics/<node_name>_rates_<YYYYMMDD_HHMMSS>.csv)')
+    record.add_argument('--duration', type=float, default=None, help='Stop after this many seconds')
+    record.add_argument('--state', default=None, help='Counter state file kept across sampler restarts')
+    record.add_argument('--max-gap', type=float, default=DEFAULT_MAX_GAP,
+                        help=f'Re-baseline instead of averaging over longer gaps (default: {DEFAULT_MAX_GAP:g}s)')
+    record.add_argument('--no-overhead', action='store_true', help="Don't record the sampler's own CPU/RSS/jitter")
+    record.set_defaults(func=cmd_record)
+
+    derive = subparsers.add_parser('derive', help='Shuffle throughput from existing system_metrics CSVs')
+    derive.add_argument('inputs', nargs='+', help='system_metrics CSV files or glob patterns')
+    derive.add_argument('--output', default=None, help='Output CSV (default: stdout)')
+    derive.add_argument('--max-gap', type=float, default=DEFAULT_MAX_GAP,
+                        help=f'Skip intervals longer than this (default: {DEFAULT_MAX_GAP:g}s)')
+    derive.set_defaults(func=cmd_derive)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Parallel Incremental Remote Metrics Pull
+Replacement for collect_remote_metrics.sh's node-by-node loop, which
+opens a new SSH connection for every `test -d`, `ls | wc -l` and `scp` and
+re-copies every file on every run. All nodes are pulled concurrently; each
+node gets one multiplexed SSH connection (ControlMaster) carrying exactly
+two commands: a `find` listing size and mtime of the remote metric files,
+and a single tar stream of the files that are new or changed since the last
+pull (per-node manifest), unpacked as it arrives.
+Usage:
+  python3 remote_pull.py [nodes ...] [--output other_node_monitoring] [--full]
+  python3 remote_pull.py hadoop002 hadoop003 --standin /tmp/nodes   # local stand-in: /tmp/nodes/<node> is its $HOME
+
+Layout (as collect_remote_metrics.sh):
+    ~/monitoring/system_metrics/*.csv -> <output>/<node>/system_metrics/
+    ~/mapreduce_metrics/*.txt, *.csv  -> <output>/<node>/mapreduce_metrics/
+    <output>/<node>/.pull_manifest.json   remote path -> [size, mtime] already pulled
+A missing remote directory, like an unreachable node, marks the node failed
+(files from the other directory are still pulled); the exit status is 1 if
+any node failed.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+
+from history_cache import atomic_write
+from package_store import human
+
+DEFAULT_NODES = ['hadoop002', 'hadoop003']
+DEFAULT_OUTPUT = 'other_node_monitoring'
+# (remote dir relative to $HOME, file patterns, local subdirectory)
+SOURCES = [('monitoring/system_metrics', ('*.csv',), 'system_metrics'),
+           ('mapreduce_metrics', ('*.txt', '*.csv'), 'mapreduce_metrics')]
+MANIFEST = '.pull_manifest.json'
+MISSING = 'missing: '
+CHUNK = 1 << 20
+
+
+class SshTransport:
+    """Runs shell commands on a node over one persistent multiplexed connection"""
+
+    def __init__(self, node, control_dir, persist=60):
+        self.node = node
+        self.options = ['-o', 'ControlMaster=auto', '-o', f'ControlPath={control_dir}/%r@%h:%p',
+                        '-o', f'ControlPersist={persist}', '-o', 'BatchMode=yes']
+
+    def argv(self, command):
+        return ['ssh'] + self.options + [self.node, command]
+
+    def close(self):
+        subprocess.run(['ssh'] + self.options + ['-O', 'exit', self.node],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class StandinTransport:
+    """Local stand-in for a node: commands run under sh with HOME=<root>/<node>"""
+
+    def __init__(self, node, root):
+        self.node = node
+        self.home = os.path.abspath(os.path.join(root, node))
+
+    def argv(self, command):
+        return ['env', f'HOME={self.home}', 'sh', '-c', command]
+
+    def close(self):
+        pass
+
+
+def listing_command():
+    """find over every SOURCES dir; a missing one is named on stderr after MISSING and the exit status is 2"""
+    finds = ' ; '.join(f"if [ -d {shlex.quote(d)} ]; then find {shlex.quote(d)} -maxdepth 1 -type f \\( "
+                       + ' -o '.join(f'-name {shlex.quote(p)}' for p in patterns)
+                       + f" \\) -printf '%s %T@ %p\\n' || status=1; else echo {shlex.quote(MISSING + '~/' + d)} >&2; "
+                       + "status=2; fi"
+                       for d, patterns, _ in SOURCES)
+    return f"cd ~ || exit 1; status=0; {finds} ; exit $status"
+
+
+def local_path(output, node, remote):
+    for directory, _, subdir in SOURCES:
+        if remote.startswith(directory + '/'):
+            return os.path.join(output, node, subdir, os.path.basename(remote))
+    return None
+
+
+class NodePull:
+    """One node's manifest diff and tar transfer"""
+
+    def __init__(self, node, transport, output, full=False):
+        self.node = node
+        self.transport = transport
+        self.output = output
+        self.full = full
+        self.manifest_path = os.path.join(output, node, MANIFEST)
+        self.stats = {'node': node, 'remote_files': 0, 'changed': 0, 'pulled': 0, 'bytes': 0,
+                      'list_sec': 0.0, 'transfer_sec': 0.0, 'error': ''}
+        self.missing = []
+
+    def load_manifest(self):
+        if self.full or not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, 'r') as f:
+            return json.load(f)
+
+    def listing(self):
+        """{remote path: (size, mtime)} of the node's metric files; missing source dirs go to self.missing"""
+        started = time.perf_counter()
+        result = subprocess.run(self.transport.argv(listing_command()), capture_output=True, text=True, timeout=60)
+        self.stats['list_sec'] = time.perf_counter() - started
+        self.missing = [line[len(MISSING):] for line in result.stderr.splitlines() if line.startswith(MISSING)]
+        if result.returncode != 0 and not (result.returncode == 2 and self.missing):
+            raise RuntimeError(result.stderr.strip() or f'listing exited with {result.returncode}')
+        files = {}
+        for line in result.stdout.splitlines():
+            parts = line.split(' ', 2)
+            if len(parts) == 3:
+                files[parts[2]] = (int(parts[0]), parts[1])
+        return files
+
+    def transfer(self, paths, remote):
+        """Stream one tar of paths and unpack it; returns the manifest entries actually received"""
+        received = {}
+        started = time.perf_counter()
+        proc = subprocess.Popen(self.transport.argv('cd ~ && tar -cf - -T -'), stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # Feed the file list from a thread: tar starts writing before it has read all names
+        feeder = threading.Thread(target=lambda: (proc.stdin.write(''.join(p + '\n' for p in paths).encode()),
+                                                  proc.stdin.close()))
+        feeder.start()
+        try:
+            with tarfile.open(fileobj=proc.stdout, mode='r|') as archive:
+                for member in archive:
+                    target = local_path(self.output, self.node, member.name)
+                    if not member.isfile() or target is None:
+                        continue
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    source = archive.extractfile(member)
+                    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.tmp-')
+                    with os.fdopen(fd, 'wb') as out:
+                        for chunk in iter(lambda: source.read(CHUNK), b''):
+                            out.write(chunk)
+                    os.chmod(tmp, member.mode & 0o777 or 0o644)
+                    os.replace(tmp, target)
+                    size, mtime = remote[member.name]
+                    os.utime(target, (float(mtime), float(mtime)))
+                    # A file still being written may have grown since the listing: pull it again next time
+                    received[member.name] = [size, mtime] if member.size == size else [member.size, '']
+                    self.stats['pulled'] += 1
+                    self.stats['bytes'] += member.size
+        finally:
+            feeder.join()
+            stderr = proc.stderr.read().decode('utf-8', 'replace').strip()
+            proc.wait()
+            self.stats['transfer_sec'] = time.perf_counter() - started
+        if proc.returncode != 0 and not received:
+            raise RuntimeError(stderr or f'tar exited with {proc.returncode}')
+        return received
+
+    def run(self):
+        try:
+            manifest = self.load_manifest()
+            remote = self.listing()
+            self.stats['remote_files'] = len(remote)
+            changed = sorted(path for path, (size, mtime) in remote.items()
+                             if manifest.get(path) != [size, mtime]
+                             or not os.path.exists(local_path(self.output, self.node, path)))
+            self.stats['changed'] = len(changed)
+            if changed:
+                manifest.update(self.transfer(changed, remote))
+                atomic_write(self.manifest_path, json.dumps(manifest, indent=1).encode('utf-8'))
+            if self.missing:
+                self.stats['error'] = f"missing {', '.join(self.missing)}"
+        except (OSError, RuntimeError, subprocess.TimeoutExpired, tarfile.TarError) as e:
+            self.stats['error'] = str(e).splitlines()[0] if str(e) else type(e).__name__
+        finally:
+            self.transport.close()
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel incremental pull of remote node metrics')
+    parser.add_argument('nodes', nargs='*', default=DEFAULT_NODES,
+                        help=f"Nodes to pull (default: {' '.join(DEFAULT_NODES)})")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f'Local base directory (default: {DEFAULT_OUTPUT})')
+    parser.add_argument('--full', action='store_true', help='Ignore the manifests and pull every file')
+    parser.add_argument('--standin', default=None, metavar='DIR',
+                        help='Use DIR/<node> on this machine as each node\'s home directory instead of ssh')
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    control_dir = tempfile.mkdtemp(prefix='remote_pull_')
+    pulls = []
+    for node in args.nodes:
+        transport = StandinTransport(node, args.standin) if args.standin else SshTransport(node, control_dir)
+        pulls.append(NodePull(node, transport, args.output, args.full))
+
+    print(f"Pulling {len(pulls)} node(s) into {args.output}/ ...")
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(pulls) or 1) as pool:
+        results = list(pool.map(lambda pull: pull.run(), pulls))
+    elapsed = time.perf_counter() - started
+    shutil.rmtree(control_dir, ignore_errors=True)
+
+    print(f"{'node':<14} {'remote':>6} {'changed':>7} {'pulled':>6} {'size':>8} {'list':>7} {'transfer':>8}  status")
+    for stats in results:
+        status = f"failed: {stats['error']}" if stats['error'] else 'ok'
+        print(f"{stats['node']:<14} {stats['remote_files']:>6} {stats['changed']:>7} {stats['pulled']:>6} "
+              f"{human(stats['bytes']):>8} {stats['list_sec']:>6.2f}s {stats['transfer_sec']:>7.2f}s  {status}")
+    failed = [s['node'] for s in results if s['error']]
+    print(f"\nTotal: {sum(s['pulled'] for s in results)} file(s), {human(sum(s['bytes'] for s in results))} "
+          f"in {elapsed:.2f}s; {len(results) - len(failed)} node(s) ok, {len(failed)} failed")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
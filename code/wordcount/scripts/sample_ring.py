@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+Binary Ring-Buffer Sample Format
+Compact replacement for gemini_monitor_plus.sh's ever-growing sar/pidstat
+text logs. Each sample is one fixed-width record; timestamps are stored as
+millisecond deltas from the previous record and cumulative /proc counters
+as deltas from the same series' previous sample, so a record is 16 bytes
+of framing plus 4 bytes per field. With --capacity the file is
+preallocated and the oldest records are overwritten (bounded ring);
+without it the file grows like the text logs did.
+The reader maps the file read-only into a NumPy structured array (no
+parsing, no copy unless the ring has wrapped); `export` regenerates the
+text layouts the existing converters and loaders read.
+Usage:
+  python3 sample_ring.py record <path> [interval] --kind net|proc [--capacity N] [--duration SEC]
+  python3 sample_ring.py export <path> [--format text|csv] [--output FILE]
+  python3 sample_ring.py info <path>
+
+File layout:
+    0       header: magic, version, record size, capacity, count, base time (ms)
+    64      schema: "name:c|g,..." (c = counter delta, g = gauge)
+    512     series names: 2040 slots of (u4 id, u4 pid, 56-byte name)
+    131072  records: dt_ms u4, span_ms u4, series u4, flags u1, pad, fields (u4 or f4 each)
+
+span_ms is the time since the same series' previous sample, so rates are
+delta / span even after the ring has dropped that previous sample.
+Series ids are assigned in order of first appearance (a JVM is one series
+per (pid, start time), so a reused PID starts a new series); name slots of
+series with no record left in the ring are reused. Version 1 files (series
+id = PID, slots of u4 id + 60-byte name) are still read.
+"""
+
+import argparse
+import csv
+import os
+import signal
+import struct
+import sys
+import time
+
+from jvm_sampler import classify
+from proc_sampler import (CLK_TCK, PAGE_SIZE, MonotonicSchedule, list_pids, meminfo, network_interfaces, pid_cmdline,
+                          pid_stat, read_file)
+from rate_engine import RateEngine
+from sampler_overhead import SelfMonitor, overhead_path
+
+MAGIC = b'MRSRING1'
+VERSION = 2
+HEADER = struct.Struct('<8sHHHHQQq')  # magic version record_size fields pad capacity count base_time_ms
+STATE = struct.Struct('<Qq')  # count, base_time_ms (rewritten after every tick)
+STATE_OFFSET = 24
+SCHEMA_OFFSET = 64
+NAMES_OFFSET = 512
+NAME_SLOT = struct.Struct('<II56s')
+NAME_SLOT_V1 = struct.Struct('<I60s')
+NAME_SLOTS = 2040
+HEADER_SIZE = 131072
+FRAME = struct.Struct('<IIIB3x')
+U4_MAX = 0xFFFFFFFF
+
+FLAG_FIRST = 1      # first sample of the series: counter fields are 0
+FLAG_RESET = 2      # a counter restarted (rate_engine.RateEngine): field holds the new value
+FLAG_SATURATED = 4  # a counter delta did not fit in u4 and was clamped
+
+# Series = interface (lo excluded, as in gemini_monitor_plus.sh); /proc/net/dev column per field
+NET_SCHEMA = [('rx_bytes', 'c'), ('tx_bytes', 'c'), ('rx_packets', 'c'), ('tx_packets', 'c'),
+              ('rx_compressed', 'c'), ('tx_compressed', 'c'), ('rx_multicast', 'c')]
+NET_COLUMNS = [0, 8, 1, 9, 6, 15, 7]
+# Series = pid of a YarnChild / MRAppMaster JVM
+PROC_SCHEMA = [('utime', 'c'), ('stime', 'c'), ('guest_time', 'c'), ('wait_us', 'c'), ('minflt', 'c'),
+               ('majflt', 'c'), ('read_bytes', 'c'), ('write_bytes', 'c'), ('cancelled_write_bytes', 'c'),
+               ('blkio_ticks', 'c'), ('uid', 'g'), ('cpu', 'g'), ('vsz_kb', 'g'), ('rss_kb', 'g'),
+               ('mem_percent', 'g'), ('threads', 'g')]
+SCHEMAS = {'net': NET_SCHEMA, 'proc': PROC_SCHEMA}
+
+
+def record_struct(schema):
+    return struct.Struct(FRAME.format + ''.join('I' if kind == 'c' else 'f' for _, kind in schema))
+
+
+def record_dtype(schema):
+    import numpy as np
+    fields = [('dt_ms', '<u4'), ('span_ms', '<u4'), ('series', '<u4'), ('flags', 'u1'), ('pad', 'V3')]
+    fields += [(name, '<u4' if kind == 'c' else '<f4') for name, kind in schema]
+    return np.dtype(fields)
+
+
+def encode_schema(kind, schema):
+    return f"{kind};" + ','.join(f"{name}:{k}" for name, k in schema)
+
+
+def decode_schema(text):
+    kind, _, fields = text.partition(';')
+    return kind, [tuple(field.split(':')) for field in fields.split(',')]
+
+
+class RingWriter:
+    """Appends records with os.pwrite; with a capacity the oldest record is overwritten"""
+
+    def __init__(self, path, kind, capacity=0):
+        self.path = path
+        self.kind = kind
+        self.schema = SCHEMAS[kind]
+        self.record = record_struct(self.schema)
+        self.counters = [i for i, (_, k) in enumerate(self.schema) if k == 'c']
+        self.capacity = capacity
+        self.count = 0
+        self.base_ms = None
+        self.last_ms = None
+        # Counter deltas (wrap and reset handling) per (series, field); no gap limit
+        self.engine = RateEngine(max_gap=0)
+        self.next_series = 1
+        self.names = {}  # series -> name
+        self.slots = {}  # series -> name-table slot
+        self.free_slots = list(range(NAME_SLOTS - 1, -1, -1))
+        self.newest = {}  # series -> index (count) of its newest record
+        self.unnamed = set()  # series left without a label
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        header = bytearray(HEADER_SIZE)
+        HEADER.pack_into(header, 0, MAGIC, VERSION, self.record.size, len(self.schema), 0, capacity, 0, 0)
+        schema = encode_schema(kind, self.schema).encode('ascii')
+        header[SCHEMA_OFFSET:SCHEMA_OFFSET + len(schema)] = schema
+        os.pwrite(self.fd, bytes(header), 0)
+        if capacity:
+            os.ftruncate(self.fd, HEADER_SIZE + capacity * self.record.size)
+
+    def new_series(self):
+        series = self.next_series
+        self.next_series += 1
+        return series
+
+    def _recycle(self):
+        """Free the name slots of series whose records have all been overwritten"""
+        if not self.capacity or self.count <= self.capacity:
+            return
+        oldest = self.count - self.capacity
+        for series in [s for s, index in self.newest.items() if index < oldest]:
+            del self.newest[series]
+            self.names.pop(series, None)
+            slot = self.slots.pop(series, None)
+            if slot is not None:
+                os.pwrite(self.fd, bytes(NAME_SLOT.size), NAMES_OFFSET + slot * NAME_SLOT.size)
+                self.free_slots.append(slot)
+
+    def name(self, series, name, pid=0):
+        if self.names.get(series) == name:
+            return
+        slot = self.slots.get(series)
+        if slot is None:
+            if not self.free_slots:
+                self._recycle()
+            if not self.free_slots:
+                self.unnamed.add(series)  # table full: the series keeps its numeric id
+                return
+            slot = self.slots[series] = self.free_slots.pop()
+        self.names[series] = name
+        os.pwrite(self.fd, NAME_SLOT.pack(series, pid, name.encode('ascii', 'replace')[:56]),
+                  NAMES_OFFSET + slot * NAME_SLOT.size)
+
+    def append(self, time_ms, series, values):
+        """values: cumulative readings for counter fields, current readings for gauges"""
+        fields = list(values)
+        flags = 0
+        span = 0
+        for i in self.counters:
+            result = self.engine.delta((series, i), time_ms, values[i])
+            if result is None:
+                flags |= FLAG_FIRST
+                fields[i] = 0
+                continue
+            delta, span, event = result
+            if event == RateEngine.RESET:
+                flags |= FLAG_RESET
+            if delta > U4_MAX:
+                flags |= FLAG_SATURATED
+                delta = U4_MAX
+            fields[i] = delta
+        span = 0 if flags & FLAG_FIRST else min(int(span), U4_MAX)
+
+        if self.base_ms is None:
+            self.base_ms = self.last_ms = time_ms
+        index = self.count
+        if self.capacity:
+            index %= self.capacity
+            if self.count >= self.capacity:
+                # The overwritten record's delta moves into the base time
+                offset = HEADER_SIZE + index * self.record.size
+                self.base_ms += struct.unpack('<I', os.pread(self.fd, 4, offset))[0]
+        dt = max(time_ms - self.last_ms, 0)
+        self.last_ms = time_ms
+        os.pwrite(self.fd, self.record.pack(dt, span, series, flags, *fields),
+                  HEADER_SIZE + index * self.record.size)
+        self.newest[series] = self.count
+        self.count += 1
+
+    def forget(self, series):
+        for i in self.counters:
+            self.engine.forget((series, i))
+
+    def flush(self):
+        """Publish count and base time; records written before this are visible to readers"""
+        os.pwrite(self.fd, STATE.pack(self.count, self.base_ms or 0), STATE_OFFSET)
+
+    def close(self):
+        self.flush()
+        os.close(self.fd)
+
+
+class RingReader:
+    """Read-only view of a ring file as a NumPy structured array"""
+
+    def __init__(self, path):
+        import numpy as np
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        magic, version, record_size, _, _, self.capacity, self.count, self.base_ms = HEADER.unpack_from(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a sample ring file")
+        schema = header[SCHEMA_OFFSET:NAMES_OFFSET].rstrip(b'\0').decode('ascii')
+        self.kind, self.schema = decode_schema(schema)
+        self.dtype = record_dtype(self.schema)
+        if self.dtype.itemsize != record_size:
+            raise ValueError(f"{path}: record size {record_size} does not match its schema")
+        self.names = {}
+        self.pids = {}  # series -> pid (proc rings)
+        for slot in range(NAME_SLOTS):
+            if version == 1:
+                series, name = NAME_SLOT_V1.unpack_from(header, NAMES_OFFSET + slot * NAME_SLOT_V1.size)
+                pid = series
+            else:
+                series, pid, name = NAME_SLOT.unpack_from(header, NAMES_OFFSET + slot * NAME_SLOT.size)
+            name = name.rstrip(b'\0')
+            if name:
+                self.names[series] = name.decode('ascii')
+                self.pids[series] = pid
+        stored = min(self.count, self.capacity) if self.capacity else self.count
+        self.records = np.memmap(path, dtype=self.dtype, mode='r', offset=HEADER_SIZE, shape=(stored,)) \
+            if stored else np.zeros(0, dtype=self.dtype)
+
+    @property
+    def wrapped(self):
+        return bool(self.capacity) and self.count > self.capacity
+
+    def ordered(self):
+        """Records oldest first (a view unless the ring has wrapped)"""
+        import numpy as np
+        if not self.wrapped:
+            return self.records
+        oldest = self.count % self.capacity
+        return np.concatenate((self.records[oldest:], self.records[:oldest]))
+
+    def times(self, records=None):
+        """Epoch seconds of each ordered record"""
+        import numpy as np
+        records = self.ordered() if records is None else records
+        return (self.base_ms + np.cumsum(records['dt_ms'], dtype=np.int64)) / 1000.0
+
+    def rates(self, records=None):
+        """{counter: per-second rate} over each record's span (0 for first samples)"""
+        import numpy as np
+        records = self.ordered() if records is None else records
+        span = records['span_ms'] / 1000.0
+        safe = np.where(span > 0, span, 1.0)
+        return {name: np.where(span > 0, records[name] / safe, 0.0)
+                for name, kind in self.schema if kind == 'c'}
+
+
+def net_sample(writer, time_ms, ids):
+    for iface, counters in network_interfaces().items():
+        if iface == 'lo':
+            continue
+        if iface not in ids:
+            ids[iface] = writer.new_series()
+        writer.name(ids[iface], iface)
+        writer.append(time_ms, ids[iface], [counters[c] for c in NET_COLUMNS])
+
+
+def _proc_io(pid):
+    values = {}
+    try:
+        for line in read_file(f'/proc/{pid}/io').splitlines():
+            key, _, rest = line.partition(':')
+            values[key] = int(rest)
+    except (OSError, ValueError):
+        pass
+    return values
+
+
+def _proc_wait_us(pid):
+    # /proc/<pid>/schedstat: on-cpu ns, run-queue wait ns, timeslices (pidstat's %wait)
+    try:
+        return int(read_file(f'/proc/{pid}/schedstat').split()[1]) // 1000
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def _proc_uid(pid):
+    try:
+        return os.stat(f'/proc/{pid}').st_uid
+    except OSError:
+        return 0
+
+
+def proc_sample(writer, time_ms, live):
+    """live: (pid, starttime) -> series of the JVMs seen last tick"""
+    mem_total_kb = meminfo().get('MemTotal', 0)
+    current = {}
+    for pid in list_pids():
+        info = classify(pid_cmdline(pid))
+        if not info:
+            continue
+        fields = pid_stat(pid)
+        if not fields:
+            continue
+        # state=0 ... minflt=7 majflt=9 utime=11 stime=12 threads=17 starttime=19 vsize=20 rss=21
+        # processor=36 blkio_ticks=39 guest_time=40
+        key = (pid, fields[19])
+        series = live.get(key) or writer.new_series()  # a reused PID is a new series
+        current[key] = series
+        role, attempt_id, _ = info
+        writer.name(series, attempt_id or role, pid)
+        io = _proc_io(pid)
+        rss_kb = int(fields[21]) * PAGE_SIZE // 1024
+        writer.append(time_ms, series, [
+            int(fields[11]), int(fields[12]), int(fields[40]) if len(fields) > 40 else 0, _proc_wait_us(pid),
+            int(fields[7]), int(fields[9]), io.get('read_bytes', 0), io.get('write_bytes', 0),
+            io.get('cancelled_write_bytes', 0), int(fields[39]) if len(fields) > 39 else 0,
+            _proc_uid(pid), int(fields[36]), int(fields[20]) // 1024, rss_kb,
+            rss_kb * 100.0 / mem_total_kb if mem_total_kb else 0.0, int(fields[17]),
+        ])
+    for key in set(live) - set(current):
+        writer.forget(live[key])
+    live.clear()
+    live.update(current)
+
+
+def clock(epoch):
+    return time.strftime('%H:%M:%S', time.localtime(epoch))
+
+
+def export_text(reader, out):
+    """The text layouts gemini_monitor_plus.sh writes (readable by convert_pidstat_to_csv.py)"""
+    records = reader.ordered()
+    times = reader.times(records)
+    rates = reader.rates(records)
+    keep = records['span_ms'] > 0  # first samples have no interval to report
+    if reader.kind == 'net':
+        out.write("Time        IFACE      rxpck/s   txpck/s    rxkB/s    txkB/s   rxcmp/s   txcmp/s  rxmcst/s\n")
+        for i in keep.nonzero()[0]:
+            iface = reader.names.get(int(records['series'][i]), str(records['series'][i]))
+            out.write(f"{clock(times[i])}  {iface:>12} {rates['rx_packets'][i]:9.2f} {rates['tx_packets'][i]:9.2f} "
+                      f"{rates['rx_bytes'][i] / 1024:9.2f} {rates['tx_bytes'][i] / 1024:9.2f} "
+                      f"{rates['rx_compressed'][i]:9.2f} {rates['tx_compressed'][i]:9.2f} "
+                      f"{rates['rx_multicast'][i]:9.2f} {0:9.2f}\n")
+        return int(keep.sum())
+
+    out.write("Time        UID      PID    %usr %system  %guest   %wait    %CPU   CPU  Command\n")
+    ticks = 100.0 / CLK_TCK
+    for i in keep.nonzero()[0]:
+        start, end = clock(times[i] - records['span_ms'][i] / 1000.0), clock(times[i])
+        series = int(records['series'][i])
+        prefix = f"{start}  {end}  {int(records['uid'][i]):>7} {reader.pids.get(series, series):>9}"
+        usr = rates['utime'][i] * ticks
+        system = rates['stime'][i] * ticks
+        guest = rates['guest_time'][i] * ticks
+        wait = rates['wait_us'][i] / 10000.0
+        out.write(f"{prefix} {usr:7.2f} {system:7.2f} {guest:7.2f} {wait:7.2f} {usr + system:7.2f} "
+                  f"{int(records['cpu'][i]):5d}  java\n")
+        out.write(f"{prefix} {rates['minflt'][i]:9.2f} {rates['majflt'][i]:9.2f} {int(records['vsz_kb'][i]):7d} "
+                  f"{int(records['rss_kb'][i]):7d} {records['mem_percent'][i]:6.2f}  java\n")
+        out.write(f"{prefix} {rates['read_bytes'][i] / 1024:9.2f} {rates['write_bytes'][i] / 1024:9.2f} "
+                  f"{rates['cancelled_write_bytes'][i] / 1024:9.2f} "
+                  f"{int(records['blkio_ticks'][i]):7d}  java\n")
+    return int(keep.sum())
+
+
+def export_csv(reader, out):
+    """One row per record: counters as per-second rates, gauges as sampled"""
+    records = reader.ordered()
+    times = reader.times(records)
+    rates = reader.rates(records)
+    writer = csv.writer(out)
+    writer.writerow(['timestamp', 'series', 'pid', 'name', 'interval_sec', 'flags']
+                    + [f"{name}_per_sec" if kind == 'c' else name for name, kind in reader.schema])
+    for i in range(len(records)):
+        series = int(records['series'][i])
+        row = [f"{times[i]:.3f}", series, reader.pids.get(series) or '', reader.names.get(series, ''),
+               f"{records['span_ms'][i] / 1000:.3f}",
+               int(records['flags'][i])]
+        for name, kind in reader.schema:
+            row.append(f"{rates[name][i]:.2f}" if kind == 'c' else f"{records[name][i]:g}")
+        writer.writerow(row)
+    return len(records)
+
+
+def cmd_record(args):
+    if args.interval <= 0:
+        print("Error: interval must be positive")
+        return 1
+    if not os.path.exists('/proc/stat'):
+        print("Error: /proc is not available on this system")
+        return 1
+    os.makedirs(os.path.dirname(args.path) or '.', exist_ok=True)
+
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stop.append(True))
+
+    writer = RingWriter(args.path, args.kind, args.capacity)
+    sample = net_sample if args.kind == 'net' else proc_sample
+    state = {}
+    overhead = None
+    if not args.no_overhead:
+        name = f'sample_ring_{args.kind}'
+        overhead = SelfMonitor(args.node, name, args.interval,
+                               overhead_path(os.path.dirname(args.path) or '.', args.node, name))
+    schedule = MonotonicSchedule(args.interval)
+    ring = f"ring of {args.capacity} records" if args.capacity else "unbounded"
+    print(f"Recording {args.kind} samples to {args.path} ({ring}, {writer.record.size} bytes/record)")
+    due = None
+    try:
+        while not stop:
+            if overhead:
+                overhead.tick(due, schedule.missed)
+            sample(writer, int(time.time() * 1000), state)
+            writer.flush()
+            if args.duration and schedule.tick * args.interval >= args.duration:
+                break
+            due = schedule.wait()
+    finally:
+        writer.close()
+        if overhead:
+            overhead.close(schedule.missed)
+    print(f"Recorded {writer.count} records")
+    if writer.unnamed:
+        print(f"Warning: name table full, {len(writer.unnamed)} series label(s) not written "
+              f"(use --capacity so aged-out series free their slots)", file=sys.stderr)
+    if schedule.missed:
+        print(f"Warning: {schedule.missed} tick(s) skipped because sampling overran the interval",
+              file=sys.stderr)
+    return 0
+
+
+def cmd_export(args):
+    reader = RingReader(args.path)
+    export = export_text if args.format == 'text' else export_csv
+    if args.output:
+        with open(args.output, 'w', newline='') as out:
+            count = export(reader, out)
+        print(f"Exported {count} records to {args.output}")
+    else:
+        export(reader, sys.stdout)
+    return 0
+
+
+def cmd_info(args):
+    reader = RingReader(args.path)
+    records = reader.ordered()
+    print(f"File: {args.path} ({os.path.getsize(args.path)} bytes)")
+    print(f"Kind: {reader.kind}, {len(reader.schema)} fields, {reader.dtype.itemsize} bytes/record")
+    print(f"Capacity: {reader.capacity or 'unbounded'}, written {reader.count}, stored {len(records)}"
+          f"{' (wrapped)' if reader.wrapped else ''}")
+    if len(records):
+        times = reader.times(records)
+        print(f"Time span: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(times[0]))} - "
+              f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(times[-1]))} ({times[-1] - times[0]:.1f}s)")
+    series = sorted({int(s) for s in records['series']})
+    print(f"Series: {len(series)}")
+    for s in series[:20]:
+        pid = reader.pids.get(s)
+        print(f"  {s:>8}  {f'pid {pid}' if pid else '':<12} {reader.names.get(s, '')}")
+    if len(series) > 20:
+        print(f"  ... {len(series) - 20} more")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Binary ring-buffer format for high-frequency samples')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record = subparsers.add_parser('record', help='Sample /proc into a ring file')
+    record.add_argument('path', help='Ring file, e.g. mapreduce_metrics/hadoop001_network_metrics.ring')
+    record.add_argument('--kind', choices=sorted(SCHEMAS), required=True,
+                        help='net: per-interface /proc/net/dev; proc: YarnChild/MRAppMaster JVMs')
+    record.add_argument('interval', nargs='?', type=float, default=1.0, help='Seconds between samples (default: 1)')
+    record.add_argument('--capacity', type=int, default=0,
+                        help='Keep only the newest N records (default: 0 = unbounded)')
+    record.add_argument('--duration', type=float, default=None, help='Stop after this many seconds')
+    record.add_argument('--node', default=os.uname().nodename, help='Node name for the overhead series')
+    record.add_argument('--no-overhead', action='store_true',
+                        help="Don't record the recorder's own CPU/RSS/jitter next to the ring file")
+    record.set_defaults(func=cmd_record)
+
+    export = subparsers.add_parser('export', help='Write a ring file as text or CSV')
+    export.add_argument('path')
+    export.add_argument('--format', choices=['text', 'csv'], default='text',
+                        help='text: sar/pidstat layout of gemini_monitor_plus.sh; csv: one row per record')
+    export.add_argument('--output', default=None, help='Output file (default: stdout)')
+    export.set_defaults(func=cmd_export)
+
+    info = subparsers.add_parser('info', help='Describe a ring file')
+    info.add_argument('path')
+    info.set_defaults(func=cmd_info)
+
+    args = parser.parse_args()
+    try:
+        sys.exit(args.func(args))
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Sampler Self-Overhead and Jitter Instrumentation
+collect_metrics.sh, collect_mapreduce_metrics.sh and gemini_monitor_plus.sh
+can all run on the same worker, and nothing measured what they cost. Each
+Python sampler (proc_sampler, jvm_sampler, sample_ring, rate_engine) keeps
+a SelfMonitor that writes a side-channel row every --period seconds: its
+own CPU time and share of one core, RSS, forks, ticks, and how late each
+tick started against its schedule (mean/p50/p95/max and a histogram).
+Shell samplers are measured from outside with `watch`. The shells start it
+as their own child, so the watcher leaves itself out of the tree it
+measures and records its own cost as a separate sampler, watch_<name>.
+Usage:
+  python3 sampler_overhead.py watch <pid> <node_name> --name gemini_monitor_plus [--output-dir system_metrics]
+  python3 sampler_overhead.py check <results_dir_or_zip | overhead.csv ...> [--cpu-threshold 5] [--jitter-ratio 0.2]
+
+Rows go to <output_dir>/<node>_overhead_<sampler>_<ts>.csv next to the
+sampler's own output. cpu_percent is of one core; `check` (and
+experiment_run.py) warns when the samplers on a node together exceed
+--cpu-threshold during a run, or a sampler's p95 jitter exceeds
+--jitter-ratio of its interval.
+"""
+
+import argparse
+import csv
+import glob
+import os
+import resource
+import signal
+import sys
+import time
+
+from proc_sampler import CLK_TCK, PAGE_SIZE, list_pids, pid_stat, read_file
+
+OVERHEAD_HEADER = ['timestamp', 'node_name', 'sampler', 'pid', 'target_interval_sec', 'period_sec', 'ticks',
+                   'missed', 'cpu_sec', 'cpu_percent', 'rss_mb', 'forks', 'forks_per_tick', 'jitter_mean_ms',
+                   'jitter_p50_ms', 'jitter_p95_ms', 'jitter_max_ms']
+JITTER_BUCKETS_MS = (1, 5, 10, 50, 100)
+OVERHEAD_HEADER += [f'jitter_le_{b}ms' for b in JITTER_BUCKETS_MS] + [f'jitter_gt_{JITTER_BUCKETS_MS[-1]}ms']
+DEFAULT_PERIOD = 10.0
+DEFAULT_CPU_THRESHOLD = float(os.environ.get('MONITOR_OVERHEAD_CPU', 5.0))
+DEFAULT_JITTER_RATIO = 0.2
+
+_forks = [0]
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_parent=lambda: _forks.__setitem__(0, _forks[0] + 1))
+
+
+def overhead_path(output_dir, node_name, sampler):
+    return os.path.join(output_dir, f"{node_name}_overhead_{sampler}_{time.strftime('%Y%m%d_%H%M%S')}.csv")
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def jitter_columns(jitters):
+    """Mean/p50/p95/max and histogram counts of tick start delays (ms)"""
+    if not jitters:
+        return [''] * 4 + [0] * (len(JITTER_BUCKETS_MS) + 1)
+    counts = [0] * (len(JITTER_BUCKETS_MS) + 1)
+    for value in jitters:
+        for i, bound in enumerate(JITTER_BUCKETS_MS):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    return [f"{sum(jitters) / len(jitters):.2f}", f"{percentile(jitters, 0.5):.2f}",
+            f"{percentile(jitters, 0.95):.2f}", f"{max(jitters):.2f}"] + counts
+
+
+def rss_mb(pid='self'):
+    try:
+        for line in read_file(f'/proc/{pid}/status').splitlines():
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0.0
+
+
+class SelfMonitor:
+    """
+    Per-sampler overhead series
+
+    Call tick(due) as each sample starts, with the schedule's due time on
+    the monotonic clock; a row covering the last `period` seconds is written
+    whenever one has elapsed. Forks are counted with os.register_at_fork.
+    """
+
+    def __init__(self, node_name, sampler, target_interval, path, period=DEFAULT_PERIOD):
+        self.node_name = node_name
+        self.sampler = sampler
+        self.target_interval = target_interval
+        self.period = period
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(path, 'w', newline='', buffering=1)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(OVERHEAD_HEADER)
+        self.path = path
+        self._reset(time.monotonic(), self._cpu(), _forks[0], 0)
+        self.total = {'cpu_sec': 0.0, 'rows': 0}
+
+    @staticmethod
+    def _cpu():
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+    def _reset(self, now, cpu, forks, missed):
+        self.period_start, self.period_cpu, self.period_forks, self.period_missed = now, cpu, forks, missed
+        self.jitters = []
+        self.ticks = 0
+
+    def tick(self, due=None, missed=0):
+        """Record one sample start; `missed` is the schedule's running count of skipped ticks"""
+        now = time.monotonic()
+        self.ticks += 1
+        if due is not None:
+            self.jitters.append(max(now - due, 0.0) * 1000)
+        if now - self.period_start >= self.period:
+            self.flush(missed)
+
+    def flush(self, missed=0):
+        now = time.monotonic()
+        elapsed = now - self.period_start
+        if elapsed <= 0 or not self.ticks:
+            return
+        cpu = self._cpu()
+        cpu_sec = cpu - self.period_cpu
+        forks = _forks[0] - self.period_forks
+        self.writer.writerow([f"{time.time():.3f}", self.node_name, self.sampler, os.getpid(),
+                              f"{self.target_interval:g}", f"{elapsed:.3f}", self.ticks, missed - self.period_missed,
+                              f"{cpu_sec:.3f}", f"{cpu_sec / elapsed * 100:.2f}", f"{rss_mb():.1f}", forks,
+                              f"{forks / self.ticks:.2f}"] + jitter_columns(self.jitters))
+        self.total['cpu_sec'] += cpu_sec
+        self.total['rows'] += 1
+        self._reset(now, cpu, _forks[0], missed)
+
+    def close(self, missed=0):
+        self.flush(missed)
+        self.file.close()
+
+
+class TreeWatcher:
+    """Overhead of another process and its descendants (shell samplers), read from /proc"""
+
+    def __init__(self, pid, exclude=None):
+        self.pid = pid
+        # The watcher itself when launched by the shell it watches
+        self.exclude = os.getpid() if exclude is None else exclude
+        self.seen = set()
+
+    def tree(self):
+        children = {}
+        for pid in list_pids():
+            fields = pid_stat(pid)
+            if fields:
+                children.setdefault(int(fields[1]), []).append(pid)
+        pids, stack = [], [self.pid]
+        while stack:
+            pid = stack.pop()
+            if pid == self.exclude:
+                continue  # and its subtree
+            pids.append(pid)
+            stack.extend(children.get(pid, []))
+        return pids
+
+    def sample(self):
+        """(cpu_sec, rss_mb, new_descendants) or None once the root has exited"""
+        root = pid_stat(self.pid)
+        if not root:
+            return None
+        # utime stime cutime cstime: cutime/cstime hold every reaped child's CPU
+        cpu = sum(int(v) for v in root[11:15]) / CLK_TCK
+        rss = 0
+        new = 0
+        for pid in self.tree():
+            fields = pid_stat(pid) if pid != self.pid else root
+            if not fields:
+                continue
+            rss += int(fields[21]) * PAGE_SIZE
+            if pid != self.pid:
+                cpu += (int(fields[11]) + int(fields[12])) / CLK_TCK  # live children not yet reaped
+                key = (pid, fields[19])
+                if key not in self.seen:
+                    self.seen.add(key)
+                    new += 1
+        return cpu, rss / 1048576, new
+
+
+def cmd_watch(args):
+    watcher = TreeWatcher(args.pid)
+    first = watcher.sample()
+    if first is None:
+        print(f"Error: process {args.pid} not found")
+        return 1
+    path = overhead_path(args.output_dir, args.node_name, args.name)
+    os.makedirs(args.output_dir, exist_ok=True)
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stop.append(True))
+    print(f"Watching {args.name} (pid {args.pid}); overhead rows: {path}")
+    overhead = None
+    if not args.no_overhead:
+        overhead = SelfMonitor(args.node_name, f'watch_{args.name}', args.scan,
+                               overhead_path(args.output_dir, args.node_name, f'watch_{args.name}'), args.period)
+    with open(path, 'w', newline='', buffering=1) as f:
+        writer = csv.writer(f)
+        writer.writerow(OVERHEAD_HEADER)
+        last_cpu, last_time, forks, scans = first[0], time.monotonic(), 0, 0
+        while not stop:
+            due = time.monotonic() + args.scan
+            time.sleep(args.scan)
+            if overhead:
+                overhead.tick(due)
+            current = watcher.sample()
+            if current is None:
+                break
+            forks += current[2]
+            scans += 1
+            now = time.monotonic()
+            if now - last_time >= args.period:
+                # Shell loops have no schedule: ticks/jitter stay empty, forks are those seen alive
+                writer.writerow([f"{time.time():.3f}", args.node_name, args.name, args.pid, '', f"{now - last_time:.3f}",
+                                 '', '', f"{current[0] - last_cpu:.3f}",
+                                 f"{(current[0] - last_cpu) / (now - last_time) * 100:.2f}", f"{current[1]:.1f}",
+                                 forks, ''] + jitter_columns([]))
+                last_cpu, last_time, forks = current[0], now, 0
+    if overhead:
+        overhead.close()
+    print(f"Stopped watching {args.name}")
+    return 0
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def overhead_warnings(rows, cpu_threshold=DEFAULT_CPU_THRESHOLD, jitter_ratio=DEFAULT_JITTER_RATIO):
+    """
+    Warning strings for overhead rows of one run
+
+    Mean CPU per (node, sampler), summed per node because the samplers run
+    side by side; p95 jitter is checked per sampler against its interval.
+    """
+    per_sampler = {}
+    for row in rows:
+        per_sampler.setdefault((row['node_name'], row['sampler']), []).append(row)
+    node_cpu = {}
+    warnings = []
+    for (node, sampler), samples in sorted(per_sampler.items()):
+        cpu = [v for v in (_float(r['cpu_percent']) for r in samples) if v is not None]
+        if cpu:
+            node_cpu.setdefault(node, []).append((sampler, sum(cpu) / len(cpu)))
+        p95 = [v for v in (_float(r['jitter_p95_ms']) for r in samples) if v is not None]
+        target = _float(samples[0].get('target_interval_sec'))
+        if p95 and target and max(p95) > jitter_ratio * target * 1000:
+            warnings.append(f"{node}/{sampler}: p95 tick jitter {max(p95):.0f} ms exceeds "
+                            f"{jitter_ratio:.0%} of its {target:g}s interval")
+    for node, samplers in sorted(node_cpu.items()):
+        total = sum(cpu for _, cpu in samplers)
+        if total > cpu_threshold:
+            parts = ', '.join(f"{name} {cpu:.1f}%" for name, cpu in samplers)
+            warnings.append(f"{node}: monitoring used {total:.1f}% of a core (threshold {cpu_threshold:g}%): {parts}")
+    return warnings
+
+
+def cmd_check(args):
+    rows = []
+    runs = None
+    for path in args.paths:
+        if path.endswith('.csv'):
+            for name in glob.glob(path):
+                with open(name, 'r', newline='') as f:
+                    rows.extend(csv.DictReader(f))
+        else:
+            from experiment_run import ExperimentResults
+            results = ExperimentResults(path)
+            runs = results.runs()
+            rows.extend(results.overhead_samples())
+    if not rows:
+        print("No sampler overhead rows found")
+        return 0
+    samplers = sorted({(r['node_name'], r['sampler']) for r in rows})
+    print(f"{len(rows)} overhead row(s) from {len(samplers)} sampler(s)")
+    found = 0
+    for run in runs or [None]:
+        window = run.overhead if run else rows
+        for message in overhead_warnings(window, args.cpu_threshold, args.jitter_ratio):
+            print(f"Warning: {run.experiment_id + ': ' if run else ''}{message}")
+            found += 1
+    if not found:
+        print(f"Monitoring overhead within limits ({args.cpu_threshold:g}% CPU, {args.jitter_ratio:.0%} jitter)")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sampler self-overhead and jitter instrumentation')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    watch = subparsers.add_parser('watch', help='Measure a running shell sampler from outside')
+    watch.add_argument('pid', type=int)
+    watch.add_argument('node_name')
+    watch.add_argument('--name', required=True, help='Sampler name written to every row')
+    watch.add_argument('--output-dir', default='system_metrics')
+    watch.add_argument('--period', type=float, default=DEFAULT_PERIOD, help='Seconds per row (default: 10)')
+    watch.add_argument('--scan', type=float, default=0.2, help='Seconds between /proc scans (default: 0.2)')
+    watch.add_argument('--no-overhead', action='store_true',
+                       help="Don't record the watcher's own CPU/RSS (<node>_overhead_watch_<name>_*.csv)")
+    watch.set_defaults(func=cmd_watch)
+
+    check = subparsers.add_parser('check', help='Warn about runs with excessive monitoring overhead')
+    check.add_argument('paths', nargs='+', help='Results directory/zip/manifest or overhead CSVs')
+    check.add_argument('--cpu-threshold', type=float, default=DEFAULT_CPU_THRESHOLD,
+                       help=f'Per-node monitoring CPU, %% of one core (default: {DEFAULT_CPU_THRESHOLD:g})')
+    check.add_argument('--jitter-ratio', type=float, default=DEFAULT_JITTER_RATIO,
+                       help=f'p95 jitter as a fraction of the interval (default: {DEFAULT_JITTER_RATIO:g})')
+    check.set_defaults(func=cmd_check)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
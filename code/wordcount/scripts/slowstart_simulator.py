@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Discrete-Event Slowstart What-If Simulator
+Replays the map durations of a measured timeline on a fixed container capacity,
+models shuffle with a per-map fetch cost calibrated from the same run, and
+predicts job completion time and reducer slot waste for other
+mapreduce.job.reduce.slowstart.completedmaps values and reducer counts.
+Usage:
+  python3 slowstart_simulator.py <timeline_csv> [--slowstart 0.1,0.5,1.0] [--reducers 2,4,8]
+  python3 slowstart_simulator.py --validate <timeline_csv_or_dir> [...]   # also warns if slowstart does not change the schedule
+"""
+
+import argparse
+import csv
+import heapq
+import itertools
+import math
+import os
+import sys
+
+from timeline_io import find_timeline_csvs, load_timeline, output_prefix, split_tasks
+
+DEFAULT_SLOWSTART_VALUES = [0.05, 0.1, 0.3, 0.5, 0.7, 0.9, 1.0]
+# Main.java requests 3072MB reduce containers vs 2048MB map containers
+DEFAULT_REDUCE_WEIGHT = 1.5
+# yarn.app.mapreduce.am.job.reduce.rampup.limit default
+DEFAULT_RAMPUP_LIMIT = 0.5
+
+WHATIF_HEADER = [
+    'slowstart_value', 'num_reducers', 'predicted_makespan_sec', 'predicted_map_end_sec',
+    'reduce_slot_sec', 'idle_reducer_slot_sec', 'delta_vs_measured_pct',
+]
+VALIDATION_HEADER = [
+    'calibration_run', 'target_run', 'target_slowstart', 'target_reducers',
+    'measured_makespan_sec', 'predicted_makespan_sec', 'error_pct',
+]
+
+
+class RunModel:
+    """Parameters extracted from one measured timeline"""
+
+    def __init__(self, tasks, containers=None, reduce_weight=DEFAULT_REDUCE_WEIGHT):
+        map_tasks, reduce_tasks = split_tasks(tasks)
+        if not map_tasks:
+            raise ValueError('timeline has no MAP tasks')
+        job_start = min(t['start'] for t in tasks)
+        map_end = max(t['finish'] for t in map_tasks)
+
+        self.experiment_id = tasks[0]['experiment_id']
+        self.slowstart = float(tasks[0]['slowstart_value'] or 1.0)
+        self.reduce_weight = reduce_weight
+        self.makespan = max(t['finish'] for t in tasks) - job_start
+        self.map_phase = map_end - job_start
+        # Maps are replayed in their measured launch order
+        self.map_durations = [t['finish'] - t['start'] for t in sorted(map_tasks, key=lambda t: t['start'])]
+        self.num_reducers = len(reduce_tasks)
+
+        tails, merges, reduces = [], [], []
+        for t in reduce_tasks:
+            shuffle_end = t['shuffle_finish']
+            merge_end = t['merge_finish']
+            if shuffle_end and merge_end:
+                tails.append(max(0.0, shuffle_end - max(t['start'], map_end)))
+                merges.append(max(0.0, merge_end - shuffle_end))
+                reduces.append(max(0.0, t['finish'] - merge_end))
+            else:
+                tails.append(0.0)
+                merges.append(0.0)
+                reduces.append(max(0.0, t['finish'] - max(t['start'], map_end)))
+        self.measured_tail = mean(tails)
+        self.merge_sec = mean(merges)
+        self.reduce_sec = mean(reduces)
+
+        self.fetch_cost = 0.0
+        self.containers = containers or measured_capacity(map_tasks, reduce_tasks, reduce_weight)
+        if containers is None:
+            self.containers = self.calibrate_capacity()
+        self.fetch_cost = self.calibrate_fetch_cost()
+
+    def calibrate_capacity(self, iterations=30):
+        """
+        Binary-search the capacity that reproduces the measured map phase
+
+        On a shared cluster the peak usage overstates what the job actually
+        got, so the effective capacity is fitted to the measured map end. It
+        never goes below one reduce container, or no reducer could ever start.
+        """
+        lo = max(1.0, self.reduce_weight)
+        hi = max(self.containers, lo)
+        for _ in range(iterations):
+            mid = (lo + hi) / 2
+            self.containers = mid
+            result = simulate(self, self.slowstart, self.num_reducers)
+            if result['map_end'] > self.map_phase:
+                lo = mid
+            else:
+                hi = mid
+        return (lo + hi) / 2
+
+    def calibrate_fetch_cost(self, iterations=40):
+        """Binary-search the per-map fetch cost that reproduces the measured shuffle tail"""
+        if self.num_reducers == 0 or self.measured_tail <= 0:
+            return 0.0
+        lo, hi = 0.0, max(self.measured_tail, 1.0) * 4
+        for _ in range(iterations):
+            mid = (lo + hi) / 2
+            result = simulate(self, self.slowstart, self.num_reducers, fetch_cost=mid)
+            if result['mean_tail'] < self.measured_tail:
+                lo = mid
+            else:
+                hi = mid
+        return (lo + hi) / 2
+
+
+def mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def measured_capacity(map_tasks, reduce_tasks, reduce_weight):
+    """Peak weighted container usage observed in the run, in map-container units"""
+    events = [(t['start'], 1.0) for t in map_tasks] + [(t['finish'], -1.0) for t in map_tasks]
+    events += [(t['start'], reduce_weight) for t in reduce_tasks]
+    events += [(t['finish'], -reduce_weight) for t in reduce_tasks]
+    events.sort(key=lambda e: (e[0], e[1]))
+    usage = peak = 0.0
+    for _, delta in events:
+        usage += delta
+        peak = max(peak, usage)
+    return max(peak, 1.0)
+
+
+def simulate(model, slowstart, num_reducers, fetch_cost=None, rampup_limit=DEFAULT_RAMPUP_LIMIT):
+    """
+    Run one discrete-event simulation
+
+    Reducers become schedulable once ceil(slowstart * maps) maps have completed.
+    Like the MR AM they are requested at higher priority than maps, but may use
+    at most rampup_limit of the capacity while maps are still pending; a
+    schedulable reducer that does not fit yet reserves the capacity freed by
+    finishing maps (as the RM reserves a node) instead of losing it to the
+    next map, which would keep reducers out until the last map started. Each
+    reducer fetches every map output sequentially at fetch_cost seconds per map;
+    per-reducer fetch, merge and reduce work scales with measured/new reducers.
+    """
+    if fetch_cost is None:
+        fetch_cost = model.fetch_cost
+    scale = model.num_reducers / num_reducers if num_reducers and model.num_reducers else 1.0
+    cost = fetch_cost * scale
+    merge_sec = model.merge_sec * scale
+    reduce_sec = model.reduce_sec * scale
+
+    num_maps = len(model.map_durations)
+    threshold = min(num_maps, math.ceil(slowstart * num_maps))
+    capacity = model.containers
+    weight = model.reduce_weight
+
+    events = []
+    seq = itertools.count()
+    pending_maps = list(reversed(model.map_durations))
+    pending_reducers = num_reducers
+    used = 0.0
+    reduce_used = 0.0
+    completed_maps = 0
+    map_end = None
+    running = {}  # reducer id -> {'start', 'fetch_free'}
+    reducer_starts = {}
+    shuffle_ends = {}
+    reducer_ids = itertools.count()
+    finish_time = 0.0
+    reduce_slot = 0.0
+    idle_slot = 0.0
+
+    def finish_shuffle(rid, now):
+        state = running[rid]
+        shuffle_end = max(state['fetch_free'], now)
+        shuffle_ends[rid] = shuffle_end
+        heapq.heappush(events, (shuffle_end + merge_sec + reduce_sec, next(seq), 'reduce_done', rid))
+
+    def schedule(now):
+        nonlocal used, reduce_used, pending_reducers
+        while True:
+            free = capacity - used
+            reducer_ready = (pending_reducers > 0 and completed_maps >= threshold and weight <= capacity
+                             and (not pending_maps or reduce_used + weight <= rampup_limit * capacity))
+            if reducer_ready and free >= weight:
+                rid = next(reducer_ids)
+                pending_reducers -= 1
+                used += weight
+                reduce_used += weight
+                # Catch up on outputs of maps that already finished
+                running[rid] = {'start': now, 'fetch_free': now + cost * completed_maps}
+                reducer_starts[rid] = now
+                if completed_maps == num_maps:
+                    finish_shuffle(rid, now)
+                continue
+            if pending_maps and free >= 1.0 and not reducer_ready:
+                used += 1.0
+                heapq.heappush(events, (now + pending_maps.pop(), next(seq), 'map_done', None))
+                continue
+            break
+
+    schedule(0.0)
+    while events:
+        now, _, kind, rid = heapq.heappop(events)
+        finish_time = max(finish_time, now)
+        if kind == 'map_done':
+            used -= 1.0
+            completed_maps += 1
+            for state in running.values():
+                state['fetch_free'] = max(state['fetch_free'], now) + cost
+            if completed_maps == num_maps:
+                map_end = now
+                for running_id in list(running):
+                    if running_id not in shuffle_ends:
+                        finish_shuffle(running_id, now)
+        else:
+            state = running.pop(rid)
+            used -= weight
+            reduce_used -= weight
+            reduce_slot += now - state['start']
+            idle_slot += max(0.0, min(shuffle_ends[rid], map_end) - state['start'])
+        schedule(now)
+
+    tails = [max(0.0, shuffle_ends[r] - max(reducer_starts[r], map_end)) for r in shuffle_ends]
+    return {
+        'makespan': finish_time,
+        'map_end': map_end or 0.0,
+        'reduce_slot_sec': reduce_slot,
+        'idle_reducer_slot_sec': idle_slot,
+        'mean_tail': mean(tails),
+    }
+
+
+def what_if(model, slowstart_values, reducer_counts):
+    """Simulate every (slowstart, reducers) combination"""
+    rows = []
+    for num_reducers in reducer_counts:
+        for slowstart in slowstart_values:
+            result = simulate(model, slowstart, num_reducers)
+            rows.append({
+                'slowstart_value': slowstart,
+                'num_reducers': num_reducers,
+                'predicted_makespan_sec': round(result['makespan'], 1),
+                'predicted_map_end_sec': round(result['map_end'], 1),
+                'reduce_slot_sec': round(result['reduce_slot_sec'], 1),
+                'idle_reducer_slot_sec': round(result['idle_reducer_slot_sec'], 1),
+                'delta_vs_measured_pct': round((result['makespan'] - model.makespan) / model.makespan * 100, 2)
+                if model.makespan > 0 else 0,
+            })
+    return rows
+
+
+def slowstart_matters(model, num_reducers, low=0.05, high=0.7):
+    """
+    Sanity check: an early and a late slowstart must yield different schedules
+
+    Both values are below 1.0 on purpose: if reducers can never start
+    before the last map has been scheduled (slots always taken by maps),
+    every value below 1.0 simulates the same and only 1.0 differs.
+    """
+    if not num_reducers or len(model.map_durations) < 2:
+        return True
+    early, late = simulate(model, low, num_reducers), simulate(model, high, num_reducers)
+    return (early['makespan'], early['idle_reducer_slot_sec']) != (late['makespan'], late['idle_reducer_slot_sec'])
+
+
+def validate(runs, containers=None, reduce_weight=DEFAULT_REDUCE_WEIGHT):
+    """
+    Cross-validate against recorded runs
+
+    Every run is used once as calibration source and its model predicts the
+    makespan of every recorded run (including itself) at that run's settings.
+    """
+    models = [(csv_file, RunModel(tasks, containers, reduce_weight)) for csv_file, tasks in runs]
+    rows = []
+    for calib_file, calib in models:
+        for target_file, target in models:
+            predicted = simulate(calib, target.slowstart, target.num_reducers or calib.num_reducers)['makespan']
+            rows.append({
+                'calibration_run': os.path.basename(calib_file),
+                'target_run': os.path.basename(target_file),
+                'target_slowstart': target.slowstart,
+                'target_reducers': target.num_reducers,
+                'measured_makespan_sec': round(target.makespan, 1),
+                'predicted_makespan_sec': round(predicted, 1),
+                'error_pct': round((predicted - target.makespan) / target.makespan * 100, 2)
+                if target.makespan > 0 else 0,
+            })
+    return rows
+
+
+def parse_list(text, cast):
+    return [cast(item) for item in text.split(',') if item.strip()]
+
+
+def write_csv(path, header, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=header)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Slowstart what-if simulator driven by measured timelines')
+    parser.add_argument('paths', nargs='+', help='Timeline CSV files or directories containing them')
+    parser.add_argument('--slowstart', default=','.join(str(v) for v in DEFAULT_SLOWSTART_VALUES),
+                        help='Comma-separated slowstart values to simulate')
+    parser.add_argument('--reducers', default=None,
+                        help='Comma-separated reducer counts to simulate (default: measured count)')
+    parser.add_argument('--containers', type=float, default=None,
+                        help='Cluster capacity in map containers (default: peak usage in the measured run)')
+    parser.add_argument('--reduce-weight', type=float, default=DEFAULT_REDUCE_WEIGHT,
+                        help=f'Reduce container size relative to a map container (default: {DEFAULT_REDUCE_WEIGHT})')
+    parser.add_argument('--validate', action='store_true',
+                        help='Cross-validate predictions against all given recorded runs')
+    parser.add_argument('--output', default=None, help='Output CSV path')
+    args = parser.parse_args()
+    if args.containers is not None and args.containers < max(1.0, args.reduce_weight):
+        print(f"Error: --containers {args.containers:g} cannot fit a map container and a reduce container "
+              f"(--reduce-weight {args.reduce_weight:g})")
+        sys.exit(1)
+
+    csv_files = []
+    for path in args.paths:
+        csv_files.extend(find_timeline_csvs(path))
+    runs = [(f, load_timeline(f)) for f in csv_files]
+    runs = [(f, tasks) for f, tasks in runs if tasks]
+    if not runs:
+        print("Error: no timeline CSVs with tasks found")
+        sys.exit(1)
+
+    if args.validate:
+        rows = validate(runs, args.containers, args.reduce_weight)
+        output = args.output or os.path.join(os.path.dirname(csv_files[0]) or '.', 'slowstart_sim_validation.csv')
+        write_csv(output, VALIDATION_HEADER, rows)
+        print("=== Simulator Validation ===")
+        print(f"{'Calibration':<45} {'Target':<45} {'Measured':>9} {'Predicted':>10} {'Error':>8}")
+        for row in rows:
+            print(f"{row['calibration_run']:<45} {row['target_run']:<45} {row['measured_makespan_sec']:>9} "
+                  f"{row['predicted_makespan_sec']:>10} {row['error_pct']:>7}%")
+        self_errors = [abs(r['error_pct']) for r in rows if r['calibration_run'] == r['target_run']]
+        cross_errors = [abs(r['error_pct']) for r in rows if r['calibration_run'] != r['target_run']]
+        print(f"\nMean |error| self: {mean(self_errors):.2f}%  cross: {mean(cross_errors):.2f}%")
+        print(f"Validation saved to: {output}")
+        insensitive = [os.path.basename(f) for f, tasks in runs
+                       if not slowstart_matters(RunModel(tasks, args.containers, args.reduce_weight),
+                                                len(split_tasks(tasks)[1]))]
+        if insensitive:
+            print(f"Warning: slowstart 0.05 and 0.7 simulate identically for: {', '.join(insensitive)}",
+                  file=sys.stderr)
+        else:
+            print("Slowstart sensitivity: ok (0.05 and 0.7 give different schedules for every run)")
+        return
+
+    slowstart_values = parse_list(args.slowstart, float)
+    for csv_file, tasks in runs:
+        model = RunModel(tasks, args.containers, args.reduce_weight)
+        reducer_counts = parse_list(args.reducers, int) if args.reducers else [model.num_reducers or 1]
+        rows = what_if(model, slowstart_values, reducer_counts)
+        for num_reducers in reducer_counts:
+            if len(slowstart_values) > 1 and not slowstart_matters(model, num_reducers):
+                print(f"Warning: slowstart has no effect on the simulated schedule with {num_reducers} reducers",
+                      file=sys.stderr)
+        output = args.output or f"{output_prefix(csv_file)}_whatif.csv"
+        write_csv(output, WHATIF_HEADER, rows)
+
+        print(f"\n=== {model.experiment_id} (measured slowstart {model.slowstart}, "
+              f"{model.num_reducers} reducers, {model.makespan:.0f}s) ===")
+        print(f"Capacity: {model.containers:.1f} map containers | fetch cost: {model.fetch_cost:.3f}s/map "
+              f"| merge {model.merge_sec:.1f}s | reduce {model.reduce_sec:.1f}s")
+        print(f"{'Slowstart':>9} {'Reducers':>8} {'Makespan':>9} {'Idle slot-s':>11} {'Delta':>8}")
+        for row in rows:
+            print(f"{row['slowstart_value']:>9} {row['num_reducers']:>8} {row['predicted_makespan_sec']:>9} "
+                  f"{row['idle_reducer_slot_sec']:>11} {row['delta_vs_measured_pct']:>7}%")
+        print(f"What-if results: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Statistical Report Engine for Repeated Slowstart Trials
+Groups repeated runs per (dataset, slowstart) configuration, computes
+vectorized bootstrap confidence intervals for each configuration and effect
+sizes against a baseline slowstart, and renders Markdown and HTML reports.
+Packages in the results store (package_store.py, package_results.sh's
+default) are read through their manifests: pass manifests/<name>.json or
+the store directory itself.
+Usage: python3 stats_report.py <batch_summary.csv | experiment_results_*.zip | manifest.json | dir> [...]
+       [--metric total_time_sec] [--baseline 1.0] [--resamples 10000] [--output metrics/stats_report]
+"""
+
+import argparse
+import csv
+import html
+import io
+import os
+import re
+import sys
+import zipfile
+from datetime import datetime
+
+import numpy as np
+
+from package_store import PackageStore
+
+DEFAULT_METRICS = ['total_time_sec']
+DEFAULT_RESAMPLES = 10000
+CONFIDENCE = 0.95
+# experiment_results_20251128_140236_5gb_wordcount.zip -> 5gb_wordcount
+DATASET_RE = re.compile(r'experiment_results_\d{8}_\d{6}_(.+)\.zip$')
+
+
+def read_summary_rows(path):
+    """Yield (dataset, source, row) for every batch summary row in a CSV, zip, manifest or directory"""
+    if os.path.isdir(os.path.join(path, 'manifests')):
+        store = PackageStore(path)
+        for manifest in store.manifests():
+            yield from read_summary_rows(store.manifest_path(manifest['name']))
+        return
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            full = os.path.join(path, name)
+            if name.endswith('.zip') or (name.startswith('batch_summary') and name.endswith('.csv')):
+                yield from read_summary_rows(full)
+        return
+
+    if path.endswith('.zip'):
+        match = DATASET_RE.search(os.path.basename(path))
+        dataset = match.group(1) if match else os.path.basename(path)[:-len('.zip')]
+        with zipfile.ZipFile(path) as zf:
+            for name in sorted(zf.namelist()):
+                if os.path.basename(name).startswith('batch_summary') and name.endswith('.csv'):
+                    text = zf.read(name).decode('utf-8', 'replace')
+                    for row in csv.DictReader(io.StringIO(text)):
+                        yield dataset, f"{os.path.basename(path)}:{name}", row
+        return
+
+    if path.endswith('.json'):
+        store = PackageStore(os.path.dirname(os.path.dirname(os.path.abspath(path))))
+        manifest = store.load_manifest(path)
+        match = DATASET_RE.search(manifest['name'] + '.zip')
+        dataset = match.group(1) if match else manifest['name']
+        for entry in sorted(manifest['files'], key=lambda e: e['path']):
+            name = entry['path']
+            if os.path.basename(name).startswith('batch_summary') and name.endswith('.csv'):
+                text = store.read(entry['sha256']).decode('utf-8', 'replace')
+                for row in csv.DictReader(io.StringIO(text)):
+                    yield dataset, f"{manifest['name']}:{name}", row
+        return
+
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            yield '', path, row
+
+
+def load_trials(paths, metrics):
+    """
+    Collect successful runs into {(dataset, slowstart): {metric: [values]}}
+
+    Returns (groups, skipped) where skipped counts failed or unparsable rows.
+    """
+    groups = {}
+    skipped = 0
+    for path in paths:
+        for dataset, _, row in read_summary_rows(path):
+            if row.get('job_status', 'SUCCESS') != 'SUCCESS':
+                skipped += 1
+                continue
+            try:
+                slowstart = float(row['slowstart_value'])
+            except (KeyError, ValueError):
+                skipped += 1
+                continue
+            group = groups.setdefault((dataset, slowstart), {m: [] for m in metrics})
+            for metric in metrics:
+                try:
+                    group[metric].append(float(row[metric]))
+                except (KeyError, ValueError, TypeError):
+                    pass
+    return groups, skipped
+
+
+def bootstrap_means(values, resamples, rng):
+    """Means of `resamples` bootstrap samples, drawn in one (resamples, n) index matrix"""
+    values = np.asarray(values, dtype=float)
+    idx = rng.integers(0, len(values), size=(resamples, len(values)))
+    return values[idx].mean(axis=1)
+
+
+def percentile_ci(samples):
+    alpha = (1 - CONFIDENCE) / 2
+    low, high = np.quantile(samples, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+def hedges_g(a, b):
+    """Standardized mean difference (a - b) with small-sample correction; None if undefined"""
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    na, nb = len(a), len(b)
+    if na < 2 or nb < 2:
+        return None
+    pooled = np.sqrt(((na - 1) * a.var(ddof=1) + (nb - 1) * b.var(ddof=1)) / (na + nb - 2))
+    if pooled == 0:
+        return None
+    correction = 1 - 3 / (4 * (na + nb) - 9)
+    return float((a.mean() - b.mean()) / pooled * correction)
+
+
+def describe_effect(g):
+    if g is None:
+        return 'n/a'
+    size = abs(g)
+    if size < 0.2:
+        return 'negligible'
+    if size < 0.5:
+        return 'small'
+    if size < 0.8:
+        return 'medium'
+    return 'large'
+
+
+def analyze(groups, metrics, baseline, resamples, seed=0):
+    """
+    Compute per-configuration CIs and comparisons against the baseline
+
+    Returns (configs, comparisons), lists of dicts ready for rendering.
+    """
+    rng = np.random.default_rng(seed)
+    configs = []
+    boot = {}
+    for (dataset, slowstart), values in sorted(groups.items()):
+        for metric in metrics:
+            x = values[metric]
+            if not x:
+                continue
+            means = bootstrap_means(x, resamples, rng)
+            boot[(dataset, slowstart, metric)] = means
+            arr = np.asarray(x)
+            low, high = percentile_ci(means) if len(x) > 1 else (None, None)
+            configs.append({
+                'dataset': dataset, 'slowstart': slowstart, 'metric': metric, 'n': len(x),
+                'mean': float(arr.mean()), 'std': float(arr.std(ddof=1)) if len(x) > 1 else None,
+                'cv_pct': float(arr.std(ddof=1) / arr.mean() * 100) if len(x) > 1 and arr.mean() else None,
+                'ci_low': low, 'ci_high': high,
+            })
+
+    comparisons = []
+    for (dataset, slowstart), values in sorted(groups.items()):
+        if slowstart == baseline or (dataset, baseline) not in groups:
+            continue
+        base_values = groups[(dataset, baseline)]
+        for metric in metrics:
+            key, base_key = (dataset, slowstart, metric), (dataset, baseline, metric)
+            if key not in boot or base_key not in boot:
+                continue
+            # Independent resamples of both groups -> bootstrap distribution of the difference.
+            # A single run has no spread, so its interval would be a meaningless point.
+            low = high = None
+            if len(values[metric]) > 1 and len(base_values[metric]) > 1:
+                low, high = percentile_ci(boot[key] - boot[base_key])
+            base_mean = float(np.mean(base_values[metric]))
+            mean_diff = float(np.mean(values[metric]) - base_mean)
+            g = hedges_g(values[metric], base_values[metric])
+            comparisons.append({
+                'dataset': dataset, 'slowstart': slowstart, 'baseline': baseline, 'metric': metric,
+                'n': len(values[metric]), 'n_baseline': len(base_values[metric]),
+                'diff': mean_diff, 'diff_pct': mean_diff / base_mean * 100 if base_mean else None,
+                'ci_low': low, 'ci_high': high, 'hedges_g': g, 'effect': describe_effect(g),
+                'significant': low is not None and (low > 0 or high < 0),
+            })
+    return configs, comparisons
+
+
+def fmt(value, digits=2):
+    if value is None:
+        return '-'
+    return f"{value:.{digits}f}"
+
+
+def report_tables(configs, comparisons):
+    """Rows shared by the Markdown and HTML renderers"""
+    config_header = ['Dataset', 'Slowstart', 'Metric', 'n', 'Mean', 'Std', 'CV %', f'{int(CONFIDENCE * 100)}% CI']
+    config_rows = [[c['dataset'] or '-', fmt(c['slowstart'], 1), c['metric'], str(c['n']), fmt(c['mean']),
+                    fmt(c['std']), fmt(c['cv_pct'], 1),
+                    f"[{fmt(c['ci_low'])}, {fmt(c['ci_high'])}]" if c['ci_low'] is not None else '-']
+                   for c in configs]
+    comparison_header = ['Dataset', 'Slowstart', 'vs', 'Metric', 'Δ mean', 'Δ %',
+                         f'{int(CONFIDENCE * 100)}% CI of Δ', "Hedges' g", 'Effect', 'CI excludes 0']
+    comparison_rows = [[c['dataset'] or '-', fmt(c['slowstart'], 1), fmt(c['baseline'], 1), c['metric'],
+                        fmt(c['diff']), fmt(c['diff_pct'], 1),
+                        f"[{fmt(c['ci_low'])}, {fmt(c['ci_high'])}]" if c['ci_low'] is not None else '-',
+                        fmt(c['hedges_g']), c['effect'], 'yes' if c['significant'] else 'no']
+                       for c in comparisons]
+    return (config_header, config_rows), (comparison_header, comparison_rows)
+
+
+def notes(configs, comparisons, resamples, skipped):
+    lines = [f"Bootstrap: {resamples} resamples, percentile intervals at {int(CONFIDENCE * 100)}%."]
+    single = sorted({(c['dataset'] or '-', c['slowstart']) for c in configs if c['n'] < 3})
+    if single:
+        listed = ', '.join(f"{d}@{s:g}" for d, s in single)
+        lines.append(f"Fewer than 3 trials for {listed}: intervals are unreliable, repeat these runs.")
+    noisy = [c for c in comparisons if c['ci_low'] is not None and not c['significant']]
+    if noisy:
+        tested = sum(1 for c in comparisons if c['ci_low'] is not None)
+        lines.append(f"{len(noisy)} of {tested} comparisons are within run-to-run noise "
+                     f"(CI of the difference includes 0).")
+    if skipped:
+        lines.append(f"Skipped {skipped} failed or unparsable runs.")
+    return lines
+
+
+def render_markdown(configs, comparisons, resamples, skipped, sources):
+    (ch, cr), (kh, kr) = report_tables(configs, comparisons)
+
+    def table(header, rows):
+        out = ['| ' + ' | '.join(header) + ' |', '|' + '---|' * len(header)]
+        out += ['| ' + ' | '.join(row) + ' |' for row in rows]
+        return '\n'.join(out)
+
+    parts = ["# Slowstart Comparison Report", "",
+             f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  ",
+             f"Sources: {', '.join(sources)}", "",
+             "## Configurations", "", table(ch, cr), "",
+             "## Effect vs baseline", "", table(kh, kr) if kr else "_No baseline runs to compare against._", "",
+             "## Notes", ""]
+    parts += [f"- {line}" for line in notes(configs, comparisons, resamples, skipped)]
+    return '\n'.join(parts) + '\n'
+
+
+def render_html(configs, comparisons, resamples, skipped, sources):
+    (ch, cr), (kh, kr) = report_tables(configs, comparisons)
+
+    def table(header, rows, highlight=None):
+        out = ['<table>', '<tr>' + ''.join(f'<th>{html.escape(h)}</th>' for h in header) + '</tr>']
+        for i, row in enumerate(rows):
+            cls = ' class="significant"' if highlight and highlight[i] else ''
+            out.append(f'<tr{cls}>' + ''.join(f'<td>{html.escape(v)}</td>' for v in row) + '</tr>')
+        out.append('</table>')
+        return '\n'.join(out)
+
+    note_items = ''.join(f'<li>{html.escape(line)}</li>'
+                         for line in notes(configs, comparisons, resamples, skipped))
+    comparison_html = (table(kh, kr, [c['significant'] for c in comparisons]) if kr
+                       else '<p><em>No baseline runs to compare against.</em></p>')
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Slowstart Comparison Report</title>
+<style>
+body {{ font-family: Arial, sans-serif; margin: 24px; color: #222; }}
+table {{ border-collapse: collapse; margin-bottom: 24px; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 10px; text-align: right; }}
+th {{ background: #f0f0f0; }}
+tr.significant td {{ background: #e6f4ea; }}
+.meta {{ color: #666; font-size: 0.9em; }}
+</style>
+</head>
+<body>
+<h1>Slowstart Comparison Report</h1>
+<p class="meta">Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}<br>Sources: {html.escape(', '.join(sources))}</p>
+<h2>Configurations</h2>
+{table(ch, cr)}
+<h2>Effect vs baseline</h2>
+{comparison_html}
+<h2>Notes</h2>
+<ul>{note_items}</ul>
+</body>
+</html>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bootstrap comparison report for repeated slowstart trials')
+    parser.add_argument('paths', nargs='+', help='batch_summary CSVs, experiment_results_*.zip, store manifests, '
+                                               'results store or other directories')
+    parser.add_argument('--metric', action='append', default=None,
+                        help=f'Summary column to analyze (repeatable, default: {DEFAULT_METRICS[0]})')
+    parser.add_argument('--baseline', type=float, default=None,
+                        help='Slowstart value compared against (default: highest observed)')
+    parser.add_argument('--resamples', type=int, default=DEFAULT_RESAMPLES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='metrics/stats_report',
+                        help='Output prefix: writes <prefix>.md and <prefix>.html')
+    args = parser.parse_args()
+
+    metrics = args.metric or DEFAULT_METRICS
+    groups, skipped = load_trials(args.paths, metrics)
+    if not groups:
+        print("Error: no successful runs found")
+        sys.exit(1)
+
+    baseline = args.baseline if args.baseline is not None else max(s for _, s in groups)
+    configs, comparisons = analyze(groups, metrics, baseline, args.resamples, args.seed)
+    sources = [os.path.basename(p.rstrip('/')) for p in args.paths]
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(f"{args.output}.md", 'w') as f:
+        f.write(render_markdown(configs, comparisons, args.resamples, skipped, sources))
+    with open(f"{args.output}.html", 'w') as f:
+        f.write(render_html(configs, comparisons, args.resamples, skipped, sources))
+
+    print(f"Configurations: {len(configs)}, comparisons vs slowstart {baseline:g}: {len(comparisons)}")
+    for c in comparisons:
+        marker = '*' if c['significant'] else ' '
+        print(f" {marker} {c['dataset'] or '-':<16} {c['slowstart']:>4.1f} {c['metric']:<16} "
+              f"Δ={c['diff']:+.2f} CI[{fmt(c['ci_low'])}, {fmt(c['ci_high'])}] g={fmt(c['hedges_g'])}")
+    print(f"Markdown report: {args.output}.md")
+    print(f"HTML report: {args.output}.html")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Straggler and Critical-Path Analysis for MapReduce Timelines
+Flags slow tasks per phase with median/MAD robust z-scores, walks the job's
+critical path (map completion -> shuffle finish -> merge -> reduce finish) and
+attributes the end-to-end time to each segment.
+Reducer phases are measured from the later of the reducer's start and the
+last map's finish: a reducer launched early (slowstart < 1.0) spends the
+time before that waiting for map output, which says nothing about the
+reducer itself (concurrency_analysis.py reports it as shuffle_waiting).
+Usage: python3 straggler_analysis.py <timeline_csv_or_dir> [...] [--threshold 3.5]
+       python3 straggler_analysis.py --self-check
+"""
+
+import argparse
+import csv
+import statistics
+import sys
+
+from timeline_io import find_timeline_csvs, format_time, load_timeline, output_prefix, split_tasks
+
+# Robust z-score cut-off (Iglewicz & Hoaglin recommend 3.5)
+DEFAULT_THRESHOLD = 3.5
+# Scale factors turning MAD / mean absolute deviation into sigma estimates
+MAD_SCALE = 0.6745
+MEANAD_SCALE = 0.7979
+
+REPORT_HEADER = [
+    'rank', 'task_id', 'task_type', 'worst_phase', 'phase_duration_sec', 'phase_median_sec',
+    'slowdown', 'robust_z', 'is_straggler', 'on_critical_path', 'start_time', 'finish_time',
+]
+PATH_HEADER = ['segment', 'task_id', 'start_time', 'end_time', 'duration_sec', 'pct_of_job']
+
+
+def task_phases(task, map_end=0):
+    """Return {phase: duration} for a task; reducers are split into sub-phases, waits for maps excluded"""
+    if task['task_type'] == 'MAP':
+        return {'map': task['finish'] - task['start']}
+    active_start = min(max(task['start'], map_end), task['finish'])
+    phases = {'reduce_total': task['finish'] - active_start}
+    shuffle_end = task['shuffle_finish']
+    if shuffle_end:
+        phases['shuffle'] = max(shuffle_end - active_start, 0)
+        merge_end = task['merge_finish']
+        if merge_end:
+            phases['merge'] = merge_end - shuffle_end
+            phases['reduce'] = task['finish'] - merge_end
+    return phases
+
+
+def robust_scorer(values):
+    """
+    Build a scoring function for one phase's duration distribution
+
+    Returns (median, score) where score(x) is the robust z-score of x.
+    When more than half the values are identical MAD is 0, so the mean
+    absolute deviation is used instead.
+    """
+    median = statistics.median(values)
+    deviations = [abs(v - median) for v in values]
+    mad = statistics.median(deviations)
+    if mad > 0:
+        scale = MAD_SCALE / mad
+    else:
+        mean_ad = sum(deviations) / len(deviations)
+        scale = MEANAD_SCALE / mean_ad if mean_ad > 0 else 0.0
+    return median, (lambda x: (x - median) * scale)
+
+
+def critical_path(tasks):
+    """
+    Walk the critical path backwards from the job's last finishing task
+
+    Returns a list of segment dicts whose durations sum to the makespan.
+    """
+    map_tasks, reduce_tasks = split_tasks(tasks)
+    job_start = min(t['start'] for t in tasks)
+    segments = []
+
+    def add(segment, task_id, start, end):
+        if end > start:
+            segments.append({'segment': segment, 'task_id': task_id, 'start': start, 'end': end})
+
+    last_map = max(map_tasks, key=lambda t: t['finish']) if map_tasks else None
+    map_end = last_map['finish'] if last_map else job_start
+
+    if last_map:
+        # Time before the last map could start: container waits and earlier waves
+        add('map_scheduling', last_map['task_id'], job_start, last_map['start'])
+        add('map', last_map['task_id'], last_map['start'], map_end)
+
+    if reduce_tasks:
+        last_reduce = max(reduce_tasks, key=lambda t: t['finish'])
+        rid = last_reduce['task_id']
+        finish = last_reduce['finish']
+        cursor = max(map_end, job_start)
+        # A reducer launched after the last map (slowstart 1.0) adds launch latency
+        add('reduce_launch', rid, cursor, last_reduce['start'])
+        cursor = max(cursor, last_reduce['start'])
+        shuffle_end = last_reduce['shuffle_finish']
+        merge_end = last_reduce['merge_finish']
+        if shuffle_end:
+            shuffle_end = min(max(shuffle_end, cursor), finish)
+            add('shuffle_tail', rid, cursor, shuffle_end)
+            cursor = shuffle_end
+            if merge_end:
+                merge_end = min(max(merge_end, cursor), finish)
+                add('merge', rid, cursor, merge_end)
+                cursor = merge_end
+            add('reduce', rid, cursor, finish)
+        else:
+            add('reduce_total', rid, cursor, finish)
+
+    makespan = max(t['finish'] for t in tasks) - job_start
+    for seg in segments:
+        seg['duration'] = seg['end'] - seg['start']
+        seg['pct'] = round(seg['duration'] / makespan * 100, 2) if makespan > 0 else 0
+    return segments
+
+
+def analyze_stragglers(tasks, threshold=DEFAULT_THRESHOLD):
+    """Score every task against its phase distributions and rank them"""
+    map_tasks, _ = split_tasks(tasks)
+    map_end = max((t['finish'] for t in map_tasks), default=0)
+    per_task = [(task, task_phases(task, map_end)) for task in tasks]
+
+    by_phase = {}
+    for _, phases in per_task:
+        for phase, duration in phases.items():
+            by_phase.setdefault(phase, []).append(duration)
+    scorers = {phase: robust_scorer(values) for phase, values in by_phase.items()}
+
+    critical_ids = {seg['task_id'] for seg in critical_path(tasks)}
+    report = []
+    for task, phases in per_task:
+        worst = None
+        for phase, duration in phases.items():
+            median, score = scorers[phase]
+            z = score(duration)
+            if worst is None or z > worst[3]:
+                worst = (phase, duration, median, z)
+        phase, duration, median, z = worst
+        report.append({
+            'task_id': task['task_id'],
+            'task_type': task['task_type'],
+            'worst_phase': phase,
+            'phase_duration_sec': format_time(duration),
+            'phase_median_sec': format_time(median),
+            'slowdown': round(duration / median, 2) if median > 0 else '',
+            'robust_z': round(z, 2),
+            'is_straggler': int(z > threshold),
+            'on_critical_path': int(task['task_id'] in critical_ids),
+            'start_time': format_time(task['start']),
+            'finish_time': format_time(task['finish']),
+        })
+
+    report.sort(key=lambda r: r['robust_z'], reverse=True)
+    for rank, row in enumerate(report, 1):
+        row['rank'] = rank
+    return report
+
+
+def early_reducer_check(threshold=DEFAULT_THRESHOLD):
+    """
+    Synthetic job: 20 maps, one late map, and 8 reducers of which one launched
+    early and waited ~200s for it. Returns the task ids wrongly flagged (should be []).
+    """
+    tasks = [{'task_id': f'm_{i:06d}', 'task_type': 'MAP', 'start': 0.0, 'finish': 40.0 + i % 3,
+              'shuffle_finish': None, 'merge_finish': None} for i in range(20)]
+    tasks.append({'task_id': 'm_000020', 'task_type': 'MAP', 'start': 200.0, 'finish': 240.0,
+                  'shuffle_finish': None, 'merge_finish': None})
+    for i in range(8):
+        start = 241.0 + i * 3 % 7
+        shuffle = start + 11 + i % 4
+        tasks.append({'task_id': f'r_{i:06d}', 'task_type': 'REDUCE', 'start': 30.0 if i == 2 else start,
+                      'finish': shuffle + 55 + i * 5 % 9, 'shuffle_finish': shuffle,
+                      'merge_finish': shuffle + 8 + i % 3})
+    return [r['task_id'] for r in analyze_stragglers(tasks, threshold)
+            if r['is_straggler'] and r['task_type'] == 'REDUCE']
+
+
+def process_file(csv_file, threshold):
+    """Analyze one timeline CSV and write the straggler and critical-path reports"""
+    tasks = load_timeline(csv_file)
+    if not tasks:
+        print(f"Warning: no tasks in {csv_file}, skipping")
+        return
+
+    report = analyze_stragglers(tasks, threshold)
+    segments = critical_path(tasks)
+    prefix = output_prefix(csv_file)
+    report_csv = f"{prefix}_stragglers.csv"
+    path_csv = f"{prefix}_critical_path.csv"
+
+    with open(report_csv, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_HEADER)
+        writer.writeheader()
+        writer.writerows(report)
+
+    with open(path_csv, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(PATH_HEADER)
+        for seg in segments:
+            writer.writerow([seg['segment'], seg['task_id'], format_time(seg['start']),
+                             format_time(seg['end']), format_time(seg['duration']), seg['pct']])
+
+    stragglers = [r for r in report if r['is_straggler']]
+    print(f"\n=== {tasks[0]['experiment_id']} (slowstart {tasks[0]['slowstart_value']}) ===")
+    print("Critical path:")
+    for seg in segments:
+        print(f"  {seg['segment']:<15} {format_time(seg['duration']):>8}s  {seg['pct']:>6.2f}%  {seg['task_id']}")
+    print(f"Stragglers (robust z > {threshold}): {len(stragglers)}")
+    for row in stragglers[:10]:
+        print(f"  #{row['rank']:<3} {row['task_id']} {row['worst_phase']} "
+              f"{row['phase_duration_sec']}s vs median {row['phase_median_sec']}s (z={row['robust_z']})")
+    print(f"Report: {report_csv}")
+    print(f"Critical path: {path_csv}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Straggler and critical-path analysis')
+    parser.add_argument('paths', nargs='*', help='Timeline CSV files or directories containing them')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Robust z-score above which a task is a straggler (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--self-check', action='store_true',
+                        help='Check on a synthetic job that an early-launched reducer is not flagged, then exit')
+    args = parser.parse_args()
+
+    if args.self_check:
+        flagged = early_reducer_check(args.threshold)
+        if flagged:
+            print(f"Error: reducers flagged only for waiting on the last map: {', '.join(flagged)}")
+            sys.exit(1)
+        print("Self-check: ok (early-launched reducer not flagged)")
+        return
+    if not args.paths:
+        parser.error('the following arguments are required: paths')
+
+    csv_files = []
+    for path in args.paths:
+        csv_files.extend(find_timeline_csvs(path))
+    if not csv_files:
+        print("Error: no timeline CSVs found")
+        sys.exit(1)
+
+    for csv_file in csv_files:
+        process_file(csv_file, args.threshold)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Timeline CSV reader shared by the analysis scripts
+Loads metrics/*_timeline.csv produced by extract_timeline.sh into plain task dicts.
+
+Timeline CSVs store epoch milliseconds; files written before the switch
+store epoch seconds. Every reader goes through to_seconds(), which tells
+the two apart by magnitude, so both load the same way.
+"""
+
+import csv
+import os
+
+# Column aliases: extract_timeline.sh's yarn-logs fallback writes the short names
+PHASE_COLUMNS = {
+    'shuffle_finish': ('shuffle_finish_time', 'shuffle_finish'),
+    'merge_finish': ('merge_finish_time', 'merge_finish'),
+    'reduce_finish': ('reduce_finish_time', 'reduce_finish'),
+}
+
+
+# Epoch seconds stay below this until the year 5138; epoch ms passed it in 1973
+MS_THRESHOLD = 1e11
+
+
+def to_seconds(ts):
+    """Epoch seconds or milliseconds -> float epoch seconds"""
+    return ts / 1000.0 if ts >= MS_THRESHOLD else float(ts)
+
+
+def to_millis(ts):
+    """Float epoch seconds -> integer epoch milliseconds"""
+    return int(round(ts * 1000))
+
+
+def parse_time(value):
+    """Parse a timestamp cell into epoch seconds, returning None for empty or invalid values"""
+    if value is None:
+        return None
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        ts = float(value)
+    except ValueError:
+        return None
+    return to_seconds(ts) if ts > 0 else None
+
+
+def format_time(ts):
+    """Format a timestamp for CSV output without a spurious '.0'"""
+    if ts is None:
+        return ''
+    return int(ts) if float(ts).is_integer() else round(ts, 3)
+
+
+def load_timeline(csv_file):
+    """
+    Load a task timeline CSV
+
+    Returns:
+        List of task dicts with keys experiment_id, slowstart_value, task_id,
+        task_type, start, finish, shuffle_finish, merge_finish, reduce_finish.
+        Times are Unix seconds (float, millisecond precision for current
+        CSVs, whole seconds for old ones); missing phase times are None.
+    """
+    with open(csv_file, 'r', newline='') as f:
+        return read_timeline(f)
+
+
+def read_timeline(f):
+    """Same as load_timeline() for an open text stream (e.g. a zip member)"""
+    tasks = []
+    for row in csv.DictReader(f):
+        start = parse_time(row.get('start_time'))
+        finish = parse_time(row.get('finish_time'))
+        if start is None or finish is None:
+            continue
+        task = {
+            'experiment_id': row.get('experiment_id', ''),
+            'slowstart_value': row.get('slowstart_value', ''),
+            'task_id': row.get('task_id', ''),
+            'task_type': row.get('task_type', ''),
+            'start': start,
+            'finish': max(start, finish),
+        }
+        for key, aliases in PHASE_COLUMNS.items():
+            task[key] = None
+            for column in aliases:
+                if column in row:
+                    task[key] = parse_time(row[column])
+                    break
+        tasks.append(task)
+    return tasks
+
+
+def split_tasks(tasks):
+    """Split tasks into (map_tasks, reduce_tasks)"""
+    map_tasks = [t for t in tasks if t['task_type'] == 'MAP']
+    reduce_tasks = [t for t in tasks if t['task_type'] == 'REDUCE']
+    return map_tasks, reduce_tasks
+
+
+def output_prefix(csv_file):
+    """metrics/X_timeline.csv -> metrics/X, used to name derived CSVs"""
+    base = csv_file[:-len('.csv')] if csv_file.endswith('.csv') else csv_file
+    if base.endswith('_timeline'):
+        base = base[:-len('_timeline')]
+    return base
+
+
+def find_timeline_csvs(path):
+    """Expand a file or directory argument into timeline CSV paths"""
+    if os.path.isdir(path):
+        return [os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.endswith('_timeline.csv')]
+    return [path]
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Batch Timeline Renderer for MapReduce Experiments
+Renders every *_timeline.csv in a directory on a process pool, skipping
+CSVs whose content hash and renderer version match a cached output.
+Usage: python3 visualization/batch_render.py [metrics_dir] [options]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+CACHE_FILENAME = '.render_cache.json'
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_timeline_csvs(metrics_dir):
+    """List task timeline CSVs (summary CSVs are not renderable)"""
+    csv_files = []
+    for name in sorted(os.listdir(metrics_dir)):
+        if name.endswith('_timeline.csv'):
+            csv_files.append(os.path.join(metrics_dir, name))
+    return csv_files
+
+
+def load_cache(output_dir):
+    """Load the render cache, returning an empty one if missing or corrupt"""
+    cache_file = os.path.join(output_dir, CACHE_FILENAME)
+    try:
+        with open(cache_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(output_dir, cache):
+    """Atomically write the render cache"""
+    os.makedirs(output_dir, exist_ok=True)
+    cache_file = os.path.join(output_dir, CACHE_FILENAME)
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, cache_file)
+
+
+def is_cached(entry, content_hash, renderer_version):
+    """Check whether a cache entry still matches the CSV and renderer"""
+    return (entry is not None
+            and entry.get('sha256') == content_hash
+            and entry.get('renderer_version') == renderer_version
+            and os.path.exists(entry.get('output', '')))
+
+
+def read_renderer_version():
+    """Read RENDERER_VERSION from timeline_visualizer.py without importing it"""
+    source = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'timeline_visualizer.py')
+    with open(source, 'r') as f:
+        for line in f:
+            if line.startswith('RENDERER_VERSION'):
+                return line.split('=', 1)[1].strip().strip('"\'')
+    return 'unknown'
+
+
+def render_one(csv_file, output_dir):
+    """Render a single timeline CSV (runs inside a pool worker)"""
+    from timeline_visualizer import create_timeline_visualization
+    return create_timeline_visualization(csv_file, output_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render all timeline CSVs in a directory')
+    parser.add_argument('metrics_dir', nargs='?', default='metrics',
+                        help='Directory containing *_timeline.csv files (default: metrics)')
+    parser.add_argument('--output-dir', default='visualization/pics',
+                        help='Directory for generated PNGs (default: visualization/pics)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true',
+                        help='Re-render every CSV, ignoring the cache')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.metrics_dir):
+        print(f"Error: Directory '{args.metrics_dir}' not found")
+        sys.exit(1)
+
+    # Make timeline_visualizer importable regardless of the working directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    csv_files = find_timeline_csvs(args.metrics_dir)
+    if not csv_files:
+        print(f"No timeline CSVs found in {args.metrics_dir}")
+        return
+
+    # Read the renderer version without importing pandas/matplotlib, so a
+    # fully cached batch finishes without paying the import cost
+    renderer_version = read_renderer_version()
+    cache = load_cache(args.output_dir)
+
+    pending = []
+    skipped = 0
+    for csv_file in csv_files:
+        key = os.path.basename(csv_file)
+        content_hash = file_sha256(csv_file)
+        if not args.force and is_cached(cache.get(key), content_hash, renderer_version):
+            skipped += 1
+            continue
+        pending.append((csv_file, key, content_hash))
+
+    print(f"Timeline CSVs: {len(csv_files)} | cached: {skipped} | to render: {len(pending)}")
+    if not pending:
+        return
+
+    # Import once in the parent; forked workers inherit the loaded modules
+    import timeline_visualizer  # noqa: F401
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {pool.submit(render_one, csv_file, args.output_dir): (csv_file, key, content_hash)
+                   for csv_file, key, content_hash in pending}
+        for future in as_completed(futures):
+            csv_file, key, content_hash = futures[future]
+            try:
+                output_file = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Error rendering {csv_file}: {e}")
+                continue
+            cache[key] = {
+                'sha256': content_hash,
+                'renderer_version': renderer_version,
+                'output': output_file,
+            }
+            # Persist after every render so an interrupted batch keeps its progress
+            save_cache(args.output_dir, cache)
+
+    print(f"Rendered: {len(pending) - failed} | failed: {failed}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
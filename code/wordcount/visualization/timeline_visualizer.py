@@ -13,19 +13,32 @@ from datetime import datetime
 import sys
 import os
 
+# Values at or above this are epoch milliseconds, below are epoch seconds
+MS_THRESHOLD = 1e11
+
+# Bump whenever the rendered output changes, so cached PNGs are re-rendered
+RENDERER_VERSION = "2"
+
 def convert_timestamp(ts):
-    """Convert Unix timestamp (in seconds) to datetime"""
+    """Convert Unix timestamp (epoch ms, or seconds in old CSVs) to datetime"""
     try:
-        return datetime.fromtimestamp(int(ts))
+        ts = float(ts)
     except (ValueError, TypeError):
         return None
+    if not ts > 0:
+        return None
+    return datetime.fromtimestamp(ts / 1000.0 if ts >= MS_THRESHOLD else ts)
 
-def create_timeline_visualization(csv_file):
+def create_timeline_visualization(csv_file, output_dir='visualization/pics'):
     """
     Create a timeline visualization from the CSV file
     
     Args:
         csv_file: Path to the CSV file containing task timeline data
+        output_dir: Directory the PNG is written to
+    
+    Returns:
+        Path of the generated PNG file
     """
     # Read the CSV file
     df = pd.read_csv(csv_file)
@@ -176,13 +189,14 @@ def create_timeline_visualization(csv_file):
     plt.tight_layout()
     
     # Save to visualization/pics folder
-    os.makedirs('visualization/pics', exist_ok=True)
-    output_file = os.path.join('visualization/pics', 
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, 
                                os.path.basename(csv_file).replace('.csv', '_timeline.png'))
     plt.savefig(output_file, dpi=300, bbox_inches='tight')
     print(f"Timeline visualization saved to: {output_file}")
     
     plt.close()
+    return output_file
 
 def main():
     """Main function"""
@@ -9,12 +9,18 @@ import sys
 import os
 from datetime import datetime
 
+# Values at or above this are epoch milliseconds, below are epoch seconds
+MS_THRESHOLD = 1e11
+
 def convert_timestamp(ts):
-    """Convert Unix timestamp to datetime"""
+    """Convert Unix timestamp (epoch ms, or seconds in old CSVs) to datetime"""
     try:
-        return datetime.fromtimestamp(int(ts))
+        ts = float(ts)
     except (ValueError, TypeError):
         return None
+    if not ts > 0:
+        return None
+    return datetime.fromtimestamp(ts / 1000.0 if ts >= MS_THRESHOLD else ts)
 
 def create_html_timeline(csv_file):
     """Create an HTML timeline visualization"""
@@ -225,7 +231,7 @@ def create_html_timeline(csv_file):
             <div class="task-label">MAP {i+1}</div>
             <div class="task-bar-container">
                 <div class="task-bar map-task" style="left: {left_percent:.2f}%; width: {width_percent:.2f}%;">
-                    M{task_num} ({task['duration']:.0f}s)
+                    M{task_num} ({task['duration']:.1f}s)
                 </div>
             </div>
         </div>